@@ -2,11 +2,15 @@
 # Flask Application Main File
 # ============================================
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-from flask_migrate import Migrate
+from flask_migrate import Migrate, upgrade as flask_migrate_upgrade
+from alembic.script import ScriptDirectory
 from dotenv import load_dotenv
-from sqlalchemy import inspect, text
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from werkzeug.security import safe_join
+import hmac
 import os
 import sys
 from datetime import datetime
@@ -16,9 +20,31 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 try:
     from config import config
     from models import db
+    from services.email_queue import start_email_worker
+    from services.blob_store import init_blob_store
+    from services.asset_reclaimer import start_asset_reclaimer
+    from services.image_derivatives import DERIVATIVE_TIERS, get_derivative_cache, media_path
+    from services.frontend_assets import load_frontend_assets
+    from services.response_compression import init_response_compression
+    from services.instrumentation import init_instrumentation, render_metrics
+    from services.profiler import init_profiler
+    from services.media_delivery import (
+        MEDIA_ENDPOINTS, init_media_delivery, send_frontend_file, send_media,
+    )
 except ImportError:
     from backend.config import config
     from backend.models import db
+    from backend.services.email_queue import start_email_worker
+    from backend.services.blob_store import init_blob_store
+    from backend.services.asset_reclaimer import start_asset_reclaimer
+    from backend.services.image_derivatives import DERIVATIVE_TIERS, get_derivative_cache, media_path
+    from backend.services.frontend_assets import load_frontend_assets
+    from backend.services.response_compression import init_response_compression
+    from backend.services.instrumentation import init_instrumentation, render_metrics
+    from backend.services.profiler import init_profiler
+    from backend.services.media_delivery import (
+        MEDIA_ENDPOINTS, init_media_delivery, send_frontend_file, send_media,
+    )
 
 # ============================================
 # Application Factory
@@ -42,6 +68,12 @@ def create_app(config_name=None):
     
     # Initialize extensions
     db.init_app(app)
+    # Registered first so its after_request hook runs last and times the others
+    init_instrumentation(app, db)
+    init_blob_store(app)
+    # Fingerprinted/precompressed build of frontend/, when one is configured
+    frontend_assets = load_frontend_assets(app)
+    init_media_delivery(app, frontend_assets.root if frontend_assets else frontend_dir)
     CORS(app, resources={r"/api/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
@@ -50,7 +82,11 @@ def create_app(config_name=None):
         "supports_credentials": False,
         "max_age": 3600
     }})
-    Migrate(app, db, compare_type=True)
+    migrations_dir = os.path.join(os.path.dirname(__file__), 'migrations')
+    Migrate(app, db, directory=migrations_dir, compare_type=True)
+    init_response_compression(app)
+    # Idle until an admin starts a profiling session
+    init_profiler(app)
     
     # ============================================
     # SECURITY MIDDLEWARE - Cache Control & Auth
@@ -58,11 +94,25 @@ def create_app(config_name=None):
     
     @app.after_request
     def add_security_headers(response):
-        """Add security headers to prevent caching of protected content"""
-        # Disable caching for all responses to prevent browser caching issues
-        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0, private'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+        """
+        Add security headers and pick caching per route class: media files
+        keep the headers send_media chose, fingerprinted frontend files stay
+        immutable, other frontend files are revalidated, read APIs with a
+        validator (services/conditional_get.py) stay private and revalidated,
+        and everything else (API JSON, errors) is never stored.
+        """
+        cacheable = response.status_code in (200, 206, 304)
+        if request.endpoint in MEDIA_ENDPOINTS and cacheable:
+            pass
+        elif request.endpoint in ('serve_frontend', 'serve_frontend_index') and cacheable:
+            if not response.cache_control.immutable:
+                response.headers['Cache-Control'] = 'no-cache'
+        elif cacheable and 'ETag' in response.headers and response.cache_control.private:
+            pass
+        else:
+            response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0, private'
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
         response.headers['X-Content-Type-Options'] = 'nosniff'
         response.headers['X-Frame-Options'] = 'SAMEORIGIN'
         return response
@@ -114,22 +164,54 @@ def create_app(config_name=None):
             'timestamp': datetime.utcnow().isoformat()
         }), 200
 
+    # Prometheus scrape endpoint; needs METRICS_TOKEN as a bearer token
+    # (open without one only in debug mode)
+    @app.route('/api/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(supplied.encode(), token.encode()):
+                return jsonify({'success': False, 'message': 'Invalid metrics token'}), 401
+        elif not app.debug:
+            return not_found(None)
+        return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    def serve_media_file(directory, filename):
+        abs_path = safe_join(os.path.join(app.root_path, directory), filename)
+        if not abs_path or not os.path.isfile(abs_path):
+            return not_found(None)
+        return send_media(abs_path, f'{directory}/{filename}')
+
     # Serve uploaded files (images, etc.)
     @app.route('/uploads/<path:filename>')
     def serve_uploads(filename):
-        upload_folder = os.path.join(app.root_path, 'uploads')
-        return send_from_directory(upload_folder, filename)
+        return serve_media_file('uploads', filename)
     
     # Serve generated images
     @app.route('/static/generated/<path:filename>')
     def serve_generated(filename):
-        static_folder = os.path.join(app.root_path, 'static', 'generated')
-        return send_from_directory(static_folder, filename)
+        return serve_media_file('static/generated', filename)
+
+    # Resized copies of uploaded/generated images, rendered on first request
+    @app.route('/media/<tier>/<path:filename>')
+    def serve_image_derivative(tier, filename):
+        source_path = media_path(filename)
+        source_abs = safe_join(app.root_path, source_path) if source_path else None
+        if tier not in DERIVATIVE_TIERS or not source_abs or not os.path.isfile(source_abs):
+            return not_found(None)
+
+        derivative = get_derivative_cache(app).derivative(source_abs, source_path, tier)
+        if derivative is None:
+            return send_media(source_abs, source_path)
+        return send_media(derivative, source_path, variant=tier, mimetype='image/jpeg')
 
     # Frontend routes
     @app.route('/')
     def serve_frontend_index():
-        return send_from_directory(frontend_dir, 'index.html')
+        if frontend_assets:
+            return frontend_assets.send('index.html')
+        return send_frontend_file(frontend_dir, 'index.html')
 
     @app.route('/<path:path>')
     def serve_frontend(path):
@@ -139,169 +221,50 @@ def create_app(config_name=None):
                 'message': 'Resource not found'
             }), 404
 
+        if frontend_assets:
+            # Manifest lookup; no filesystem check per request
+            return frontend_assets.send(path) or frontend_assets.send('index.html')
+
         target_path = os.path.join(frontend_dir, path)
         if os.path.exists(target_path) and os.path.isfile(target_path):
-            return send_from_directory(frontend_dir, path)
+            return send_frontend_file(frontend_dir, path)
 
-        return send_from_directory(frontend_dir, 'index.html')
+        return send_frontend_file(frontend_dir, 'index.html')
     
-    def ensure_chatbot_prompt_columns():
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-        if 'chatbots' not in table_names:
-            return
-
-        columns = {column['name'] for column in inspector.get_columns('chatbots')}
-
-        if 'single_person_prompt' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE chatbots
-                ADD COLUMN single_person_prompt TEXT NOT NULL
-                DEFAULT 'Generate a high-quality professional portrait image of the guest.
-
-Details:
-- Focus on one person only.
-- Center the person in the frame.
-- Use a given background image
-- Maintain realistic facial features.
-- Proper lighting and sharp focus.
-- Business or formal attire.
-- No extra people in the frame.
-- No distortion or overlapping elements.
-- Professional conference vibe.'
-                """
-            ))
-
-        if 'multiple_person_prompt' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE chatbots
-                ADD COLUMN multiple_person_prompt TEXT NOT NULL
-                DEFAULT 'Generate a professional group image of multiple guests.
-
-Requirements:
-- Include all selected guests in one frame.
-- Arrange them naturally in a group.
-- Maintain correct proportions for each person.
-- Ensure no unnatural gaps between group members.
-- If people are close together, blend them naturally without visual separation.
-- Avoid cutting faces or overlapping distortions.
-- Use a conference or stage background.
-- Maintain uniform lighting and perspective.
-- Make the group appear cohesive and professionally composed.'
-                """
-            ))
-
-        if 'gemini_api_key' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE chatbots
-                ADD COLUMN gemini_api_key VARCHAR(255)
-                """
-            ))
-
-        if 'allow_previous_year_users' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE chatbots
-                ADD COLUMN allow_previous_year_users BOOLEAN NOT NULL DEFAULT FALSE
-                """
-            ))
-
-        if 'drive_folder_id' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE chatbots
-                ADD COLUMN drive_folder_id VARCHAR(255)
-                """
-            ))
-
-        db.session.commit()
-
-    def remove_unused_model_columns():
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-        removable_by_table = {
-            'chatbots': ['single_mode', 'multiple_mode', 'logo', 'updated_at'],
-            'users': ['profile_picture', 'updated_at', 'bio', 'organization'],
-            'guests': ['title', 'description']
-        }
-
-        for table_name, removable_columns in removable_by_table.items():
-            if table_name not in table_names:
-                continue
-
-            columns = {column['name'] for column in inspector.get_columns(table_name)}
-            for column_name in removable_columns:
-                if column_name in columns:
-                    try:
-                        db.session.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {column_name}'))
-                    except Exception:
-                        db.session.rollback()
-                        continue
-
-        db.session.commit()
-
-    def ensure_conversation_schema():
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-
-        if 'messages' in table_names:
-            columns = {column['name'] for column in inspector.get_columns('messages')}
-            if 'conversation_id' not in columns:
-                db.session.execute(text(
-                    """
-                    ALTER TABLE messages
-                    ADD COLUMN conversation_id INTEGER
-                    """
-                ))
-                db.session.commit()
-
-    def ensure_messages_schema():
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-        if 'messages' not in table_names:
+    def verify_schema_version():
+        """
+        Compare the database's Alembic revision with the migration heads.
+        Schema changes live in migrations/versions and are applied with
+        `flask db upgrade`; startup only costs one indexed lookup.
+        """
+        mode = app.config.get('SCHEMA_VERSION_CHECK', 'warn')
+        if mode == 'off':
             return
 
-        columns = {column['name'] for column in inspector.get_columns('messages')}
-
-        if 'message_type' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE messages
-                ADD COLUMN message_type VARCHAR(32) NOT NULL DEFAULT 'text'
-                """
-            ))
-            db.session.commit()
-
         try:
-            db.session.execute(text(
-                """
-                ALTER TABLE messages
-                ALTER COLUMN content DROP NOT NULL
-                """
-            ))
-            db.session.commit()
-        except Exception:
+            current = {
+                row[0] for row in db.session.execute(text('SELECT version_num FROM alembic_version'))
+            }
+        except DBAPIError:
             db.session.rollback()
+            current = set()
 
-    def ensure_users_schema():
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-        if 'users' not in table_names:
+        heads = set(ScriptDirectory(migrations_dir).get_heads())
+        if current == heads:
             return
 
-        columns = {column['name'] for column in inspector.get_columns('users')}
+        if app.config.get('DB_AUTO_UPGRADE'):
+            app.logger.info('Database schema at %s, upgrading to %s', sorted(current) or 'empty', sorted(heads))
+            flask_migrate_upgrade(directory=migrations_dir)
+            return
 
-        if 'whatsapp_number' not in columns:
-            db.session.execute(text(
-                """
-                ALTER TABLE users
-                ADD COLUMN whatsapp_number VARCHAR(20)
-                """
-            ))
-            db.session.commit()
+        message = (
+            f"Database schema revision {sorted(current) or 'none'} does not match "
+            f"migration head {sorted(heads)}; run `flask db upgrade`."
+        )
+        if mode == 'error':
+            raise RuntimeError(message)
+        app.logger.warning(message)
 
     def apply_yearly_user_rollover_deactivation():
         """
@@ -358,19 +321,39 @@ Requirements:
         len(sys.argv) > 1 and sys.argv[1] == 'db'
     )
 
-    # Create database tables for normal app startup, but skip during Flask-Migrate commands
+    # Check the schema revision for normal app startup, but skip during Flask-Migrate commands
     if should_bootstrap_db:
         with app.app_context():
-            db.create_all()
-            ensure_chatbot_prompt_columns()
-            ensure_conversation_schema()
-            ensure_messages_schema()
-            ensure_users_schema()
-            remove_unused_model_columns()
+            if app.config.get('TESTING'):
+                db.create_all()
+            else:
+                verify_schema_version()
             # Disabled: apply_yearly_user_rollover_deactivation()
+
+        # With gunicorn preload_app the app is created before fork and threads
+        # would stay behind in the master; init_worker_process starts them.
+        if not app.config.get('TESTING') and not app.config.get('DEFER_BACKGROUND_WORKERS'):
+            start_email_worker(app)
+            start_asset_reclaimer(app)
     
     return app
 
+
+def init_worker_process(app):
+    """
+    Per-worker setup for an app created in the gunicorn master
+    (preload_app): drop the pooled connections inherited through fork
+    without closing them (they belong to the master) and start the
+    background workers create_app deferred.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    if not app.config.get('TESTING'):
+        start_email_worker(app)
+        start_asset_reclaimer(app)
+
 # ============================================
 # Application Initialization
 # ============================================
@@ -49,13 +49,26 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = _build_database_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # sync or gevent (gunicorn.conf.py); per-process pool defaults follow it.
+    # gevent: connections are only held while a request queries (Gemini waits
+    # release them), so a small pool serves hundreds of in-flight requests and
+    # a short timeout sheds load instead of queueing. Keep
+    # WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW) below max_connections.
+    WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'sync').strip().lower()
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
-        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
-        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 15 if WORKER_CLASS == 'gevent' else 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5 if WORKER_CLASS == 'gevent' else 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10 if WORKER_CLASS == 'gevent' else 30)),
     }
+    # Set by gunicorn.conf.py when preloading; workers start the email and
+    # reclaimer threads after fork (app.init_worker_process).
+    DEFER_BACKGROUND_WORKERS = os.environ.get('DEFER_BACKGROUND_WORKERS', 'false').lower() == 'true'
+
+    # Startup compares alembic_version with the migration head: warn | error | off
+    SCHEMA_VERSION_CHECK = os.environ.get('SCHEMA_VERSION_CHECK', 'warn').lower()
+    DB_AUTO_UPGRADE = os.environ.get('DB_AUTO_UPGRADE', 'false').lower() == 'true'
     
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
@@ -71,6 +84,53 @@ class Config:
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'xlsx', 'csv', 'png', 'jpg', 'jpeg', 'gif', 'pdf'}
+    USER_IMPORT_CHUNK_SIZE = int(os.environ.get('USER_IMPORT_CHUNK_SIZE', 500))
+    USER_IMPORT_PREVIEW_TTL_MINUTES = int(os.environ.get('USER_IMPORT_PREVIEW_TTL_MINUTES', 30))
+    # Running import jobs heartbeat; one silent this long lost its process and is marked failed
+    USER_IMPORT_STALE_SECONDS = int(os.environ.get('USER_IMPORT_STALE_SECONDS', 300))
+    # Threads that save/hash/resize guest photos during chatbot create/update
+    GUEST_PHOTO_WORKERS = int(os.environ.get('GUEST_PHOTO_WORKERS', 8))
+    GUEST_PHOTO_ARCHIVE_MAX_ENTRIES = int(os.environ.get('GUEST_PHOTO_ARCHIVE_MAX_ENTRIES', 2000))
+    GUEST_PHOTO_ARCHIVE_MAX_ENTRY_MB = int(os.environ.get('GUEST_PHOTO_ARCHIVE_MAX_ENTRY_MB', 25))
+
+    # Deferred file deletion (services/asset_reclaimer.py); one reclaimer per app process
+    ASSET_RECLAIMER_ENABLED = os.environ.get('ASSET_RECLAIMER_ENABLED', 'true').lower() == 'true'
+    ASSET_RECLAIM_POLL_SECONDS = int(os.environ.get('ASSET_RECLAIM_POLL_SECONDS', 30))
+    ASSET_RECLAIM_BATCH_SIZE = int(os.environ.get('ASSET_RECLAIM_BATCH_SIZE', 500))
+    # Tombstoned files are kept at least this long
+    ASSET_RECLAIM_GRACE_SECONDS = int(os.environ.get('ASSET_RECLAIM_GRACE_SECONDS', 60))
+    # Orphan sweep of uploads/ and static/generated/; 0 disables the periodic sweep
+    ASSET_ORPHAN_SWEEP_HOURS = int(os.environ.get('ASSET_ORPHAN_SWEEP_HOURS', 24))
+    ASSET_ORPHAN_MIN_AGE_HOURS = int(os.environ.get('ASSET_ORPHAN_MIN_AGE_HOURS', 24))
+    ASSET_SWEEP_GENERATED = os.environ.get('ASSET_SWEEP_GENERATED', 'true').lower() == 'true'
+
+    # Resized image copies served from /media/<tier>/ (services/image_derivatives.py)
+    # Defaults to <instance>/image_derivatives; least recently used files are evicted past the budget
+    IMAGE_DERIVATIVE_DIR = os.environ.get('IMAGE_DERIVATIVE_DIR', '')
+    IMAGE_DERIVATIVE_CACHE_MB = int(os.environ.get('IMAGE_DERIVATIVE_CACHE_MB', 2048))
+
+    # Output of `python -m backend.services.frontend_assets` (fingerprinted, precompressed);
+    # empty serves frontend/ as is
+    FRONTEND_BUILD_DIR = os.environ.get('FRONTEND_BUILD_DIR', '')
+
+    # Let the fronting web server send media/frontend files: off, x-accel-redirect (nginx) or x-sendfile
+    MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', 'off')
+    # nginx internal locations aliased to the backend/ and frontend/ directories
+    MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/_protected/backend')
+    FRONTEND_ACCEL_PREFIX = os.environ.get('FRONTEND_ACCEL_PREFIX', '/_protected/frontend')
+
+    # Compression of API/JSON responses (services/response_compression.py)
+    RESPONSE_COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true'
+    # Smaller buffered responses are sent as is; streamed responses are always compressed
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+    # Comma-separated; empty uses the module's defaults (JSON, NDJSON, HTML, text, CSV, CSS, JS)
+    RESPONSE_COMPRESSION_MIMETYPES = [
+        value for value in os.environ.get('RESPONSE_COMPRESSION_MIMETYPES', '').split(',') if value.strip()
+    ]
+    RESPONSE_COMPRESSION_GZIP_LEVEL = int(os.environ.get('RESPONSE_COMPRESSION_GZIP_LEVEL', 6))
+    # Brotli is used when the brotli package is installed and the client accepts it
+    RESPONSE_COMPRESSION_BROTLI = os.environ.get('RESPONSE_COMPRESSION_BROTLI', 'true').lower() == 'true'
+    RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', 4))
 
     # Email (SMTP)
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or os.environ.get('SMTP_SERVER', '')
@@ -81,6 +141,19 @@ class Config:
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USE_SSL = os.environ.get('MAIL_USE_SSL', 'false').lower() == 'true'
 
+    # Outbound email queue (services/email_queue.py); one delivery worker per app process,
+    # of which only one sends at a time on Postgres, so the rate is deployment-wide
+    EMAIL_WORKER_ENABLED = os.environ.get('EMAIL_WORKER_ENABLED', 'true').lower() == 'true'
+    EMAIL_WORKER_CONCURRENCY = int(os.environ.get('EMAIL_WORKER_CONCURRENCY', 4))
+    EMAIL_WORKER_POLL_SECONDS = int(os.environ.get('EMAIL_WORKER_POLL_SECONDS', 10))
+    EMAIL_RATE_PER_MINUTE = int(os.environ.get('EMAIL_RATE_PER_MINUTE', 600))
+    EMAIL_MESSAGES_PER_CONNECTION = int(os.environ.get('EMAIL_MESSAGES_PER_CONNECTION', 100))
+    EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+    EMAIL_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_RETRY_BASE_SECONDS', 30))
+    # Failed emails keep their body (credential emails hold a password) this long
+    # so they can be retried, then it is cleared; 0 clears it as soon as they fail
+    EMAIL_FAILED_BODY_RETENTION_HOURS = int(os.environ.get('EMAIL_FAILED_BODY_RETENTION_HOURS', 72))
+
     # WhatsApp Cloud API
     WHATSAPP_ACCESS_TOKEN = os.environ.get('WHATSAPP_ACCESS_TOKEN', '')
     WHATSAPP_PHONE_NUMBER_ID = os.environ.get('WHATSAPP_PHONE_NUMBER_ID') or os.environ.get('PHONE_NUMBER_ID', '')
@@ -91,6 +164,25 @@ class Config:
     WHATSAPP_LOGIN_OTP_TEMPLATE_LANGUAGE = os.environ.get('WHATSAPP_LOGIN_OTP_TEMPLATE_LANGUAGE', 'en')
     WHATSAPP_API_VERSION = os.environ.get('WHATSAPP_API_VERSION', 'v23.0')
 
+    # Admin analytics time-series cache (per process)
+    ANALYTICS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 5))
+
+    # Request timing: latency/DB/outbound histograms on /api/metrics and a
+    # Server-Timing header. Statements slower than SLOW_QUERY_MS are logged
+    # with their call site (0 disables). /api/metrics needs METRICS_TOKEN as a
+    # bearer token outside debug mode.
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 500))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    # Sampling profiler sessions started from /api/admin/profiling; captures
+    # (collapsed stacks for flamegraphs) go under PROFILING_DIR/<session>/.
+    # Relative paths are resolved from the repository root.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', 'logs/profiles')
+    PROFILE_INTERVAL_MS = int(os.environ.get('PROFILE_INTERVAL_MS', 5))
+
     # Public base URL used when external providers need to fetch local media.
     PUBLIC_URL = os.environ.get('PUBLIC_URL', '')
 
@@ -112,6 +204,7 @@ class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     SESSION_COOKIE_SECURE = False
+    DB_AUTO_UPGRADE = os.environ.get('DB_AUTO_UPGRADE', 'true').lower() == 'true'
 
 class ProductionConfig(Config):
     """Production configuration"""
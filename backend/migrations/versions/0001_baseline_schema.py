@@ -0,0 +1,369 @@
+"""baseline schema
+
+Creates any missing table, then brings tables left behind by the old
+db.create_all() + ensure_* startup routines up to the same shape (added
+prompt/Drive/WhatsApp columns, nullable messages.content, dropped legacy
+columns). Every step checks the live schema first, so this is safe on empty,
+partially bootstrapped and fully patched databases alike.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+LEGACY_SINGLE_PERSON_PROMPT = """Generate a high-quality professional portrait image of the guest.
+
+Details:
+- Focus on one person only.
+- Center the person in the frame.
+- Use a given background image
+- Maintain realistic facial features.
+- Proper lighting and sharp focus.
+- Business or formal attire.
+- No extra people in the frame.
+- No distortion or overlapping elements.
+- Professional conference vibe."""
+
+LEGACY_MULTIPLE_PERSON_PROMPT = """Generate a professional group image of multiple guests.
+
+Requirements:
+- Include all selected guests in one frame.
+- Arrange them naturally in a group.
+- Maintain correct proportions for each person.
+- Ensure no unnatural gaps between group members.
+- If people are close together, blend them naturally without visual separation.
+- Avoid cutting faces or overlapping distortions.
+- Use a conference or stage background.
+- Maintain uniform lighting and perspective.
+- Make the group appear cohesive and professionally composed."""
+
+# Columns dropped from the models over time.
+REMOVED_COLUMNS = {
+    'chatbots': ['single_mode', 'multiple_mode', 'logo', 'updated_at'],
+    'users': ['profile_picture', 'updated_at', 'bio', 'organization'],
+    'guests': ['title', 'description'],
+}
+
+
+def _has_table(table_name):
+    # Databases bootstrapped by the old db.create_all() startup path already
+    # have some or all of these tables, so only create what is missing.
+    return sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def _columns(table_name):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table_name):
+        return None
+    return {column['name']: column for column in inspector.get_columns(table_name)}
+
+
+def _add_missing_columns(table_name, new_columns):
+    columns = _columns(table_name)
+    if columns is None:
+        return
+
+    missing = [column for column in new_columns if column.name not in columns]
+    if not missing:
+        return
+
+    with op.batch_alter_table(table_name, schema=None) as batch_op:
+        for column in missing:
+            batch_op.add_column(column)
+
+
+def upgrade():
+    if not _has_table('users'):
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=120), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('whatsapp_number', sa.String(length=20), nullable=True),
+        sa.Column('role', sa.String(length=50), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_whatsapp_number'), ['whatsapp_number'], unique=False)
+
+    if not _has_table('chatbots'):
+        op.create_table('chatbots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('event_name', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('system_prompt', sa.Text(), nullable=False),
+        sa.Column('single_person_prompt', sa.Text(), nullable=False),
+        sa.Column('multiple_person_prompt', sa.Text(), nullable=False),
+        sa.Column('gemini_api_key', sa.String(length=255), nullable=True),
+        sa.Column('background_image', sa.String(length=255), nullable=True),
+        sa.Column('drive_folder_id', sa.String(length=255), nullable=True),
+        sa.Column('public', sa.Boolean(), nullable=True),
+        sa.Column('active', sa.Boolean(), nullable=True),
+        sa.Column('allow_previous_year_users', sa.Boolean(), nullable=False),
+        sa.Column('created_by_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('chatbots', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_chatbots_drive_folder_id'), ['drive_folder_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_chatbots_name'), ['name'], unique=False)
+
+    if not _has_table('login_otps'):
+        op.create_table('login_otps',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=120), nullable=False),
+        sa.Column('whatsapp_number', sa.String(length=20), nullable=False),
+        sa.Column('otp_code', sa.String(length=12), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('is_used', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('login_otps', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_login_otps_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_otps_expires_at'), ['expires_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_otps_is_used'), ['is_used'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_otps_user_id'), ['user_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_otps_username'), ['username'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_otps_whatsapp_number'), ['whatsapp_number'], unique=False)
+
+    if not _has_table('session_tokens'):
+        op.create_table('session_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=255), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('session_tokens', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_session_tokens_token'), ['token'], unique=True)
+
+    if not _has_table('whatsapp_send_history'):
+        op.create_table('whatsapp_send_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('whatsapp_number', sa.String(length=32), nullable=False),
+        sa.Column('image_url', sa.String(length=1024), nullable=True),
+        sa.Column('status', sa.String(length=100), nullable=False),
+        sa.Column('provider_message_id', sa.String(length=255), nullable=True),
+        sa.Column('response_payload', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('whatsapp_send_history', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_whatsapp_send_history_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_whatsapp_send_history_provider_message_id'), ['provider_message_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_whatsapp_send_history_status'), ['status'], unique=False)
+            batch_op.create_index(batch_op.f('ix_whatsapp_send_history_user_id'), ['user_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_whatsapp_send_history_whatsapp_number'), ['whatsapp_number'], unique=False)
+
+    if not _has_table('chatbot_participants'):
+        op.create_table('chatbot_participants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chatbot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('joined_at', sa.DateTime(), nullable=True),
+        sa.Column('last_active', sa.DateTime(), nullable=True),
+        sa.Column('message_count', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chatbot_id', 'user_id', name='unique_participant')
+        )
+
+    if not _has_table('conversations'):
+        op.create_table('conversations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chatbot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('conversations', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_conversations_chatbot_id'), ['chatbot_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_conversations_updated_at'), ['updated_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_conversations_user_id'), ['user_id'], unique=False)
+
+    if not _has_table('drive_image_backups'):
+        op.create_table('drive_image_backups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chatbot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('image_path', sa.String(length=1024), nullable=False),
+        sa.Column('drive_file_id', sa.String(length=255), nullable=False),
+        sa.Column('drive_folder_id', sa.String(length=255), nullable=False),
+        sa.Column('drive_link', sa.String(length=1024), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('drive_image_backups', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_drive_image_backups_chatbot_id'), ['chatbot_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_drive_image_backups_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_drive_image_backups_drive_file_id'), ['drive_file_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_drive_image_backups_drive_folder_id'), ['drive_folder_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_drive_image_backups_user_id'), ['user_id'], unique=False)
+
+    if not _has_table('guests'):
+        op.create_table('guests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chatbot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('photo', sa.String(length=255), nullable=True),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if not _has_table('messages'):
+        op.create_table('messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chatbot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('is_user_message', sa.Boolean(), nullable=True),
+        sa.Column('message_type', sa.String(length=32), nullable=False),
+        sa.Column('image_url', sa.String(length=512), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('messages', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_messages_conversation_id'), ['conversation_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_messages_created_at'), ['created_at'], unique=False)
+
+    _patch_legacy_tables()
+
+
+def _patch_legacy_tables():
+    _add_missing_columns('chatbots', [
+        sa.Column('single_person_prompt', sa.Text(), nullable=False,
+                  server_default=LEGACY_SINGLE_PERSON_PROMPT),
+        sa.Column('multiple_person_prompt', sa.Text(), nullable=False,
+                  server_default=LEGACY_MULTIPLE_PERSON_PROMPT),
+        sa.Column('gemini_api_key', sa.String(length=255), nullable=True),
+        sa.Column('allow_previous_year_users', sa.Boolean(), nullable=False,
+                  server_default=sa.false()),
+        sa.Column('drive_folder_id', sa.String(length=255), nullable=True),
+    ])
+
+    _add_missing_columns('messages', [
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('message_type', sa.String(length=32), nullable=False,
+                  server_default='text'),
+    ])
+
+    message_columns = _columns('messages')
+    if message_columns and not message_columns['content'].get('nullable', True):
+        with op.batch_alter_table('messages', schema=None) as batch_op:
+            batch_op.alter_column('content', existing_type=sa.Text(), nullable=True)
+
+    _add_missing_columns('users', [
+        sa.Column('whatsapp_number', sa.String(length=20), nullable=True),
+    ])
+
+    for table_name, removed in REMOVED_COLUMNS.items():
+        columns = _columns(table_name)
+        if columns is None:
+            continue
+
+        present = [column_name for column_name in removed if column_name in columns]
+        if not present:
+            continue
+
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for column_name in present:
+                batch_op.drop_column(column_name)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_messages_created_at'))
+        batch_op.drop_index(batch_op.f('ix_messages_conversation_id'))
+
+    op.drop_table('messages')
+    op.drop_table('guests')
+    with op.batch_alter_table('drive_image_backups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_drive_image_backups_user_id'))
+        batch_op.drop_index(batch_op.f('ix_drive_image_backups_drive_folder_id'))
+        batch_op.drop_index(batch_op.f('ix_drive_image_backups_drive_file_id'))
+        batch_op.drop_index(batch_op.f('ix_drive_image_backups_created_at'))
+        batch_op.drop_index(batch_op.f('ix_drive_image_backups_chatbot_id'))
+
+    op.drop_table('drive_image_backups')
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversations_user_id'))
+        batch_op.drop_index(batch_op.f('ix_conversations_updated_at'))
+        batch_op.drop_index(batch_op.f('ix_conversations_chatbot_id'))
+
+    op.drop_table('conversations')
+    op.drop_table('chatbot_participants')
+    with op.batch_alter_table('whatsapp_send_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_whatsapp_send_history_whatsapp_number'))
+        batch_op.drop_index(batch_op.f('ix_whatsapp_send_history_user_id'))
+        batch_op.drop_index(batch_op.f('ix_whatsapp_send_history_status'))
+        batch_op.drop_index(batch_op.f('ix_whatsapp_send_history_provider_message_id'))
+        batch_op.drop_index(batch_op.f('ix_whatsapp_send_history_created_at'))
+
+    op.drop_table('whatsapp_send_history')
+    with op.batch_alter_table('session_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_session_tokens_token'))
+
+    op.drop_table('session_tokens')
+    with op.batch_alter_table('login_otps', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_login_otps_whatsapp_number'))
+        batch_op.drop_index(batch_op.f('ix_login_otps_username'))
+        batch_op.drop_index(batch_op.f('ix_login_otps_user_id'))
+        batch_op.drop_index(batch_op.f('ix_login_otps_is_used'))
+        batch_op.drop_index(batch_op.f('ix_login_otps_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_login_otps_created_at'))
+
+    op.drop_table('login_otps')
+    with op.batch_alter_table('chatbots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chatbots_name'))
+        batch_op.drop_index(batch_op.f('ix_chatbots_drive_folder_id'))
+
+    op.drop_table('chatbots')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_whatsapp_number'))
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
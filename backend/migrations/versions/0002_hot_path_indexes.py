@@ -0,0 +1,95 @@
+"""hot path indexes
+
+Functional, composite and trigram indexes matched to the hottest filters:
+
+- lower(users.email) / lower(users.username): import dedupe
+  (_existing_email_keys / _existing_username_keys) and case-insensitive
+  username checks.
+- users.name / users.username trigram (Postgres only): ilike '%term%'
+  searches in admin list_users and analytics username filter.
+- messages(chatbot_id, user_id, created_at): _build_recent_context and
+  get_chatbot_messages.
+- messages(conversation_id, created_at): conversation history and
+  latest-message lookups.
+- chatbot_participants(user_id): per-user participant lookups (the unique
+  constraint leads with chatbot_id so it cannot serve these).
+
+On Postgres the indexes are built CONCURRENTLY so upgrades do not block
+writes on large messages/users tables.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, column expressions)
+BTREE_INDEXES = [
+    ('ix_users_email_lower', 'users', ['lower(email)']),
+    ('ix_users_username_lower', 'users', ['lower(username)']),
+    ('ix_messages_chatbot_user_created', 'messages', ['chatbot_id', 'user_id', 'created_at']),
+    ('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at']),
+    ('ix_chatbot_participants_user_id', 'chatbot_participants', ['user_id']),
+]
+
+TRIGRAM_INDEXES = [
+    ('ix_users_name_trgm', 'users', 'name'),
+    ('ix_users_username_trgm', 'users', 'username'),
+]
+
+
+def _is_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if not _is_postgres():
+        for index_name, table_name, columns in BTREE_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                [sa.text(column) if '(' in column else column for column in columns],
+                unique=False,
+                if_not_exists=True,
+            )
+        return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+        for index_name, table_name, columns in BTREE_INDEXES:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} '
+                f'ON {table_name} ({", ".join(columns)})'
+            )
+
+        for index_name, table_name, column in TRIGRAM_INDEXES:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} '
+                f'ON {table_name} USING gin ({column} gin_trgm_ops)'
+            )
+
+
+def downgrade():
+    if not _is_postgres():
+        for index_name, table_name, _ in reversed(BTREE_INDEXES):
+            op.drop_index(index_name, table_name=table_name, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        for index_name, _, _ in reversed(TRIGRAM_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+
+        for index_name, _, _ in reversed(BTREE_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
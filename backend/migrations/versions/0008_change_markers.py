@@ -0,0 +1,50 @@
+"""change markers
+
+chatbots.updated_at and guests.updated_at, bumped on every ORM update,
+plus guests(chatbot_id, updated_at). Read APIs derive their ETags from
+count/max(updated_at) aggregates (services/conditional_get.py). Existing
+rows are backfilled from created_at.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 17:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('chatbots', 'guests')
+
+
+def upgrade():
+    # SQLite cannot add a NOT NULL column with a non-constant default, so
+    # add it nullable, backfill, then tighten.
+    for table_name in TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(
+            f'UPDATE {table_name} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) '
+            'WHERE updated_at IS NULL'
+        )
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    with op.batch_alter_table('guests', schema=None) as batch_op:
+        batch_op.create_index('ix_guests_chatbot_updated', ['chatbot_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('guests', schema=None) as batch_op:
+        batch_op.drop_index('ix_guests_chatbot_updated')
+
+    for table_name in reversed(TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -5,8 +5,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+import json
 import secrets
 
+try:
+    from services.image_derivatives import derivative_urls
+except ImportError:
+    from backend.services.image_derivatives import derivative_urls
+
 db = SQLAlchemy()
 
 # ============================================
@@ -38,6 +44,14 @@ class User(db.Model):
     login_otps = db.relationship('LoginOTP', backref='user', lazy=True, cascade='all, delete-orphan')
     whatsapp_send_history = db.relationship('WhatsAppSendHistory', backref='user', lazy=True)
     drive_image_backups = db.relationship('DriveImageBackup', backref='user', lazy=True)
+
+    # Case-insensitive lookups (import dedupe, login) filter on lower(...).
+    # Trigram indexes for the ilike searches are Postgres-only and live in
+    # migrations/versions/0002_hot_path_indexes.py.
+    __table_args__ = (
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+        db.Index('ix_users_username_lower', db.func.lower(username)),
+    )
     
     def set_password(self, password):
         """Hash and set password"""
@@ -123,6 +137,8 @@ class Chatbot(db.Model):
     # Admin tracking
     created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Change marker for conditional GETs (services/conditional_get.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
     guests = db.relationship('Guest', backref='chatbot', lazy=True, cascade='all, delete-orphan')
@@ -203,6 +219,13 @@ class Guest(db.Model):
     active = db.Column(db.Boolean, default=True, nullable=False)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Change marker for conditional GETs (services/conditional_get.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Per-chatbot guest lists and their count/max(updated_at) validator.
+        db.Index('ix_guests_chatbot_updated', 'chatbot_id', 'updated_at'),
+    )
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -211,6 +234,8 @@ class Guest(db.Model):
             'chatbot_id': self.chatbot_id,
             'name': self.name,
             'photo': self.photo,
+            # {'thumb', 'preview', 'full'} URLs; None for external photos
+            'photo_variants': derivative_urls(self.photo),
             'active': self.active,
         }
         
@@ -268,9 +293,18 @@ class Message(db.Model):
     image_url = db.Column(db.String(512), nullable=True)  # For bot-generated or attached images
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Recent-context lookup and per-user chatbot history.
+        db.Index('ix_messages_chatbot_user_created', 'chatbot_id', 'user_id', 'created_at'),
+        # Conversation history ordered by time.
+        db.Index('ix_messages_conversation_created', 'conversation_id', 'created_at'),
+    )
     
-    def to_dict(self):
-        """Convert to dictionary"""
+    def to_dict(self, user_data=None):
+        """Convert to dictionary; user_data is the already serialized sender."""
+        if user_data is None and self.user:
+            user_data = self.user.to_dict()
         result = {
             'id': self.id,
             'content': self.content,
@@ -278,12 +312,24 @@ class Message(db.Model):
             'message_type': self.message_type or 'text',
             'timestamp': self.created_at.isoformat(),
             'conversation_id': self.conversation_id,
-            'user': self.user.to_dict() if self.user else None,
+            'user': user_data,
         }
         if self.image_url:
             result['image_url'] = self.image_url
+            result['image_variants'] = derivative_urls(self.image_url)
         return result
 
+    @staticmethod
+    def to_dict_many(messages):
+        """Serialize a page of messages, loading and serializing each sender once."""
+        user_ids = {message.user_id for message in messages if message.user_id is not None}
+        users = {}
+        if user_ids:
+            # One query for every sender on the page, however many there are.
+            for user in User.query.filter(User.id.in_(user_ids)).all():
+                users[user.id] = user.to_dict()
+        return [message.to_dict(user_data=users.get(message.user_id)) for message in messages]
+
 # ============================================
 # Chatbot Participant Model
 # ============================================
@@ -294,7 +340,7 @@ class ChatbotParticipant(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     chatbot_id = db.Column(db.Integer, db.ForeignKey('chatbots.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
@@ -448,3 +494,194 @@ class DriveImageBackup(db.Model):
         }
 
 
+
+
+# ============================================
+# User Import Job Model
+# ============================================
+
+class UserImportJob(db.Model):
+    """Background spreadsheet user import and its persisted progress."""
+    __tablename__ = 'user_import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Plain ids rather than foreign keys: the job record outlives deleted admins/chatbots.
+    created_by_id = db.Column(db.Integer, nullable=True, index=True)
+    chatbot_id = db.Column(db.Integer, nullable=True, index=True)
+    preview_token = db.Column(db.String(64), nullable=True)
+    file_name = db.Column(db.String(255))
+    default_role = db.Column(db.String(50), nullable=False, default='user')
+    # queued -> validating -> importing -> completed | blocked | failed
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    ready_rows = db.Column(db.Integer, nullable=False, default=0)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    imported_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    summary = db.Column(db.Text)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        try:
+            summary = json.loads(self.summary) if self.summary else {}
+        except (TypeError, ValueError):
+            summary = {}
+
+        progress = 0
+        if self.status == 'completed':
+            progress = 100
+        elif self.ready_rows:
+            progress = int((self.processed_rows or 0) * 100 / self.ready_rows)
+
+        return {
+            'id': self.id,
+            'chatbot_id': self.chatbot_id,
+            'file_name': self.file_name,
+            'default_role': self.default_role,
+            'status': self.status,
+            'done': self.status in ('completed', 'blocked', 'failed'),
+            'progress': progress,
+            'total_rows': self.total_rows,
+            'ready_rows': self.ready_rows,
+            'processed_rows': self.processed_rows,
+            'imported_count': self.imported_count,
+            'skipped_count': self.skipped_count,
+            'failed_count': self.failed_count,
+            'summary': summary,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# ============================================
+# User Import Preview Model
+# ============================================
+
+class UserImportPreview(db.Model):
+    """Validated import rows from a preview, reused by the import step until they expire."""
+    __tablename__ = 'user_import_previews'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256 of the uploaded file's bytes
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    created_by_id = db.Column(db.Integer, nullable=True, index=True)
+    file_name = db.Column(db.String(255))
+    # JSON list of validated rows, without passwords
+    rows = db.Column(db.Text, nullable=False)
+    # Fernet ciphertext of {row_index: password}. The key is derived from the
+    # file's bytes and only returned to the admin who previewed it.
+    passwords = db.Column(db.Text, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def is_expired(self):
+        return datetime.utcnow() > self.expires_at
+
+
+class OutboundEmail(db.Model):
+    """Queued outgoing email and its per-recipient delivery status."""
+    __tablename__ = 'outbound_emails'
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Plain ids rather than foreign keys: delivery records outlive deleted users.
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    created_by_id = db.Column(db.Integer, nullable=True)
+    # Groups the emails of one import/action, e.g. 'user_import:12'.
+    batch_key = db.Column(db.String(64), nullable=True, index=True)
+    kind = db.Column(db.String(50), nullable=False, default='generic')
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    # Cleared once sent; credential emails carry a plaintext password.
+    body = db.Column(db.Text)
+    # queued -> sending -> sent | failed (retryable errors go back to queued)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'batch_key': self.batch_key,
+            'kind': self.kind,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# ============================================
+# Stored Blob Model
+# ============================================
+
+class StoredBlob(db.Model):
+    """
+    A content-addressed file under uploads/blobs or static/generated/blobs.
+    ref_count is the number of rows whose path column points at it.
+    """
+    __tablename__ = 'stored_blobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Relative to the app root, e.g. uploads/blobs/ab/<sha256>.jpg
+    path = db.Column(db.String(255), unique=True, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size_bytes = db.Column(db.BigInteger)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'path': self.path,
+            'sha256': self.sha256,
+            'size_bytes': self.size_bytes,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# ============================================
+# Asset Tombstone Model
+# ============================================
+
+class AssetTombstone(db.Model):
+    """
+    A file under uploads/ or static/generated/ whose reference was removed.
+    The asset reclaimer deletes it once not_before has passed and nothing
+    references the path any more.
+    """
+    __tablename__ = 'asset_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Relative to the app root, e.g. uploads/messages/<name>.jpg
+    path = db.Column(db.String(512), nullable=False, index=True)
+    # chatbot_deleted, conversation_deleted, orphan_sweep, ...
+    reason = db.Column(db.String(50), nullable=False, default='deleted')
+    not_before = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
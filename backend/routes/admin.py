@@ -2,34 +2,76 @@
 # Admin Routes
 # ============================================
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from datetime import datetime, timedelta
-from openpyxl import load_workbook
-from io import BytesIO
-from sqlalchemy import or_, func, case, extract
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import or_, func, case, extract, insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
+import base64
+import csv
+import hashlib
+import json
 import re
-import smtplib
-import ssl
-from email.message import EmailMessage
 import threading
 import os
 import uuid
 
 try:
-    from models import db, User, Chatbot, Guest, Message, SessionToken, ChatbotParticipant
+    from models import (
+        db, User, Chatbot, Guest, Message, SessionToken, ChatbotParticipant,
+        Conversation, LoginOTP, WhatsAppSendHistory, DriveImageBackup, UserImportJob,
+        UserImportPreview, OutboundEmail,
+    )
     from routes.auth import token_required, admin_required
-    from services.email_templates import build_user_credentials_email
+    from services.email_queue import (
+        build_credentials_email, enqueue_emails, notify_email_worker, get_email_status_counts,
+        retry_failed_emails,
+    )
+    from services.analytics_service import AnalyticsServiceError, parse_timeseries_request, get_timeseries
+    from services.blob_store import adjust_blob_references, blob_reference, get_blob_store
+    from services.concurrency import map_blocking
+    from services.asset_reclaimer import (
+        get_last_sweep, get_tombstone_counts, request_orphan_sweep, sweep_orphan_assets, tombstone_assets,
+    )
+    from services.guest_photo_service import store_guest_photo
+    from services.image_derivatives import derivative_urls
+    from services.profiler import (
+        ProfilerError, capture_path, list_captures, merged_session, profiling_dir, read_session,
+        start_session, stop_session,
+    )
 except ImportError:
-    from backend.models import db, User, Chatbot, Guest, Message, SessionToken, ChatbotParticipant
+    from backend.models import (
+        db, User, Chatbot, Guest, Message, SessionToken, ChatbotParticipant,
+        Conversation, LoginOTP, WhatsAppSendHistory, DriveImageBackup, UserImportJob,
+        UserImportPreview, OutboundEmail,
+    )
     from backend.routes.auth import token_required, admin_required
-    from backend.services.email_templates import build_user_credentials_email
+    from backend.services.email_queue import (
+        build_credentials_email, enqueue_emails, notify_email_worker, get_email_status_counts,
+        retry_failed_emails,
+    )
+    from backend.services.analytics_service import AnalyticsServiceError, parse_timeseries_request, get_timeseries
+    from backend.services.blob_store import adjust_blob_references, blob_reference, get_blob_store
+    from backend.services.concurrency import map_blocking
+    from backend.services.asset_reclaimer import (
+        get_last_sweep, get_tombstone_counts, request_orphan_sweep, sweep_orphan_assets, tombstone_assets,
+    )
+    from backend.services.guest_photo_service import store_guest_photo
+    from backend.services.image_derivatives import derivative_urls
+    from backend.services.profiler import (
+        ProfilerError, capture_path, list_captures, merged_session, profiling_dir, read_session,
+        start_session, stop_session,
+    )
 
 admin_bp = Blueprint('admin', __name__)
 EMAIL_REGEX = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]{2,}$')
 GUEST_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 VALID_USER_ROLES = {'admin', 'user', 'speaker', 'volunteer'}
 INDIA_WHATSAPP_REGEX = re.compile(r'^(?:\+91)?[6-9]\d{9}$')
+# Keeps IN (...) lists well under driver bind-parameter limits.
+BULK_USER_CHUNK_SIZE = 500
 
 
 def _to_bool(value, default=False):
@@ -74,7 +116,7 @@ def _build_unique_filename(upload_root, stem, extension):
     return candidate
 
 
-def _save_guest_image(file_obj, desired_name=None):
+def _save_guest_image(file_obj):
     if not file_obj or not file_obj.filename:
         return None
 
@@ -85,22 +127,17 @@ def _save_guest_image(file_obj, desired_name=None):
     if not _is_allowed_file(filename, GUEST_IMAGE_EXTENSIONS):
         return 'invalid-type'
 
-    extension = filename.rsplit('.', 1)[1].lower()
-
-    upload_root = os.path.join(current_app.root_path, 'uploads', 'guests')
-    os.makedirs(upload_root, exist_ok=True)
-
-    unique_filename = _build_unique_filename(upload_root, desired_name, extension)
-
-    absolute_path = os.path.join(upload_root, unique_filename)
-    file_obj.save(absolute_path)
-    return f"uploads/guests/{unique_filename}"
+    return store_guest_photo(get_blob_store(), file_obj).relative_path
 
 
 def _rename_guest_image(existing_photo_path, desired_name):
     if not existing_photo_path:
         return None
 
+    # Content-addressed photos are named by hash and may be shared; nothing to rename.
+    if blob_reference(existing_photo_path):
+        return None
+
     current_relative = str(existing_photo_path).replace('\\', '/')
     current_filename = current_relative.split('/')[-1]
     if '.' not in current_filename:
@@ -124,54 +161,6 @@ def _rename_guest_image(existing_photo_path, desired_name):
     return f"uploads/guests/{new_filename}"
 
 
-def _normalize_upload_relative_path(raw_path):
-    if not raw_path:
-        return None
-
-    normalized = str(raw_path).strip().replace('\\', '/').lstrip('/')
-    if not normalized:
-        return None
-
-    if '/uploads/' in normalized:
-        normalized = normalized.split('/uploads/', 1)[1]
-        normalized = f"uploads/{normalized}"
-    elif not normalized.startswith('uploads/'):
-        if normalized.startswith(('backgrounds/', 'guests/', 'guest_lists/')):
-            normalized = f"uploads/{normalized}"
-        else:
-            return None
-
-    return normalized
-
-
-def _resolve_upload_absolute_path(raw_path):
-    relative_path = _normalize_upload_relative_path(raw_path)
-    if not relative_path:
-        return None
-
-    uploads_root = os.path.abspath(os.path.join(current_app.root_path, 'uploads'))
-    absolute_path = os.path.abspath(
-        os.path.join(current_app.root_path, relative_path.replace('/', os.sep))
-    )
-
-    if absolute_path != uploads_root and not absolute_path.startswith(uploads_root + os.sep):
-        return None
-
-    return absolute_path
-
-
-def _delete_uploaded_file(raw_path):
-    absolute_path = _resolve_upload_absolute_path(raw_path)
-    if not absolute_path:
-        return
-    if not os.path.exists(absolute_path):
-        return
-    try:
-        os.remove(absolute_path)
-    except OSError:
-        pass
-
-
 def is_valid_email(email):
     return bool(email and EMAIL_REGEX.match(email))
 
@@ -310,102 +299,33 @@ def _username_exists(raw_username):
     return db.session.query(User.id).filter(func.lower(User.username) == username_key).first() is not None
 
 
-def _existing_username_keys(username_keys):
+def _existing_username_emails(username_keys):
+    """Map each existing username key to that user's lowercased email."""
     normalized_keys = {str(value).strip().lower() for value in (username_keys or set()) if str(value).strip()}
     if not normalized_keys:
-        return set()
+        return {}
 
-    rows = db.session.query(User.username).filter(func.lower(User.username).in_(list(normalized_keys))).all()
+    rows = db.session.query(User.username, User.email).filter(
+        func.lower(User.username).in_(list(normalized_keys))
+    ).all()
     return {
-        str(row[0]).strip().lower()
+        str(row[0]).strip().lower(): str(row[1] or '').strip().lower()
         for row in rows
         if row and row[0] is not None and str(row[0]).strip()
     }
 
 
-def send_user_credentials_email(recipient_email, name, role, username, password, allowed_events=None, allowed_chatbots=None):
-    """Send credentials email synchronously"""
-    mail_server = current_app.config.get('MAIL_SERVER')
-    mail_port = current_app.config.get('MAIL_PORT', 587)
-    mail_username = current_app.config.get('MAIL_USERNAME')
-    mail_password = current_app.config.get('MAIL_PASSWORD')
-    mail_sender = current_app.config.get('MAIL_DEFAULT_SENDER') or mail_username or 'noreply@localhost'
-    use_tls = current_app.config.get('MAIL_USE_TLS', True)
-    use_ssl = current_app.config.get('MAIL_USE_SSL', False)
-
-    if not mail_server:
-        return False, 'MAIL_SERVER is not configured'
-
-    template = build_user_credentials_email(
-        role=role,
-        username=username,
-        email=recipient_email,
-        password=password,
-        allowed_events=allowed_events,
-        allowed_chatbots=allowed_chatbots,
+def _credentials_email(cred, user_id=None):
+    return build_credentials_email(
+        recipient_email=cred['email'],
+        role=cred['role'],
+        username=cred.get('username') or '',
+        password=cred['password'],
+        allowed_events=cred.get('allowed_events'),
+        allowed_chatbots=cred.get('allowed_chatbots'),
+        user_id=user_id or cred.get('user_id'),
     )
 
-    msg = EmailMessage()
-    msg['Subject'] = template['subject']
-    msg['From'] = mail_sender
-    msg['To'] = recipient_email
-    msg.set_content(template['body'])
-
-    try:
-        if use_ssl:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(mail_server, mail_port, context=context, timeout=20) as server:
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(mail_server, mail_port, timeout=20) as server:
-                if use_tls:
-                    context = ssl.create_default_context()
-                    server.starttls(context=context)
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
-        return True, None
-    except Exception as exc:
-        return False, str(exc)
-
-
-def send_email_background(app, recipient_email, name, role, username, password, allowed_events=None, allowed_chatbots=None):
-    """Send email in background thread with app context"""
-    with app.app_context():
-        try:
-            send_user_credentials_email(
-                recipient_email,
-                name,
-                role,
-                username,
-                password,
-                allowed_events,
-                allowed_chatbots,
-            )
-        except Exception as e:
-            # Log error but don't crash the thread
-            print(f"Background email failed for {recipient_email}: {str(e)}")
-
-
-def send_bulk_emails_background(app, credentials_list):
-    """Send multiple emails in background thread with app context"""
-    with app.app_context():
-        for cred in credentials_list:
-            try:
-                send_user_credentials_email(
-                    recipient_email=cred['email'],
-                    name=cred['name'],
-                    role=cred['role'],
-                    username=cred.get('username') or '',
-                    password=cred['password'],
-                    allowed_events=cred.get('allowed_events'),
-                    allowed_chatbots=cred.get('allowed_chatbots')
-                )
-            except Exception as e:
-                print(f"Background email failed for {cred['email']}: {str(e)}")
-
 
 def _parse_year_filter():
     raw_year = request.args.get('year', type=int)
@@ -771,14 +691,19 @@ def create_user(user):
 
     db.session.commit()
 
-    # Send email in background thread so admin doesn't wait
-    app = current_app._get_current_object()
-    thread = threading.Thread(
-        target=send_email_background,
-        args=(app, effective_email, name, role, username, password, assigned_event_names, assigned_chatbot_names)
+    # Queue the credentials email; the delivery worker sends it so admin doesn't wait
+    enqueue_emails(
+        [_credentials_email({
+            'email': effective_email,
+            'role': role,
+            'username': username,
+            'password': password,
+            'allowed_events': assigned_event_names,
+            'allowed_chatbots': assigned_chatbot_names,
+        }, user_id=new_user.id)],
+        batch_key=f'user_create:{new_user.id}',
+        created_by_id=user.id,
     )
-    thread.daemon = True
-    thread.start()
 
     assigned_count = len(normalized_chatbot_ids) if normalized_chatbot_ids else 0
     db.session.commit()
@@ -878,6 +803,17 @@ def delete_user(user, user_id):
 
     # Remove participant links so chatbot participant counts stay accurate
     ChatbotParticipant.query.filter_by(user_id=user_id).delete()
+
+    # Guests and messages go with the user (ORM cascade); reclaim their files.
+    tombstone_assets(
+        [row[0] for row in db.session.query(Guest.photo).filter(
+            Guest.user_id == user_id, Guest.photo.isnot(None)
+        )]
+        + [row[0] for row in db.session.query(Message.image_url).filter(
+            Message.user_id == user_id, Message.image_url.like('%uploads/%')
+        )],
+        'user_deleted'
+    )
     
     # Now delete the user
     db.session.delete(target_user)
@@ -889,6 +825,119 @@ def delete_user(user, user_id):
     }), 200
 
 
+def _normalize_bulk_user_ids(requested_ids):
+    normalized_ids = []
+    seen_ids = set()
+    for raw_id in requested_ids:
+        try:
+            parsed_id = int(raw_id)
+        except (TypeError, ValueError):
+            continue
+        if parsed_id > 0 and parsed_id not in seen_ids:
+            seen_ids.add(parsed_id)
+            normalized_ids.append(parsed_id)
+    return normalized_ids
+
+
+def _chunked(values, size=BULK_USER_CHUNK_SIZE):
+    for index in range(0, len(values), size):
+        yield values[index:index + size]
+
+
+def _existing_user_ids(user_ids):
+    existing_ids = set()
+    for chunk in _chunked(user_ids):
+        existing_ids.update(
+            row[0] for row in db.session.query(User.id).filter(User.id.in_(chunk)).all()
+        )
+    return existing_ids
+
+
+def _bulk_set_users_active(user_ids, active):
+    """Flip the active flag with one UPDATE per chunk; returns rows changed."""
+    updated_count = 0
+    for chunk in _chunked(user_ids):
+        updated_count += db.session.query(User).filter(
+            User.id.in_(chunk),
+            or_(User.active.is_(None), User.active != active)
+        ).update({User.active: active}, synchronize_session=False)
+    db.session.commit()
+    return updated_count
+
+
+def _bulk_delete_users(user_ids):
+    """
+    Delete users and their dependent rows with set-based statements.
+
+    Mirrors the ORM cascades on User (messages, conversations, guests, OTPs
+    deleted; WhatsApp/Drive history detached) without loading any rows.
+    Guest photos and uploaded message images are tombstoned in the same
+    transaction for the asset reclaimer. Returns the affected counts.
+    """
+    counts = {
+        'users': 0,
+        'messages': 0,
+        'conversations': 0,
+        'guests': 0,
+        'login_otps': 0,
+        'session_tokens': 0,
+        'participants': 0,
+    }
+    for chunk in _chunked(user_ids):
+        conversation_ids = db.session.query(Conversation.id).filter(Conversation.user_id.in_(chunk))
+        message_filter = or_(Message.user_id.in_(chunk), Message.conversation_id.in_(conversation_ids))
+
+        # Files referenced by the rows about to go. Query deletes bypass the
+        # ORM flush hook, so blob references are released here as well.
+        guest_photo_counts = db.session.query(Guest.photo, func.count(Guest.id)).filter(
+            Guest.user_id.in_(chunk),
+            Guest.photo.isnot(None)
+        ).group_by(Guest.photo).all()
+        message_image_counts = db.session.query(Message.image_url, func.count(Message.id)).filter(
+            message_filter,
+            Message.image_url.isnot(None)
+        ).group_by(Message.image_url).all()
+
+        released = {}
+        for path, count in guest_photo_counts + message_image_counts:
+            released[path] = released.get(path, 0) - count
+        adjust_blob_references(db.session.connection(), released)
+        # Generated images are kept, as for a single conversation delete.
+        tombstone_assets(
+            [photo for photo, _ in guest_photo_counts]
+            + [url for url, _ in message_image_counts if 'static/generated/' not in url],
+            'user_deleted'
+        )
+
+        counts['messages'] += Message.query.filter(message_filter).delete(synchronize_session=False)
+        counts['conversations'] += Conversation.query.filter(
+            Conversation.user_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        counts['guests'] += Guest.query.filter(Guest.user_id.in_(chunk)).delete(synchronize_session=False)
+        counts['login_otps'] += LoginOTP.query.filter(LoginOTP.user_id.in_(chunk)).delete(synchronize_session=False)
+        counts['session_tokens'] += SessionToken.query.filter(
+            SessionToken.user_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        counts['participants'] += ChatbotParticipant.query.filter(
+            ChatbotParticipant.user_id.in_(chunk)
+        ).delete(synchronize_session=False)
+
+        WhatsAppSendHistory.query.filter(WhatsAppSendHistory.user_id.in_(chunk)).update(
+            {WhatsAppSendHistory.user_id: None}, synchronize_session=False
+        )
+        DriveImageBackup.query.filter(DriveImageBackup.user_id.in_(chunk)).update(
+            {DriveImageBackup.user_id: None}, synchronize_session=False
+        )
+
+        counts['users'] += User.query.filter(User.id.in_(chunk)).delete(synchronize_session=False)
+
+    db.session.commit()
+    # Rows were removed behind the session's back; drop any stale identities.
+    db.session.expire_all()
+
+    return counts
+
+
 @admin_bp.route('/users/bulk-delete', methods=['POST', 'DELETE'])
 @token_required
 @admin_required
@@ -901,14 +950,7 @@ def bulk_delete_users(user):
     if not isinstance(requested_ids, list) or not requested_ids:
         return jsonify({'success': False, 'message': 'user_ids list is required'}), 400
 
-    normalized_ids = []
-    for raw_id in requested_ids:
-        try:
-            parsed_id = int(raw_id)
-        except (TypeError, ValueError):
-            continue
-        if parsed_id > 0 and parsed_id not in normalized_ids:
-            normalized_ids.append(parsed_id)
+    normalized_ids = _normalize_bulk_user_ids(requested_ids)
 
     if not normalized_ids:
         return jsonify({'success': False, 'message': 'No valid user ids provided'}), 400
@@ -926,13 +968,24 @@ def bulk_delete_users(user):
             'requested_count': len(normalized_ids),
             'skipped': {
                 'self': self_skipped_ids,
-                'not_found': []
+                'not_found': [],
+                'owns_chatbots': []
             }
         }), 400
 
-    existing_users = User.query.filter(User.id.in_(candidate_ids)).all()
-    existing_ids = [u.id for u in existing_users]
-    not_found_ids = [uid for uid in candidate_ids if uid not in existing_ids]
+    existing_id_set = _existing_user_ids(candidate_ids)
+    not_found_ids = [uid for uid in candidate_ids if uid not in existing_id_set]
+
+    # Chatbots keep a non-null creator reference, so their creators cannot be removed.
+    chatbot_owner_ids = set()
+    for chunk in _chunked(sorted(existing_id_set)):
+        chatbot_owner_ids.update(
+            row[0] for row in db.session.query(Chatbot.created_by_id).filter(
+                Chatbot.created_by_id.in_(chunk)
+            ).distinct().all()
+        )
+    owner_skipped_ids = [uid for uid in candidate_ids if uid in chatbot_owner_ids]
+    existing_ids = [uid for uid in candidate_ids if uid in existing_id_set and uid not in chatbot_owner_ids]
 
     if not existing_ids:
         return jsonify({
@@ -943,27 +996,26 @@ def bulk_delete_users(user):
             'skipped': {
                 'self': self_skipped_ids,
                 'not_found': not_found_ids,
+                'owns_chatbots': owner_skipped_ids
             }
         }), 404
 
-    SessionToken.query.filter(SessionToken.user_id.in_(existing_ids)).delete(synchronize_session=False)
-    ChatbotParticipant.query.filter(ChatbotParticipant.user_id.in_(existing_ids)).delete(synchronize_session=False)
-
-    # Use ORM row deletes so SQLAlchemy cascade rules remove dependent rows
-    # (messages, conversations, guests, OTP records, etc.) before deleting users.
-    for target_user in existing_users:
-        db.session.delete(target_user)
-
-    db.session.commit()
+    try:
+        counts = _bulk_delete_users(existing_ids)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Bulk delete failed: {str(e)}'}), 500
 
     return jsonify({
         'success': True,
-        'message': f'{len(existing_ids)} user(s) deleted successfully',
-        'deleted_count': len(existing_ids),
+        'message': f"{counts['users']} user(s) deleted successfully",
+        'deleted_count': counts['users'],
         'requested_count': len(normalized_ids),
+        'affected': counts,
         'skipped': {
             'self': self_skipped_ids,
             'not_found': not_found_ids,
+            'owns_chatbots': owner_skipped_ids
         }
     }), 200
 
@@ -979,21 +1031,14 @@ def bulk_activate_users(user):
     if not isinstance(requested_ids, list) or not requested_ids:
         return jsonify({'success': False, 'message': 'user_ids list is required'}), 400
 
-    normalized_ids = []
-    for raw_id in requested_ids:
-        try:
-            parsed_id = int(raw_id)
-        except (TypeError, ValueError):
-            continue
-        if parsed_id > 0 and parsed_id not in normalized_ids:
-            normalized_ids.append(parsed_id)
+    normalized_ids = _normalize_bulk_user_ids(requested_ids)
 
     if not normalized_ids:
         return jsonify({'success': False, 'message': 'No valid user ids provided'}), 400
 
-    existing_users = User.query.filter(User.id.in_(normalized_ids)).all()
-    existing_ids = [u.id for u in existing_users]
-    not_found_ids = [uid for uid in normalized_ids if uid not in existing_ids]
+    existing_id_set = _existing_user_ids(normalized_ids)
+    existing_ids = [uid for uid in normalized_ids if uid in existing_id_set]
+    not_found_ids = [uid for uid in normalized_ids if uid not in existing_id_set]
 
     if not existing_ids:
         return jsonify({
@@ -1004,15 +1049,13 @@ def bulk_activate_users(user):
             'not_found': not_found_ids
         }), 404
 
-    for target_user in existing_users:
-        target_user.active = True
-
-    db.session.commit()
+    changed_count = _bulk_set_users_active(existing_ids, True)
 
     return jsonify({
         'success': True,
         'message': f'{len(existing_ids)} user(s) activated successfully',
         'activated_count': len(existing_ids),
+        'changed_count': changed_count,
         'requested_count': len(normalized_ids),
         'not_found': not_found_ids
     }), 200
@@ -1029,14 +1072,7 @@ def bulk_deactivate_users(user):
     if not isinstance(requested_ids, list) or not requested_ids:
         return jsonify({'success': False, 'message': 'user_ids list is required'}), 400
 
-    normalized_ids = []
-    for raw_id in requested_ids:
-        try:
-            parsed_id = int(raw_id)
-        except (TypeError, ValueError):
-            continue
-        if parsed_id > 0 and parsed_id not in normalized_ids:
-            normalized_ids.append(parsed_id)
+    normalized_ids = _normalize_bulk_user_ids(requested_ids)
 
     if not normalized_ids:
         return jsonify({'success': False, 'message': 'No valid user ids provided'}), 400
@@ -1058,9 +1094,9 @@ def bulk_deactivate_users(user):
             }
         }), 400
 
-    existing_users = User.query.filter(User.id.in_(candidate_ids)).all()
-    existing_ids = [u.id for u in existing_users]
-    not_found_ids = [uid for uid in candidate_ids if uid not in existing_ids]
+    existing_id_set = _existing_user_ids(candidate_ids)
+    existing_ids = [uid for uid in candidate_ids if uid in existing_id_set]
+    not_found_ids = [uid for uid in candidate_ids if uid not in existing_id_set]
 
     if not existing_ids:
         return jsonify({
@@ -1074,15 +1110,13 @@ def bulk_deactivate_users(user):
             }
         }), 404
 
-    for target_user in existing_users:
-        target_user.active = False
-
-    db.session.commit()
+    changed_count = _bulk_set_users_active(existing_ids, False)
 
     return jsonify({
         'success': True,
         'message': f'{len(existing_ids)} user(s) deactivated successfully',
         'deactivated_count': len(existing_ids),
+        'changed_count': changed_count,
         'requested_count': len(normalized_ids),
         'skipped': {
             'self': self_skipped_ids,
@@ -1291,6 +1325,33 @@ def analytics_overview(user):
         ],
     }), 200
 
+@admin_bp.route('/analytics/timeseries', methods=['GET'])
+@token_required
+@admin_required
+def analytics_timeseries(user):
+    """
+    Bucketed counts for one or more chatbots.
+
+    Query params: bucket (minute|hour|day), metrics (comma separated:
+    messages, images, logins, whatsapp_sends, drive_backups), chatbot_ids
+    (comma separated or repeated chatbot_id; omit for all chatbots), start/end
+    (ISO 8601 UTC; omitting end gives a live window), split=chatbot for
+    per-chatbot series. Honors If-None-Match.
+    """
+
+    try:
+        params = parse_timeseries_request(request.args)
+        payload, etag = get_timeseries(params)
+    except AnalyticsServiceError as exc:
+        return jsonify({'success': False, 'message': exc.message}), exc.status_code
+
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    return response
+
 @admin_bp.route('/chatbots/<int:chatbot_id>', methods=['GET'])
 @token_required
 @admin_required
@@ -1314,34 +1375,33 @@ def get_chatbot(user, chatbot_id):
 @token_required
 @admin_required
 def delete_chatbot(user, chatbot_id):
-    """Delete chatbot and clean up related background/guest image files."""
+    """
+    Delete chatbot. Its background, guest photos and uploaded message images
+    are tombstoned for the asset reclaimer (files still used elsewhere stay).
+    """
     
     chatbot = Chatbot.query.get(chatbot_id)
     
     if not chatbot:
         return jsonify({'success': False, 'message': 'Chatbot not found'}), 404
 
-    files_to_delete = []
-    if chatbot.background_image:
-        files_to_delete.append(chatbot.background_image)
-
-    guest_photo_paths = [
-        str(guest.photo).strip()
-        for guest in (chatbot.guests or [])
-        if getattr(guest, 'photo', None)
-    ]
+    file_paths = [chatbot.background_image]
+    file_paths.extend(
+        row[0] for row in db.session.query(Guest.photo).filter(
+            Guest.chatbot_id == chatbot.id,
+            Guest.photo.isnot(None)
+        ).distinct()
+    )
+    file_paths.extend(
+        row[0] for row in db.session.query(Message.image_url).filter(
+            Message.chatbot_id == chatbot.id,
+            Message.image_url.like('%uploads/%')
+        ).distinct()
+    )
+    tombstone_assets(file_paths, 'chatbot_deleted')
     
     db.session.delete(chatbot)
     db.session.commit()
-
-    # Remove background file and guest image files that are no longer referenced.
-    for file_path in set(files_to_delete):
-        _delete_uploaded_file(file_path)
-
-    for photo_path in set(guest_photo_paths):
-        still_referenced = Guest.query.filter_by(photo=photo_path).first() is not None
-        if not still_referenced:
-            _delete_uploaded_file(photo_path)
     
     return jsonify({
         'success': True,
@@ -1398,20 +1458,139 @@ def add_guest(user, chatbot_id):
         'data': guest.to_dict()
     }), 201
 
+def _guest_listing_query():
+    """Guest rows joined with the chatbot columns Guest.to_dict exposes."""
+    return db.session.query(
+        Guest.id,
+        Guest.chatbot_id,
+        Guest.name,
+        Guest.photo,
+        Guest.active,
+        Chatbot.event_name,
+        Chatbot.name.label('chatbot_name'),
+        Chatbot.active.label('chatbot_active'),
+    ).outerjoin(Chatbot, Chatbot.id == Guest.chatbot_id)
+
+
+def _serialize_guest_row(row):
+    data = {
+        'id': row.id,
+        'chatbot_id': row.chatbot_id,
+        'name': row.name,
+        'photo': row.photo,
+        # Same shape as Guest.to_dict()
+        'photo_variants': derivative_urls(row.photo),
+        'active': row.active,
+    }
+    if row.chatbot_name is not None:
+        data['event_name'] = row.event_name
+        data['chatbot_name'] = row.chatbot_name
+        data['chatbot_active'] = row.chatbot_active
+    return data
+
+
+def _apply_guest_filters(query):
+    chatbot_id = request.args.get('chatbot_id', type=int)
+    if chatbot_id:
+        query = query.filter(Guest.chatbot_id == chatbot_id)
+
+    event_name = (request.args.get('event_name') or '').strip()
+    if event_name:
+        query = query.filter(func.lower(func.trim(Chatbot.event_name)) == event_name.lower())
+
+    status = (request.args.get('status') or '').strip().lower()
+    if status == 'active':
+        query = query.filter(Guest.active.is_(True))
+    elif status == 'inactive':
+        query = query.filter(Guest.active.is_(False))
+
+    return query
+
+
 @admin_bp.route('/guests', methods=['GET'])
 @token_required
 @admin_required
 def list_all_guests(user):
-    """List all guests across all chatbots"""
-    
-    # Eager load chatbot relationship to avoid N+1 queries
-    guests = Guest.query.options(db.joinedload(Guest.chatbot)).all()
-    
-    return jsonify({
+    """
+    List guests across all chatbots, one keyset page at a time.
+
+    Query params: limit (default 50, max 500), after_id (cursor from the
+    previous page's next_after_id), chatbot_id, event_name, status
+    (active|inactive). The first page (no after_id), or any page requested
+    with include_stats=1, also carries the filtered total, overall stats and
+    the event names for the filter dropdown.
+    format=jsonl streams every matching guest as JSON lines instead.
+    """
+
+    if (request.args.get('format') or '').strip().lower() == 'jsonl':
+        return _stream_guest_export()
+
+    limit = request.args.get('limit', 50, type=int)
+    limit = max(1, min(limit or 50, 500))
+    after_id = request.args.get('after_id', type=int)
+
+    query = _apply_guest_filters(_guest_listing_query())
+    page_query = query
+    if after_id:
+        page_query = page_query.filter(Guest.id > after_id)
+
+    # Fetch one extra row to learn whether another page exists.
+    rows = page_query.order_by(Guest.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    payload = {
         'success': True,
-        'data': [guest.to_dict() for guest in guests],
-        'count': len(guests)
-    }), 200
+        'data': [_serialize_guest_row(row) for row in rows],
+        'count': len(rows),
+        'limit': limit,
+        'has_more': has_more,
+        'next_after_id': rows[-1].id if has_more else None,
+    }
+
+    if not after_id or _to_bool(request.args.get('include_stats')):
+        payload['total'] = query.order_by(None).with_entities(func.count(Guest.id)).scalar() or 0
+
+        total_guests, active_guests = db.session.query(
+            func.count(Guest.id),
+            func.sum(case((Guest.active.is_(True), 1), else_=0))
+        ).one()
+        payload['stats'] = {
+            'total': total_guests or 0,
+            'active': int(active_guests or 0),
+            'inactive': (total_guests or 0) - int(active_guests or 0),
+        }
+
+        payload['events'] = sorted({
+            str(row[0]).strip()
+            for row in db.session.query(Chatbot.event_name).join(
+                Guest, Guest.chatbot_id == Chatbot.id
+            ).distinct().all()
+            if row[0] and str(row[0]).strip()
+        }, key=str.lower)
+
+    return jsonify(payload), 200
+
+
+def _stream_guest_export():
+    query = _apply_guest_filters(_guest_listing_query())
+    batch_size = 1000
+
+    def generate():
+        last_id = 0
+        while True:
+            rows = query.filter(Guest.id > last_id).order_by(Guest.id.asc()).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                yield json.dumps(_serialize_guest_row(row)) + '\n'
+            last_id = rows[-1].id
+            if len(rows) < batch_size:
+                break
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename=guests.jsonl'
+    return response
 
 
 @admin_bp.route('/guests', methods=['POST'])
@@ -1440,7 +1619,7 @@ def create_guest(user):
 
     photo_path = None
     if 'photo' in request.files:
-        photo_path = _save_guest_image(request.files.get('photo'), guest_name)
+        photo_path = _save_guest_image(request.files.get('photo'))
         if photo_path == 'invalid-type':
             return jsonify({'success': False, 'message': 'Invalid image type. Allowed: png, jpg, jpeg, gif, webp'}), 400
     
@@ -1490,13 +1669,9 @@ def delete_guest(user, guest_id):
     if not guest:
         return jsonify({'success': False, 'message': 'Guest not found'}), 404
 
-    photo_path = guest.photo
-    
+    tombstone_assets([guest.photo], 'guest_deleted')
     db.session.delete(guest)
     db.session.commit()
-
-    if photo_path:
-        _delete_uploaded_file(photo_path)
     
     return jsonify({
         'success': True,
@@ -1536,17 +1711,20 @@ def update_guest(user, guest_id):
 
     auto_photo_name = guest.name
 
+    replaced_photo_path = None
     if 'photo' in request.files:
-        photo_path = _save_guest_image(request.files.get('photo'), auto_photo_name)
+        photo_path = _save_guest_image(request.files.get('photo'))
         if photo_path == 'invalid-type':
             return jsonify({'success': False, 'message': 'Invalid image type. Allowed: png, jpg, jpeg, gif, webp'}), 400
         if photo_path:
+            replaced_photo_path = guest.photo
             guest.photo = photo_path
     elif name_updated and guest.photo:
         renamed_photo_path = _rename_guest_image(guest.photo, auto_photo_name)
         if renamed_photo_path:
             guest.photo = renamed_photo_path
     
+    tombstone_assets([replaced_photo_path], 'guest_photo_replaced')
     db.session.commit()
     
     # Reload with chatbot relationship
@@ -1563,481 +1741,1144 @@ def update_guest(user, guest_id):
 # Import Users
 # ============================================
 
+IMPORT_DETAIL_LIMIT = 20
+
+
+USER_IMPORT_EXTENSIONS = ('xlsx', 'csv')
+CSV_SNIFF_BYTES = 64 * 1024
+
+
+class ImportFileError(ValueError):
+    """Uploaded import file cannot be read as requested (bad sheet, encoding...)."""
+
+
+def _import_file_extension(filename):
+    extension = os.path.splitext(str(filename or ''))[1].lower().lstrip('.')
+    return extension if extension in USER_IMPORT_EXTENSIONS else None
+
+
+def _resolve_xlsx_sheet(workbook, sheet):
+    """Pick a worksheet by name or 1-based position; the active sheet by default."""
+    sheet = str(sheet or '').strip()
+    if not sheet:
+        return workbook.active
+
+    if sheet in workbook.sheetnames:
+        return workbook[sheet]
+    if sheet.isdigit() and 1 <= int(sheet) <= len(workbook.sheetnames):
+        return workbook.worksheets[int(sheet) - 1]
+
+    raise ImportFileError(
+        f"Sheet '{sheet}' not found. Available sheets: {', '.join(workbook.sheetnames)}"
+    )
+
+
+def _iter_xlsx_rows(file_path, sheet=None):
+    """Stream rows from one sheet without loading the whole workbook."""
+    from openpyxl import load_workbook  # imported on first use; slow to import
+
+    workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+    try:
+        for row in _resolve_xlsx_sheet(workbook, sheet).iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _xlsx_sheet_names(file_path, sheet=None):
+    """Returns (all sheet names, name of the sheet an import would read)."""
+    from openpyxl import load_workbook  # imported on first use; slow to import
+
+    workbook = load_workbook(filename=file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames), _resolve_xlsx_sheet(workbook, sheet).title
+    finally:
+        workbook.close()
+
+
+def _iter_csv_rows(file_path):
+    """
+    Stream CSV rows through an incremental text decoder. UTF-8 (with or
+    without BOM) is expected; files that are not valid UTF-8 in their first
+    block are read as cp1252, the usual Excel "CSV" export encoding.
+    """
+    with open(file_path, 'rb') as handle:
+        head = handle.read(CSV_SNIFF_BYTES)
+
+    encoding = 'utf-8-sig'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut at the sniff boundary is still UTF-8.
+        if exc.start < len(head) - 3:
+            encoding = 'cp1252'
+
+    sample = head.decode(encoding, errors='ignore')
+    try:
+        dialect = csv.Sniffer().sniff(sample.split('\n', 20)[0] if sample else '', delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+
+    with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as text_handle:
+        for row in csv.reader(text_handle, dialect):
+            yield row
+
+
+def _iter_import_rows(file_path, extension, sheet=None):
+    """Rows of an uploaded import file; the first row is the header."""
+    if extension == 'csv':
+        if str(sheet or '').strip():
+            raise ImportFileError('CSV files have a single sheet; remove the sheet selection')
+        return _iter_csv_rows(file_path)
+    return _iter_xlsx_rows(file_path, sheet)
+
+
+def _import_preview_token(file_digest, sheet=None):
+    """Preview cache key: the file's sha256, scoped to the selected sheet."""
+    sheet = str(sheet or '').strip()
+    if not sheet:
+        return file_digest
+    return hashlib.sha256(f'{file_digest}:{sheet}'.encode('utf-8')).hexdigest()
+
+
+def _import_preview_key(key_digest, sheet=None):
+    """
+    Fernet key for a preview's passwords. It comes from a second hash of the
+    file's bytes, so neither the stored token nor anything else in the
+    database recovers it.
+    """
+    material = hashlib.sha256(f'{key_digest}:{str(sheet or "").strip()}'.encode('utf-8')).digest()
+    return base64.urlsafe_b64encode(material).decode('ascii')
+
+
+def _seal_import_passwords(rows, preview_key):
+    """Rows without their passwords, plus the passwords encrypted under preview_key."""
+    passwords = {str(parsed['row_index']): parsed['password'] for parsed in rows}
+    sealed = Fernet(preview_key.encode('ascii')).encrypt(json.dumps(passwords).encode('utf-8'))
+    return (
+        [{key: value for key, value in parsed.items() if key != 'password'} for parsed in rows],
+        sealed.decode('ascii'),
+    )
+
+
+def _open_import_passwords(preview, preview_key):
+    """{row_index: password} for a stored preview, or None when the key does not fit."""
+    try:
+        data = Fernet(str(preview_key or '').encode('ascii')).decrypt(preview.passwords.encode('ascii'))
+    except (InvalidToken, TypeError, ValueError):
+        return None
+    return {int(row_index): password for row_index, password in json.loads(data).items()}
+
+
+def _spool_import_upload(file_storage, extension):
+    """
+    Copy an upload to the private import spool while hashing it.
+    Returns (file_path, sha256 hex digest, preview key digest).
+    """
+    import_dir = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(import_dir, exist_ok=True)
+    file_path = os.path.join(import_dir, f"{uuid.uuid4().hex}.{extension}")
+
+    digest = hashlib.sha256()
+    key_digest = hashlib.sha256(b'user-import-preview-key\0')
+    with open(file_path, 'wb') as handle:
+        while True:
+            chunk = file_storage.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            key_digest.update(chunk)
+            handle.write(chunk)
+
+    return file_path, digest.hexdigest(), key_digest.hexdigest()
+
+
+def _remove_spooled_file(file_path):
+    if not file_path:
+        return
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def _resolve_import_role(role, default_role, actor_role):
+    role = str(role or '').strip().lower() or default_role
+    if role not in VALID_USER_ROLES:
+        role = default_role
+
+    # Prevent regular admin users from importing/creating admin accounts
+    if role == 'admin' and actor_role == 'admin':
+        role = 'user'
+    return role
+
+
+def _parse_user_import_rows(rows):
+    """
+    Parse spreadsheet rows for a user import.
+
+    `rows` is any iterable whose first item is the header row. Returns
+    (parsed_rows, summary, duplicate_usernames_in_file). Roles are kept as
+    written in the file and resolved against the default role at import time.
+    """
+    rows = iter(rows)
+    header_row = next(rows, None)
+    headers = [
+        _normalize_excel_header_key(cell) if cell is not None else ''
+        for cell in (header_row or [])
+    ]
+    header_map = {name: idx for idx, name in enumerate(headers) if name}
+
+    def get_value(row, keys, default=''):
+        for key in keys:
+            index = header_map.get(key)
+            if index is not None and index < len(row):
+                value = row[index]
+                if value is not None:
+                    return _stringify_excel_cell(value)
+        return default
+
+    def parse_bool(value, default=True):
+        if value is None or value == '':
+            return default
+        return str(value).strip().lower() in ['1', 'true', 'yes', 'y', 'active']
+
+    summary = {
+        'total_rows': 0,
+        'skipped_rows': 0,
+        'missing_required_rows': 0,
+        'invalid_email_rows': 0,
+        'invalid_whatsapp_rows': 0,
+        'detected_headers': [key for key in headers if key],
+        'required_header_status': {
+            'email': bool(
+                header_map.get('email') is not None
+                or header_map.get('mail') is not None
+                or header_map.get('email_address') is not None
+            ),
+            'username': bool(
+                header_map.get('username') is not None
+                or header_map.get('user_name') is not None
+                or header_map.get('user') is not None
+            ),
+            'whatsapp_number': bool(
+                header_map.get('whatsapp_number') is not None
+                or header_map.get('whatsapp') is not None
+                or header_map.get('phone') is not None
+                or header_map.get('mobile') is not None
+                or header_map.get('whatsappnumber') is not None
+            ),
+        },
+        'issue_details': {
+            'missing_required': [],
+            'invalid_email': [],
+            'invalid_whatsapp': [],
+            'duplicate_username_in_file': [],
+            'truncated_to': IMPORT_DETAIL_LIMIT,
+        },
+    }
+    issue_details = summary['issue_details']
+
+    def add_detail(kind, detail):
+        if len(issue_details[kind]) < IMPORT_DETAIL_LIMIT:
+            issue_details[kind].append(detail)
+
+    parsed_rows = []
+    seen_username_keys = set()
+    duplicate_usernames_in_file = []
+
+    if header_row is None:
+        return parsed_rows, summary, duplicate_usernames_in_file
+
+    for row_index, row in enumerate(rows, start=2):
+        if row is None or all(cell is None or str(cell).strip() == '' for cell in row):
+            continue
+
+        summary['total_rows'] += 1
+
+        name = get_value(row, ['name', 'full_name', 'fullname'])
+        email = get_value(row, ['email', 'mail', 'email_address']).lower()
+        role = get_value(row, ['role', 'user_role']).lower()
+        raw_username = get_value(row, ['username', 'user_name', 'user'])
+        raw_whatsapp_number = get_value(row, ['whatsapp_number', 'whatsapp', 'phone', 'mobile', 'whatsappnumber'])
+        password = get_value(row, ['password', 'pass'])
+        active_value = get_value(row, ['active', 'is_active'], '')
+
+        if not email or not raw_username or not raw_whatsapp_number:
+            summary['missing_required_rows'] += 1
+            summary['skipped_rows'] += 1
+            add_detail('missing_required', {
+                'row': row_index,
+                'missing_fields': [
+                    field for field, value in (
+                        ('email', email),
+                        ('username', raw_username),
+                        ('whatsapp_number', raw_whatsapp_number),
+                    ) if not value
+                ],
+            })
+            continue
+
+        if not is_valid_email(email):
+            summary['invalid_email_rows'] += 1
+            summary['skipped_rows'] += 1
+            add_detail('invalid_email', {'row': row_index, 'email': email})
+            continue
+
+        normalized_whatsapp_number = normalize_indian_whatsapp_number(raw_whatsapp_number)
+        if not normalized_whatsapp_number:
+            summary['invalid_whatsapp_rows'] += 1
+            summary['skipped_rows'] += 1
+            add_detail('invalid_whatsapp', {'row': row_index, 'whatsapp_number': str(raw_whatsapp_number or '')})
+            continue
+
+        username = str(raw_username).strip()
+        username_key = _username_key(username)
+        if username_key in seen_username_keys:
+            duplicate_usernames_in_file.append({
+                'row': row_index,
+                'username': username,
+            })
+            add_detail('duplicate_username_in_file', {'row': row_index, 'username': username})
+            summary['skipped_rows'] += 1
+            continue
+
+        seen_username_keys.add(username_key)
+        display_name = (name or username or email).strip()
+
+        parsed_rows.append({
+            'row_index': row_index,
+            'name': display_name,
+            'email': _email_key(email),
+            'username': username,
+            'username_key': username_key,
+            'whatsapp_number': normalized_whatsapp_number,
+            'role': role,
+            'active': parse_bool(active_value, True),
+            'password': password or '123',
+        })
+
+    return parsed_rows, summary, duplicate_usernames_in_file
+
+
+def _assign_unique_import_emails(parsed_rows, existing_email_keys):
+    """Rewrite clashing emails (in file or in DB) to local+N@domain; returns the adjusted count."""
+    reserved_email_keys = set()
+    adjusted_count = 0
+    for parsed in parsed_rows:
+        email = parsed['email']
+        if email in reserved_email_keys or email in existing_email_keys:
+            email, email_auto_adjusted = _make_unique_email_with_reserved(email, reserved_email_keys)
+            if email_auto_adjusted:
+                adjusted_count += 1
+        reserved_email_keys.add(_email_key(email))
+        parsed['email'] = email
+    return adjusted_count
+
+
+def _validate_user_import(rows):
+    """
+    Parse rows and check them against existing users with one chunked lookup
+    per key type. Returns (rows ready to insert, summary). The summary is
+    what the preview shows and what a later import commits from.
+    """
+    parsed_rows, summary, duplicate_usernames_in_file = _parse_user_import_rows(rows)
+    issue_details = summary['issue_details']
+
+    existing_username_emails = {}
+    for chunk in _chunked(sorted({parsed['username_key'] for parsed in parsed_rows})):
+        existing_username_emails.update(_existing_username_emails(chunk))
+
+    existing_email_keys = set()
+    for chunk in _chunked(sorted({parsed['email'] for parsed in parsed_rows})):
+        existing_email_keys.update(_existing_email_keys(chunk))
+
+    existing_username_conflicts = []
+    already_imported_rows = 0
+    issue_details['duplicate_email_in_file'] = []
+    issue_details['duplicate_email_existing'] = []
+    issue_details['duplicate_username_existing'] = []
+    duplicate_email_rows = 0
+    existing_email_rows = 0
+    seen_email_keys = set()
+    ready_rows = []
+
+    for parsed in parsed_rows:
+        email_key = parsed['email']
+        existing_email = existing_username_emails.get(parsed['username_key'])
+        if existing_email is not None and existing_email == email_key:
+            # Same username and email as an existing user: a row from an
+            # earlier (possibly interrupted) import of this file.
+            already_imported_rows += 1
+            summary['skipped_rows'] += 1
+            seen_email_keys.add(email_key)
+            continue
+
+        if email_key in seen_email_keys:
+            duplicate_email_rows += 1
+            if len(issue_details['duplicate_email_in_file']) < IMPORT_DETAIL_LIMIT:
+                issue_details['duplicate_email_in_file'].append({'row': parsed['row_index'], 'email': email_key})
+        elif email_key in existing_email_keys:
+            existing_email_rows += 1
+            if len(issue_details['duplicate_email_existing']) < IMPORT_DETAIL_LIMIT:
+                issue_details['duplicate_email_existing'].append({'row': parsed['row_index'], 'email': email_key})
+        seen_email_keys.add(email_key)
+
+        if existing_email is not None:
+            existing_username_conflicts.append({
+                'row': parsed['row_index'],
+                'username': parsed['username'],
+            })
+            if len(issue_details['duplicate_username_existing']) < IMPORT_DETAIL_LIMIT:
+                issue_details['duplicate_username_existing'].append({
+                    'row': parsed['row_index'],
+                    'username': parsed['username'],
+                })
+            summary['skipped_rows'] += 1
+            continue
+
+        ready_rows.append(parsed)
+
+    summary['auto_adjusted_email_rows'] = _assign_unique_import_emails(ready_rows, existing_email_keys)
+    summary['ready_rows'] = len(ready_rows)
+    summary['already_imported_rows'] = already_imported_rows
+    summary['duplicate_email_rows'] = duplicate_email_rows
+    summary['existing_email_rows'] = existing_email_rows
+    summary['duplicate_username_in_file_rows'] = len(duplicate_usernames_in_file)
+    summary['duplicate_username_existing_rows'] = len(existing_username_conflicts)
+    summary['duplicate_username_rows'] = {
+        'in_file': duplicate_usernames_in_file[:200],
+        'existing_in_system': existing_username_conflicts[:200],
+    }
+    summary['duplicate_username_count'] = len(duplicate_usernames_in_file) + len(existing_username_conflicts)
+
+    return ready_rows, summary
+
+
+def _purge_expired_import_previews():
+    UserImportPreview.query.filter(
+        UserImportPreview.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _get_import_preview(token):
+    token = str(token or '').strip().lower()
+    if not token:
+        return None
+    preview = UserImportPreview.query.filter_by(token=token).first()
+    if not preview or preview.is_expired():
+        return None
+    return preview
+
+
+def _hash_import_passwords(passwords):
+    """
+    One salted hash per row, even when rows share a password, so equal
+    passwords never produce equal hashes. pbkdf2 releases the GIL, so the
+    rows are hashed on native threads.
+    """
+    return map_blocking(generate_password_hash, passwords, os.cpu_count() or 2)
+
+
+def _update_import_job(job_id, commit=True, **values):
+    values['updated_at'] = datetime.utcnow()
+    UserImportJob.query.filter_by(id=job_id).update(values, synchronize_session=False)
+    if commit:
+        db.session.commit()
+
+
+UNFINISHED_IMPORT_STATUSES = ('queued', 'validating', 'importing')
+
+
+def _import_job_stale_seconds(app):
+    return max(30, int(app.config.get('USER_IMPORT_STALE_SECONDS', 300)))
+
+
+def _heartbeat_import_job(app, job_id, stop_event):
+    """
+    Bump updated_at while the job's thread is alive, so a job whose process
+    died is told apart from one stuck in a long validation or chunk.
+    """
+    interval = _import_job_stale_seconds(app) / 5
+    with app.app_context():
+        while not stop_event.wait(interval):
+            try:
+                UserImportJob.query.filter(
+                    UserImportJob.id == job_id,
+                    UserImportJob.status.in_(UNFINISHED_IMPORT_STATUSES),
+                ).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+        db.session.remove()
+
+
+def _fail_stale_import_jobs():
+    """
+    Import threads die with their process (deploys, crashes, OOM kills).
+    Mark unfinished jobs whose heartbeat stopped as failed so they don't
+    report progress forever. Users from committed chunks stay imported.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=_import_job_stale_seconds(current_app))
+    changed = UserImportJob.query.filter(
+        UserImportJob.status.in_(UNFINISHED_IMPORT_STATUSES),
+        UserImportJob.updated_at < stale_before,
+    ).update(
+        {
+            'status': 'failed',
+            'error_message': 'Import was interrupted by a server restart. '
+                             'Users imported before that were kept; import the same file again '
+                             'to add the rest (rows already imported are skipped).',
+            'finished_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return changed
+
+
+def _run_user_import_job(app, job_id, file_path, actor_role, extension='xlsx', sheet=None, passwords=None):
+    """
+    Import users in chunks, persisting progress per chunk. Rows come from the
+    job's stored preview (with `passwords` decrypted from it) when it has one,
+    otherwise from the spooled file.
+    """
+    heartbeat_stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_import_job,
+        args=(app, job_id, heartbeat_stop),
+        daemon=True,
+    ).start()
+
+    with app.app_context():
+        try:
+            job = UserImportJob.query.get(job_id)
+            chatbot = Chatbot.query.get(job.chatbot_id) if job else None
+            if not job:
+                return
+            if not chatbot:
+                _update_import_job(
+                    job_id,
+                    status='failed',
+                    error_message='Selected event/chatbot not found',
+                    finished_at=datetime.utcnow(),
+                )
+                return
+
+            default_role = job.default_role
+            chunk_size = max(1, int(app.config.get('USER_IMPORT_CHUNK_SIZE', 500)))
+            _update_import_job(job_id, status='validating', started_at=datetime.utcnow())
+
+            preview = _get_import_preview(job.preview_token) if job.preview_token else None
+            if preview and passwords is not None:
+                valid_rows_to_import = json.loads(preview.rows)
+                summary = json.loads(preview.summary)
+                for parsed in valid_rows_to_import:
+                    parsed['password'] = passwords[parsed['row_index']]
+            elif file_path:
+                valid_rows_to_import, summary = _validate_user_import(
+                    _iter_import_rows(file_path, extension, sheet)
+                )
+            else:
+                _update_import_job(
+                    job_id,
+                    status='failed',
+                    error_message='Import preview expired. Upload the file again.',
+                    finished_at=datetime.utcnow(),
+                )
+                return
+
+            summary['event_name'] = chatbot.event_name
+            summary.pop('issue_details', None)
+
+            if summary.get('duplicate_username_count'):
+                _update_import_job(
+                    job_id,
+                    status='blocked',
+                    total_rows=summary['total_rows'],
+                    ready_rows=len(valid_rows_to_import),
+                    skipped_count=summary['skipped_rows'],
+                    summary=json.dumps(summary),
+                    error_message='Import blocked: duplicate usernames found. Fix duplicate usernames before importing.',
+                    finished_at=datetime.utcnow(),
+                )
+                return
+
+            if not valid_rows_to_import:
+                _update_import_job(
+                    job_id,
+                    status='failed',
+                    total_rows=summary['total_rows'],
+                    skipped_count=summary['skipped_rows'],
+                    summary=json.dumps(summary),
+                    error_message='No valid users imported. Check required columns and data format.',
+                    finished_at=datetime.utcnow(),
+                )
+                return
+
+            _update_import_job(
+                job_id,
+                status='importing',
+                total_rows=summary['total_rows'],
+                ready_rows=len(valid_rows_to_import),
+                skipped_count=summary['skipped_rows'],
+                summary=json.dumps(summary),
+            )
+
+            allowed_events = [chatbot.event_name] if chatbot.event_name else []
+            allowed_chatbots = [chatbot.name] if chatbot.name else []
+            email_batch_key = f'user_import:{job_id}'
+            processed_rows = 0
+            imported_count = 0
+            failed_count = 0
+            row_errors = []
+
+            for parsed in valid_rows_to_import:
+                parsed['role'] = _resolve_import_role(parsed.get('role'), default_role, actor_role)
+
+            def insert_rows(rows, password_hashes):
+                new_user_ids = db.session.scalars(
+                    insert(User).returning(User.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            'name': parsed['name'],
+                            'email': parsed['email'],
+                            'username': parsed['username'],
+                            'whatsapp_number': parsed['whatsapp_number'],
+                            'role': parsed['role'],
+                            'active': parsed['active'],
+                            'password_hash': password_hash,
+                        }
+                        for parsed, password_hash in zip(rows, password_hashes)
+                    ]
+                ).all()
+
+                # Freshly inserted users cannot already be participants.
+                db.session.execute(
+                    insert(ChatbotParticipant),
+                    [{'chatbot_id': chatbot.id, 'user_id': new_user_id} for new_user_id in new_user_ids]
+                )
+                # Queued in the same transaction, so every committed user gets its email.
+                enqueue_emails(
+                    [
+                        _credentials_email({
+                            'role': parsed['role'],
+                            'username': parsed['username'],
+                            'password': parsed['password'],
+                            'email': parsed['email'],
+                            'allowed_events': allowed_events,
+                            'allowed_chatbots': allowed_chatbots,
+                        }, user_id=new_user_id)
+                        for parsed, new_user_id in zip(rows, new_user_ids)
+                    ],
+                    batch_key=email_batch_key,
+                    created_by_id=job.created_by_id,
+                    commit=False,
+                )
+                return len(new_user_ids)
+
+            for chunk in _chunked(valid_rows_to_import, chunk_size):
+                password_hashes = _hash_import_passwords([parsed['password'] for parsed in chunk])
+                try:
+                    chunk_imported = insert_rows(chunk, password_hashes)
+                except IntegrityError:
+                    # A user created after validation can claim a username/email
+                    # first. Retry the chunk row by row so only those rows fail.
+                    db.session.rollback()
+                    chunk_imported = 0
+                    for parsed, password_hash in zip(chunk, password_hashes):
+                        try:
+                            with db.session.begin_nested():
+                                chunk_imported += insert_rows([parsed], [password_hash])
+                        except IntegrityError as exc:
+                            failed_count += 1
+                            if len(row_errors) < 20:
+                                row_errors.append({
+                                    'row': parsed['row_index'],
+                                    'username': parsed['username'],
+                                    'error': str(getattr(exc, 'orig', exc)),
+                                })
+
+                processed_rows += len(chunk)
+                imported_count += chunk_imported
+                _update_import_job(
+                    job_id,
+                    commit=False,
+                    processed_rows=processed_rows,
+                    imported_count=imported_count,
+                    failed_count=failed_count,
+                )
+                db.session.commit()
+                if chunk_imported:
+                    notify_email_worker()
+
+            if row_errors:
+                summary['row_errors'] = row_errors
+
+            _update_import_job(
+                job_id,
+                status='completed' if imported_count else 'failed',
+                summary=json.dumps(summary),
+                error_message=None if imported_count else 'No users could be inserted.',
+                finished_at=datetime.utcnow(),
+            )
+
+            # The preview's rows are spent once committed.
+            if preview:
+                UserImportPreview.query.filter_by(id=preview.id).delete(synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            try:
+                _update_import_job(
+                    job_id,
+                    status='failed',
+                    error_message=f'Import failed: {str(e)}',
+                    finished_at=datetime.utcnow(),
+                )
+            except Exception:
+                db.session.rollback()
+        finally:
+            heartbeat_stop.set()
+            _remove_spooled_file(file_path)
+            db.session.remove()
+
+
 @admin_bp.route('/import/excel/preview', methods=['POST'])
 @token_required
 @admin_required
 def preview_users_from_excel(user):
-    """Preview users from Excel file without saving to DB"""
+    """
+    Preview users from an .xlsx or .csv file without saving to DB.
+    Optional form field `sheet` (name or 1-based index) selects the worksheet.
+
+    The validated rows are stored under the file's sha256 (preview_token) for
+    USER_IMPORT_PREVIEW_TTL_MINUTES so the import step can commit from them.
+    Their passwords are stored encrypted; the key (preview_key) is derived
+    from the file and only returned in this response.
+    """
 
     if 'file' not in request.files:
         return jsonify({'success': False, 'message': 'No file provided'}), 400
 
     file = request.files['file']
+    extension = _import_file_extension(file.filename)
+    sheet = str(request.form.get('sheet') or '').strip() or None
 
-    if not file.filename.endswith('.xlsx'):
-        return jsonify({'success': False, 'message': 'Only .xlsx files are allowed'}), 400
+    if not extension:
+        return jsonify({'success': False, 'message': 'Only .xlsx and .csv files are allowed'}), 400
 
+    file_path = None
     try:
-        workbook = load_workbook(filename=BytesIO(file.read()), data_only=True)
-        sheet = workbook.active
-
-        rows = list(sheet.iter_rows(values_only=True))
-        if len(rows) < 2:
-            return jsonify({'success': False, 'message': 'Excel file has no data rows'}), 400
-
-        headers = [_normalize_excel_header_key(cell) if cell is not None else '' for cell in rows[0]]
-        header_map = {name: idx for idx, name in enumerate(headers) if name}
-
-        def get_value(row, keys, default=''):
-            for key in keys:
-                index = header_map.get(key)
-                if index is not None and index < len(row):
-                    value = row[index]
-                    if value is not None:
-                        return _stringify_excel_cell(value)
-            return default
+        _purge_expired_import_previews()
+        file_path, file_digest, key_digest = _spool_import_upload(file, extension)
+        token = _import_preview_token(file_digest, sheet)
+        preview_key = _import_preview_key(key_digest, sheet)
+
+        preview = _get_import_preview(token)
+        if preview:
+            summary = json.loads(preview.summary)
+        else:
+            ready_rows, summary = _validate_user_import(_iter_import_rows(file_path, extension, sheet))
+            if not summary['detected_headers'] or summary['total_rows'] == 0:
+                return jsonify({'success': False, 'message': 'File has no data rows'}), 400
 
-        total_rows = 0
-        valid_rows = 0
-        skipped_rows = 0
-        missing_required_rows = 0
-        duplicate_email_rows = 0
-        existing_email_rows = 0
-        duplicate_username_rows = 0
-        existing_username_rows = 0
-        invalid_email_rows = 0
-        invalid_whatsapp_rows = 0
-        missing_required_details = []
-        duplicate_email_in_file_details = []
-        existing_email_details = []
-        invalid_email_details = []
-        invalid_whatsapp_details = []
-        duplicate_username_in_file_details = []
-        existing_username_details = []
-        max_preview_details = 20
-        seen_email_keys = set()
-        seen_username_keys = set()
-        email_exists_cache = {}
-        username_exists_cache = {}
-
-        def email_exists_cached(email_key):
-            if email_key not in email_exists_cache:
-                email_exists_cache[email_key] = _email_exists(email_key)
-            return email_exists_cache[email_key]
-
-        def username_exists_cached(username_key):
-            if username_key not in username_exists_cache:
-                username_exists_cache[username_key] = _username_exists(username_key)
-            return username_exists_cache[username_key]
-
-        for row_index, row in enumerate(rows[1:], start=2):
-            if row is None or all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
-
-            total_rows += 1
-
-            name = get_value(row, ['name', 'full_name', 'fullname'])
-            email = get_value(row, ['email', 'mail', 'email_address']).lower()
-            raw_username = get_value(row, ['username', 'user_name', 'user'])
-            raw_whatsapp_number = get_value(row, ['whatsapp_number', 'whatsapp', 'phone', 'mobile', 'whatsappnumber'])
-
-            if not email or not raw_username or not raw_whatsapp_number:
-                missing_required_rows += 1
-                if len(missing_required_details) < max_preview_details:
-                    missing_fields = []
-                    if not email:
-                        missing_fields.append('email')
-                    if not raw_username:
-                        missing_fields.append('username')
-                    if not raw_whatsapp_number:
-                        missing_fields.append('whatsapp_number')
-                    missing_required_details.append({
-                        'row': row_index,
-                        'missing_fields': missing_fields,
-                    })
-                skipped_rows += 1
-                continue
-
-            if not is_valid_email(email):
-                invalid_email_rows += 1
-                if len(invalid_email_details) < max_preview_details:
-                    invalid_email_details.append({
-                        'row': row_index,
-                        'email': email,
-                    })
-                skipped_rows += 1
-                continue
-
-            email_key = _email_key(email)
-            if email_key in seen_email_keys:
-                duplicate_email_rows += 1
-                if len(duplicate_email_in_file_details) < max_preview_details:
-                    duplicate_email_in_file_details.append({
-                        'row': row_index,
-                        'email': email,
-                    })
-            elif email_exists_cached(email_key):
-                existing_email_rows += 1
-                if len(existing_email_details) < max_preview_details:
-                    existing_email_details.append({
-                        'row': row_index,
-                        'email': email,
-                    })
+            summary['sheets'], summary['sheet'] = (
+                _xlsx_sheet_names(file_path, sheet) if extension == 'xlsx' else ([], None)
+            )
 
-            seen_email_keys.add(email_key)
+            ttl_minutes = int(current_app.config.get('USER_IMPORT_PREVIEW_TTL_MINUTES', 30))
+            stored_rows, sealed_passwords = _seal_import_passwords(ready_rows, preview_key)
+            UserImportPreview.query.filter_by(token=token).delete(synchronize_session=False)
+            preview = UserImportPreview(
+                token=token,
+                created_by_id=user.id,
+                file_name=secure_filename(file.filename) or f'import.{extension}',
+                rows=json.dumps(stored_rows),
+                passwords=sealed_passwords,
+                summary=json.dumps(summary),
+                expires_at=datetime.utcnow() + timedelta(minutes=ttl_minutes),
+            )
+            db.session.add(preview)
+            db.session.commit()
 
-            whatsapp_number = normalize_indian_whatsapp_number(raw_whatsapp_number)
-            if not whatsapp_number:
-                invalid_whatsapp_rows += 1
-                if len(invalid_whatsapp_details) < max_preview_details:
-                    invalid_whatsapp_details.append({
-                        'row': row_index,
-                        'whatsapp_number': str(raw_whatsapp_number or ''),
-                    })
-                skipped_rows += 1
-                continue
-
-            username_key = _username_key(raw_username)
-            if username_key in seen_username_keys:
-                duplicate_username_rows += 1
-                if len(duplicate_username_in_file_details) < max_preview_details:
-                    duplicate_username_in_file_details.append({
-                        'row': row_index,
-                        'username': str(raw_username or ''),
-                    })
-                skipped_rows += 1
-                continue
-
-            if username_exists_cached(username_key):
-                existing_username_rows += 1
-                if len(existing_username_details) < max_preview_details:
-                    existing_username_details.append({
-                        'row': row_index,
-                        'username': str(raw_username or ''),
-                    })
-                skipped_rows += 1
-                continue
-
-            seen_username_keys.add(username_key)
-
-            valid_rows += 1
+        duplicate_username_rows = summary.get('duplicate_username_in_file_rows', 0)
+        existing_username_rows = summary.get('duplicate_username_existing_rows', 0)
+        duplicate_email_rows = summary.get('duplicate_email_rows', 0)
+        existing_email_rows = summary.get('existing_email_rows', 0)
 
         return jsonify({
             'success': True,
             'message': 'Preview generated successfully',
+            'preview_token': preview.token,
+            'preview_key': preview_key,
+            'expires_at': preview.expires_at.isoformat(),
             'preview': {
-                'total_rows': total_rows,
-                'valid_rows': valid_rows,
-                'skipped_rows': skipped_rows,
-                'missing_required_rows': missing_required_rows,
+                'total_rows': summary['total_rows'],
+                'valid_rows': summary['ready_rows'],
+                'skipped_rows': summary['skipped_rows'],
+                'already_imported_rows': summary.get('already_imported_rows', 0),
+                'missing_required_rows': summary['missing_required_rows'],
                 'duplicate_email_rows': duplicate_email_rows,
                 'existing_email_rows': existing_email_rows,
                 'email_conflict_rows': duplicate_email_rows + existing_email_rows,
                 'duplicate_username_rows': duplicate_username_rows,
                 'existing_username_rows': existing_username_rows,
                 'username_conflict_rows': duplicate_username_rows + existing_username_rows,
-                'invalid_email_rows': invalid_email_rows,
-                'invalid_whatsapp_rows': invalid_whatsapp_rows,
-                'detected_headers': [key for key in headers if key],
-                'required_header_status': {
-                    'email': bool(
-                        header_map.get('email') is not None
-                        or header_map.get('mail') is not None
-                        or header_map.get('email_address') is not None
-                    ),
-                    'username': bool(
-                        header_map.get('username') is not None
-                        or header_map.get('user_name') is not None
-                        or header_map.get('user') is not None
-                    ),
-                    'whatsapp_number': bool(
-                        header_map.get('whatsapp_number') is not None
-                        or header_map.get('whatsapp') is not None
-                        or header_map.get('phone') is not None
-                        or header_map.get('mobile') is not None
-                        or header_map.get('whatsappnumber') is not None
-                    ),
-                },
-                'issue_details': {
-                    'missing_required': missing_required_details,
-                    'duplicate_email_in_file': duplicate_email_in_file_details,
-                    'duplicate_email_existing': existing_email_details,
-                    'invalid_email': invalid_email_details,
-                    'invalid_whatsapp': invalid_whatsapp_details,
-                    'duplicate_username_in_file': duplicate_username_in_file_details,
-                    'duplicate_username_existing': existing_username_details,
-                    'truncated_to': max_preview_details,
-                },
+                'invalid_email_rows': summary['invalid_email_rows'],
+                'invalid_whatsapp_rows': summary['invalid_whatsapp_rows'],
+                'detected_headers': summary['detected_headers'],
+                'required_header_status': summary['required_header_status'],
+                'issue_details': summary['issue_details'],
+                'sheets': summary.get('sheets', []),
+                'sheet': summary.get('sheet'),
             }
         }), 200
 
+    except ImportFileError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'message': f'Preview failed: {str(e)}'
         }), 400
+    finally:
+        _remove_spooled_file(file_path)
+
 
 @admin_bp.route('/import/excel', methods=['POST'])
 @token_required
 @admin_required
 def import_users_from_excel(user):
-    """Import users from Excel file"""
-    
-    if 'file' not in request.files:
-        return jsonify({'success': False, 'message': 'No file provided'}), 400
-    
-    file = request.files['file']
+    """
+    Queue a background import of users.
+
+    Send the preview_token and preview_key from the preview step to commit
+    its stored rows; otherwise (or when the preview has expired) an
+    .xlsx/.csv upload, plus an optional `sheet`, is required.
+    """
+
+    file = request.files.get('file')
+    extension = _import_file_extension(file.filename) if file else None
+    sheet = str(request.form.get('sheet') or '').strip() or None
+    preview_token = str(request.form.get('preview_token') or '').strip().lower()
+    preview_key = str(request.form.get('preview_key') or '').strip()
     event_id = request.form.get('event_id')  # Get selected event/chatbot ID
     default_role = str(request.form.get('default_role', 'user') or 'user').strip().lower()
 
     if not str(event_id or '').strip():
         return jsonify({'success': False, 'message': 'Please select an event before importing users'}), 400
-    
-    if not file.filename.endswith('.xlsx'):
-        return jsonify({'success': False, 'message': 'Only .xlsx files are allowed'}), 400
+
+    preview = _get_import_preview(preview_token) if preview_token else None
+    passwords = _open_import_passwords(preview, preview_key) if preview else None
+    if preview and passwords is None:
+        # Same recovery as an expired preview: the page re-sends the file.
+        return jsonify({
+            'success': False,
+            'message': 'Import preview key does not match. Upload the file again.'
+        }), 410
+    if not preview:
+        if not file:
+            if preview_token:
+                return jsonify({
+                    'success': False,
+                    'message': 'Import preview expired. Upload the file again.'
+                }), 410
+            return jsonify({'success': False, 'message': 'No file provided'}), 400
+
+        if not extension:
+            return jsonify({'success': False, 'message': 'Only .xlsx and .csv files are allowed'}), 400
+
+        if extension == 'csv' and sheet:
+            return jsonify({'success': False, 'message': 'CSV files have a single sheet; remove the sheet selection'}), 400
 
     if default_role not in VALID_USER_ROLES:
         default_role = 'user'
     
     # Validate event_id
-    chatbot = None
     try:
         chatbot = Chatbot.query.get(int(event_id))
         if not chatbot:
             return jsonify({'success': False, 'message': 'Selected event/chatbot not found'}), 404
     except (ValueError, TypeError):
         return jsonify({'success': False, 'message': 'Invalid event ID'}), 400
-    
+
+    file_path = None
     try:
-        workbook = load_workbook(filename=BytesIO(file.read()), data_only=True)
-        sheet = workbook.active
-
-        rows = list(sheet.iter_rows(values_only=True))
-        if len(rows) < 2:
-            return jsonify({'success': False, 'message': 'Excel file has no data rows'}), 400
-
-        headers = [_normalize_excel_header_key(cell) if cell is not None else '' for cell in rows[0]]
-        header_map = {name: idx for idx, name in enumerate(headers) if name}
-
-        def get_value(row, keys, default=''):
-            for key in keys:
-                index = header_map.get(key)
-                if index is not None and index < len(row):
-                    value = row[index]
-                    if value is not None:
-                        return _stringify_excel_cell(value)
-            return default
+        if not preview:
+            # Spool the upload so the worker thread can stream it.
+            file_path, _, _ = _spool_import_upload(file, extension)
+
+        job = UserImportJob(
+            created_by_id=user.id,
+            chatbot_id=chatbot.id,
+            preview_token=preview.token if preview else None,
+            file_name=preview.file_name if preview else (secure_filename(file.filename) or f'import.{extension}'),
+            default_role=default_role,
+            status='queued',
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _remove_spooled_file(file_path)
+        return jsonify({
+            'success': False,
+            'message': f'Import failed: {str(e)}'
+        }), 400
 
-        def parse_bool(value, default=True):
-            if value is None or value == '':
-                return default
-            return str(value).strip().lower() in ['1', 'true', 'yes', 'y', 'active']
-
-        credentials = []
-        skipped = 0
-        total_rows = 0
-        missing_required_rows = 0
-        invalid_email_rows = 0
-        invalid_whatsapp_rows = 0
-        parsed_rows = []
-        seen_username_keys = set()
-        reserved_email_keys = set()
-        auto_adjusted_email_rows = 0
-        duplicate_usernames_in_file = []
-
-        for row_index, row in enumerate(rows[1:], start=2):
-            if row is None or all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
-
-            total_rows += 1
-
-            name = get_value(row, ['name', 'full_name', 'fullname'])
-            email = get_value(row, ['email', 'mail', 'email_address']).lower()
-            role = get_value(row, ['role', 'user_role'], default_role).lower()
-            raw_username = get_value(row, ['username', 'user_name', 'user'])
-            raw_whatsapp_number = get_value(row, ['whatsapp_number', 'whatsapp', 'phone', 'mobile', 'whatsappnumber'])
-            password = get_value(row, ['password', 'pass'])
-            active_value = get_value(row, ['active', 'is_active'], '')
-
-            if not email or not raw_username or not raw_whatsapp_number:
-                missing_required_rows += 1
-                skipped += 1
-                continue
-
-            if not is_valid_email(email):
-                invalid_email_rows += 1
-                skipped += 1
-                continue
-
-            effective_email, email_auto_adjusted = _make_unique_email_with_reserved(
-                email,
-                reserved_email_keys,
-            )
-            if email_auto_adjusted:
-                auto_adjusted_email_rows += 1
+    app = current_app._get_current_object()
+    thread = threading.Thread(
+        target=_run_user_import_job,
+        args=(app, job.id, file_path, getattr(user, 'role', None), extension, sheet, passwords)
+    )
+    thread.daemon = True
+    thread.start()
 
-            reserved_email_keys.add(_email_key(effective_email))
+    return jsonify({
+        'success': True,
+        'message': f'Import started for event "{chatbot.event_name}"',
+        'job_id': job.id,
+        'status_url': f'/api/admin/import/excel/jobs/{job.id}',
+        'job': job.to_dict(),
+    }), 202
 
-            normalized_whatsapp_number = normalize_indian_whatsapp_number(raw_whatsapp_number)
-            if not normalized_whatsapp_number:
-                invalid_whatsapp_rows += 1
-                skipped += 1
-                continue
 
-            if role not in VALID_USER_ROLES:
-                role = default_role
+@admin_bp.route('/import/excel/jobs/<int:job_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_user_import_job(user, job_id):
+    """Progress of a background user import."""
 
-            # Prevent regular admin users from importing/creating admin accounts
-            if role == 'admin' and getattr(user, 'role', None) == 'admin':
-                role = 'user'
+    _fail_stale_import_jobs()
+    job = UserImportJob.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Import job not found'}), 404
 
-            username = str(raw_username).strip()
-            username_key = _username_key(username)
-            if username_key in seen_username_keys:
-                duplicate_usernames_in_file.append({
-                    'row': row_index,
-                    'username': username,
-                })
-                skipped += 1
-                continue
-
-            seen_username_keys.add(username_key)
-            display_name = (name or username or email).strip()
-            if not password:
-                password = '123'
-
-            parsed_rows.append({
-                'row_index': row_index,
-                'name': display_name,
-                'email': effective_email,
-                'username': username,
-                'username_key': username_key,
-                'whatsapp_number': normalized_whatsapp_number,
-                'role': role,
-                'active': parse_bool(active_value, True),
-                'password': password,
-            })
+    job_data = job.to_dict()
+    job_data['emails'] = get_email_status_counts(f'user_import:{job.id}')
+
+    return jsonify({
+        'success': True,
+        'job': job_data,
+    }), 200
 
-        existing_username_keys = _existing_username_keys({item['username_key'] for item in parsed_rows})
-        existing_username_conflicts = []
-        valid_rows_to_import = []
 
-        for parsed in parsed_rows:
-            if parsed['username_key'] in existing_username_keys:
-                existing_username_conflicts.append({
-                    'row': parsed['row_index'],
-                    'username': parsed['username'],
-                })
-                skipped += 1
-                continue
-            valid_rows_to_import.append(parsed)
-
-        if duplicate_usernames_in_file or existing_username_conflicts:
-            return jsonify({
-                'success': False,
-                'message': 'Import blocked: duplicate usernames found. Fix duplicate usernames before importing.',
-                'duplicate_username_rows': {
-                    'in_file': duplicate_usernames_in_file,
-                    'existing_in_system': existing_username_conflicts,
-                },
-                'duplicate_username_count': len(duplicate_usernames_in_file) + len(existing_username_conflicts),
-                'import_summary': {
-                    'total_rows': total_rows,
-                    'ready_rows': len(valid_rows_to_import),
-                    'skipped_rows': skipped,
-                    'missing_required_rows': missing_required_rows,
-                    'invalid_email_rows': invalid_email_rows,
-                    'invalid_whatsapp_rows': invalid_whatsapp_rows,
-                    'auto_adjusted_email_rows': auto_adjusted_email_rows,
-                },
-                'skipped': skipped,
-            }), 409
-
-        for parsed in valid_rows_to_import:
-            new_user = User(
-                name=parsed['name'],
-                email=parsed['email'],
-                username=parsed['username'],
-                whatsapp_number=parsed['whatsapp_number'],
-                role=parsed['role'],
-                active=parsed['active']
-            )
-            new_user.set_password(parsed['password'])
-            db.session.add(new_user)
-            db.session.flush()  # Get the user ID
-            
-            # Associate user with the selected chatbot/event
-            if chatbot:
-                existing_participant = ChatbotParticipant.query.filter_by(
-                    chatbot_id=chatbot.id,
-                    user_id=new_user.id
-                ).first()
-                
-                if not existing_participant:
-                    participant = ChatbotParticipant(
-                        chatbot_id=chatbot.id,
-                        user_id=new_user.id
-                    )
-                    db.session.add(participant)
+# ============================================
+# Outbound Email Queue
+# ============================================
 
+@admin_bp.route('/emails', methods=['GET'])
+@token_required
+@admin_required
+def list_outbound_emails(user):
+    """
+    Per-recipient delivery status of queued emails, newest first.
+    Filters: status, batch_key (e.g. user_import:12), search (recipient).
+    Paginate with after_id = next_after_id from the previous page.
+    """
+
+    status = str(request.args.get('status') or '').strip().lower()
+    batch_key = str(request.args.get('batch_key') or '').strip()
+    search = str(request.args.get('search') or '').strip().lower()
+    limit = min(max(request.args.get('limit', 50, type=int) or 50, 1), 500)
+    after_id = request.args.get('after_id', type=int)
+
+    query = OutboundEmail.query
+    if status:
+        query = query.filter(OutboundEmail.status == status)
+    if batch_key:
+        query = query.filter(OutboundEmail.batch_key == batch_key)
+    if search:
+        query = query.filter(func.lower(OutboundEmail.recipient).like(f'%{search}%'))
+    if after_id:
+        query = query.filter(OutboundEmail.id < after_id)
 
-            credentials.append({
-                'name': parsed['name'],
-                'role': parsed['role'],
-                'username': parsed['username'],
-                'password': parsed['password'],
-                'email': parsed['email'],
-                'whatsapp_number': parsed['whatsapp_number'],
-                'allowed_events': [chatbot.event_name] if chatbot and chatbot.event_name else [],
-                'allowed_chatbots': [chatbot.name] if chatbot and chatbot.name else []
-            })
+    emails = query.order_by(OutboundEmail.id.desc()).limit(limit + 1).all()
+    has_more = len(emails) > limit
+    emails = emails[:limit]
 
-        if not credentials:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'message': 'No valid users imported. Check required columns and data format.',
-                'import_summary': {
-                    'total_rows': total_rows,
-                    'ready_rows': 0,
-                    'skipped_rows': skipped,
-                    'missing_required_rows': missing_required_rows,
-                    'invalid_email_rows': invalid_email_rows,
-                    'invalid_whatsapp_rows': invalid_whatsapp_rows,
-                    'auto_adjusted_email_rows': auto_adjusted_email_rows,
-                    'duplicate_username_in_file_rows': len(duplicate_usernames_in_file),
-                    'duplicate_username_existing_rows': len(existing_username_conflicts),
-                }
-            }), 400
+    return jsonify({
+        'success': True,
+        'data': [email.to_dict() for email in emails],
+        'counts': get_email_status_counts(batch_key or None),
+        'has_more': has_more,
+        'next_after_id': emails[-1].id if has_more and emails else None,
+    }), 200
 
-        db.session.commit()
 
-        event_name = chatbot.event_name if chatbot else 'None'
-        # Notification for admin import removed - bell feature is no longer used
-        db.session.commit()
+@admin_bp.route('/emails/retry', methods=['POST'])
+@token_required
+@admin_required
+def retry_outbound_emails(user):
+    """Re-queue failed emails, either by batch_key or by a list of ids."""
 
-        # Send all emails in background thread so admin doesn't wait
-        app = current_app._get_current_object()
-        thread = threading.Thread(
-            target=send_bulk_emails_background,
-            args=(app, credentials)
-        )
-        thread.daemon = True
-        thread.start()
+    data = request.get_json(silent=True) or {}
+    batch_key = str(data.get('batch_key') or '').strip()
+    email_ids = _normalize_bulk_user_ids(data.get('ids') or [])
+
+    if not batch_key and not email_ids:
+        return jsonify({'success': False, 'message': 'Provide batch_key or ids to retry'}), 400
+
+    requeued = retry_failed_emails(batch_key=batch_key or None, email_ids=email_ids or None)
+
+    return jsonify({
+        'success': True,
+        'message': f'{requeued} email(s) queued for retry',
+        'requeued': requeued,
+    }), 200
 
+
+# ============================================
+# Asset Reclamation
+# ============================================
+
+@admin_bp.route('/assets', methods=['GET'])
+@token_required
+@admin_required
+def get_asset_reclamation_status(user):
+    """Pending file tombstones and the result of this process's last orphan sweep."""
+
+    return jsonify({
+        'success': True,
+        'tombstones': get_tombstone_counts(),
+        'last_sweep': get_last_sweep(),
+    }), 200
+
+
+@admin_bp.route('/assets/sweep', methods=['POST'])
+@token_required
+@admin_required
+def sweep_orphaned_assets(user):
+    """
+    Look for stored files no row references. dry_run reports the orphans
+    without touching them; otherwise the background reclaimer runs the sweep.
+    """
+
+    data = request.get_json(silent=True) or {}
+    dry_run = str(data.get('dry_run', False)).strip().lower() in {'1', 'true', 'yes'}
+
+    if not dry_run and request_orphan_sweep():
         return jsonify({
             'success': True,
-            'message': f'Users imported successfully and assigned to event "{event_name}"! Credentials emails are being sent to {len(credentials)} users.',
-            'count': len(credentials),
-            'skipped': skipped,
-            'auto_adjusted_email_rows': auto_adjusted_email_rows,
-            'event_name': event_name,
-            'credentials': credentials
-        }), 200
+            'message': 'Orphan sweep scheduled',
+        }), 202
 
-    except Exception as e:
-        db.session.rollback()
+    result = sweep_orphan_assets(dry_run=dry_run)
+    if result.get('skipped'):
         return jsonify({
             'success': False,
-            'message': f'Import failed: {str(e)}'
-        }), 400
+            'message': 'Another orphan sweep is already running',
+        }), 409
+
+    return jsonify({
+        'success': True,
+        'message': f"{result['orphans']} orphaned file(s) found" if dry_run
+                   else f"{result['orphans']} orphaned file(s) scheduled for removal",
+        'data': result,
+    }), 200
+
+
+# ============================================
+# Sampling Profiler
+# ============================================
+
+@admin_bp.route('/profiling/start', methods=['POST'])
+@token_required
+@admin_required
+def profiling_start(user):
+    """
+    Profile a fraction of requests (sample_rate, 0-1) or every request to one
+    endpoint (e.g. "user.send_message") on all workers for duration_seconds.
+    Starting a new session replaces the running one.
+    """
+
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(data.get('sample_rate') or 0)
+        duration_seconds = int(data.get('duration_seconds') or 300)
+        max_captures = int(data.get('max_captures') or 200)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid profiling parameters'}), 400
+
+    endpoint = str(data.get('endpoint') or '').strip()
+    if endpoint and endpoint not in current_app.view_functions:
+        return jsonify({'success': False, 'message': f'Unknown endpoint: {endpoint}'}), 400
+
+    try:
+        session = start_session(
+            profiling_dir(), sample_rate, endpoint or None, duration_seconds, max_captures, user.username,
+        )
+    except ProfilerError as exc:
+        return jsonify({'success': False, 'message': exc.message}), exc.status_code
+
+    return jsonify({
+        'success': True,
+        'message': 'Profiling started',
+        'data': session,
+    }), 200
+
+
+@admin_bp.route('/profiling/stop', methods=['POST'])
+@token_required
+@admin_required
+def profiling_stop(user):
+    """End the running session; requests already being profiled still write their capture."""
+
+    session = stop_session(profiling_dir())
+    return jsonify({
+        'success': True,
+        'message': 'Profiling stopped' if session else 'No profiling session was running',
+        'data': session,
+    }), 200
+
+
+@admin_bp.route('/profiling/captures', methods=['GET'])
+@token_required
+@admin_required
+def profiling_captures(user):
+    """The running session (if any) and the captures of every session, newest first."""
+
+    root = profiling_dir()
+    return jsonify({
+        'success': True,
+        'active': read_session(root),
+        'data': list_captures(root),
+    }), 200
+
+
+@admin_bp.route('/profiling/captures/<session_id>', methods=['GET'])
+@token_required
+@admin_required
+def profiling_session_folded(user, session_id):
+    """All captures of a session merged into one collapsed-stack file."""
+
+    folded = merged_session(profiling_dir(), session_id)
+    if folded is None:
+        return jsonify({'success': False, 'message': 'Profiling session not found'}), 404
+
+    return Response(
+        folded,
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename=profile-{session_id}.folded'},
+    )
+
+
+@admin_bp.route('/profiling/captures/<session_id>/<name>', methods=['GET'])
+@token_required
+@admin_required
+def profiling_capture(user, session_id, name):
+    path = capture_path(profiling_dir(), session_id, name)
+    if path is None:
+        return jsonify({'success': False, 'message': 'Capture not found'}), 404
+
+    with open(path, 'r', encoding='utf-8') as handle:
+        folded = handle.read()
+    return Response(
+        folded,
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename={name}'},
+    )
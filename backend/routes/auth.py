@@ -16,9 +16,13 @@ import re
 try:
     from models import db, User, SessionToken, ChatbotParticipant, Chatbot, LoginOTP
     from services.whatsapp_service import send_whatsapp_text_template, WhatsAppServiceError
+    from services.instrumentation import track_outbound
+    from services.concurrency import release_db_connection
 except ImportError:
     from backend.models import db, User, SessionToken, ChatbotParticipant, Chatbot, LoginOTP
     from backend.services.whatsapp_service import send_whatsapp_text_template, WhatsAppServiceError
+    from backend.services.instrumentation import track_outbound
+    from backend.services.concurrency import release_db_connection
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -138,6 +142,10 @@ def _create_and_send_login_otp(user):
     db.session.add(otp_record)
     db.session.commit()
 
+    whatsapp_number = user.whatsapp_number
+    # The WhatsApp call can take seconds; don't hold a pooled connection meanwhile.
+    release_db_connection(db.session)
+
     otp_template_name = str(current_app.config.get('WHATSAPP_LOGIN_OTP_TEMPLATE_NAME') or '').strip()
     otp_template_language = str(current_app.config.get('WHATSAPP_LOGIN_OTP_TEMPLATE_LANGUAGE') or 'en').strip() or 'en'
 
@@ -146,7 +154,7 @@ def _create_and_send_login_otp(user):
         if otp_template_name:
             # Primary path: template-based OTP for structured messaging and better delivery.
             send_whatsapp_text_template(
-                to_number=user.whatsapp_number,
+                to_number=whatsapp_number,
                 template_name=otp_template_name,
                 template_language=otp_template_language,
                 body_variables=[otp_code],
@@ -154,7 +162,7 @@ def _create_and_send_login_otp(user):
         else:
             # Fallback to free-form text message if no dedicated OTP template is configured.
             send_whatsapp_text(
-                to_number=user.whatsapp_number,
+                to_number=whatsapp_number,
                 text=f"Your ConvergeAI login OTP is {otp_code}. It expires in {LOGIN_OTP_EXPIRY_SECONDS} seconds."
             )
     except WhatsAppServiceError as exc:
@@ -162,7 +170,7 @@ def _create_and_send_login_otp(user):
         if otp_template_name:
             try:
                 send_whatsapp_text(
-                    to_number=user.whatsapp_number,
+                    to_number=whatsapp_number,
                     text=f"Your ConvergeAI login OTP is {otp_code}. It expires in {LOGIN_OTP_EXPIRY_SECONDS} seconds."
                 )
             except WhatsAppServiceError as exc2:
@@ -223,21 +231,23 @@ def send_forgot_password_otp_email(recipient_email, name, otp_code):
         )
     )
 
+    release_db_connection(db.session)
     try:
-        if use_ssl:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(mail_server, mail_port, context=context, timeout=20) as server:
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(mail_server, mail_port, timeout=20) as server:
-                if use_tls:
-                    context = ssl.create_default_context()
-                    server.starttls(context=context)
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
+        with track_outbound('smtp'):
+            if use_ssl:
+                context = ssl.create_default_context()
+                with smtplib.SMTP_SSL(mail_server, mail_port, context=context, timeout=20) as server:
+                    if mail_username:
+                        server.login(mail_username, mail_password or '')
+                    server.send_message(msg)
+            else:
+                with smtplib.SMTP(mail_server, mail_port, timeout=20) as server:
+                    if use_tls:
+                        context = ssl.create_default_context()
+                        server.starttls(context=context)
+                    if mail_username:
+                        server.login(mail_username, mail_password or '')
+                    server.send_message(msg)
         return True, None
     except Exception as exc:
         return False, str(exc)
@@ -277,21 +287,23 @@ def send_reset_password_email(recipient_email, name, username, temp_password, ev
         )
     )
 
+    release_db_connection(db.session)
     try:
-        if use_ssl:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(mail_server, mail_port, context=context, timeout=20) as server:
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(mail_server, mail_port, timeout=20) as server:
-                if use_tls:
-                    context = ssl.create_default_context()
-                    server.starttls(context=context)
-                if mail_username:
-                    server.login(mail_username, mail_password or '')
-                server.send_message(msg)
+        with track_outbound('smtp'):
+            if use_ssl:
+                context = ssl.create_default_context()
+                with smtplib.SMTP_SSL(mail_server, mail_port, context=context, timeout=20) as server:
+                    if mail_username:
+                        server.login(mail_username, mail_password or '')
+                    server.send_message(msg)
+            else:
+                with smtplib.SMTP(mail_server, mail_port, timeout=20) as server:
+                    if use_tls:
+                        context = ssl.create_default_context()
+                        server.starttls(context=context)
+                    if mail_username:
+                        server.login(mail_username, mail_password or '')
+                    server.send_message(msg)
         return True, None
     except Exception as exc:
         return False, str(exc)
@@ -6,19 +6,35 @@ from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import json
 import os
 import uuid
 
-from openpyxl import load_workbook
 
 try:
     from models import db, Chatbot, Guest, Message
     from routes.auth import token_required, admin_required
+    from services.guest_photo_service import (
+        GuestPhotoIngest, move_photo_variants, remove_photo_variants, store_guest_photo,
+        ArchiveUploadStore, GuestPhotoArchiveError, open_photo_archive,
+    )
+    from services.blob_store import blob_reference, get_blob_store, store_upload
+    from services.concurrency import run_blocking
+    from services.asset_reclaimer import tombstone_assets
+    from services.guest_sync_service import GuestSyncPlan, apply_guest_sync, plan_guest_sync
 except ImportError:
     from backend.models import db, Chatbot, Guest, Message
     from backend.routes.auth import token_required, admin_required
+    from backend.services.guest_photo_service import (
+        GuestPhotoIngest, move_photo_variants, remove_photo_variants, store_guest_photo,
+        ArchiveUploadStore, GuestPhotoArchiveError, open_photo_archive,
+    )
+    from backend.services.blob_store import blob_reference, get_blob_store, store_upload
+    from backend.services.concurrency import run_blocking
+    from backend.services.asset_reclaimer import tombstone_assets
+    from backend.services.guest_sync_service import GuestSyncPlan, apply_guest_sync, plan_guest_sync
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
@@ -123,7 +139,7 @@ def get_upload_directory(subdirectory):
 
 
 def save_uploaded_file(file_obj, subdirectory):
-    """Save uploaded file and return relative path."""
+    """Save a scratch upload (e.g. a guest list) and return its paths."""
     upload_dir = get_upload_directory(subdirectory)
     original_name = secure_filename(file_obj.filename)
     unique_name = f"{uuid.uuid4().hex}_{original_name}"
@@ -153,20 +169,23 @@ def build_unique_guest_filename(upload_dir, stem, extension):
     return candidate
 
 
-def save_guest_image_by_name(file_obj, guest_name):
-    upload_dir = get_upload_directory('guests')
-    extension = get_file_extension(file_obj.filename)
-    unique_name = build_unique_guest_filename(upload_dir, guest_name, extension)
-    destination_path = os.path.join(upload_dir, unique_name)
-    file_obj.save(destination_path)
-    relative_path = Path('uploads') / 'guests' / unique_name
-    return destination_path, str(relative_path).replace('\\', '/')
+def save_guest_image(file_obj):
+    """Store a guest photo in the blob store; returns the StoredFile."""
+    return store_guest_photo(get_blob_store(), file_obj)
 
 
 def rename_guest_image_by_name(existing_photo_path, guest_name):
+    """
+    Rename a legacy guest photo after the guest. Callers skip photos shared
+    by several guests.
+    """
     if not existing_photo_path:
         return None
 
+    # Content-addressed photos are named by hash and may be shared; nothing to rename.
+    if blob_reference(existing_photo_path):
+        return None
+
     relative_path = str(existing_photo_path).replace('\\', '/').lstrip('/')
     current_abs = os.path.join(current_app.root_path, relative_path.replace('/', os.sep))
     if not os.path.exists(current_abs):
@@ -185,33 +204,11 @@ def rename_guest_image_by_name(existing_photo_path, guest_name):
         return existing_photo_path
 
     os.rename(current_abs, new_abs)
+    move_photo_variants(current_abs, new_abs)
     new_relative = Path('uploads') / 'guests' / new_filename
     return str(new_relative).replace('\\', '/')
 
 
-def delete_guest_image_file(photo_path):
-    """Delete guest image file from uploads/guests when guest is removed."""
-    if not photo_path:
-        return
-
-    normalized = str(photo_path).replace('\\', '/').lstrip('/')
-    if '/uploads/' in normalized:
-        normalized = normalized.split('/uploads/', 1)[1]
-    if normalized.startswith('uploads/'):
-        normalized = normalized[len('uploads/'):]
-
-    if not normalized.startswith('guests/'):
-        return
-
-    absolute_path = os.path.join(current_app.root_path, 'uploads', normalized.replace('/', os.sep))
-    try:
-        if os.path.isfile(absolute_path):
-            os.remove(absolute_path)
-    except OSError:
-        # Keep DB operation resilient even if filesystem cleanup fails.
-        pass
-
-
 def normalize_guest_row(row):
     """Normalize guest columns from CSV/XLSX rows."""
     normalized = {}
@@ -223,28 +220,27 @@ def normalize_guest_row(row):
     return normalized
 
 
-def parse_guest_list_file(file_path, extension):
-    """Parse guest list file and return normalized guest entries."""
-    guests = []
-
+def iter_guest_list_rows(file_path, extension):
+    """Stream normalized guest entries (rows with a name) from a CSV/XLSX file."""
     if extension == 'csv':
         with open(file_path, newline='', encoding='utf-8-sig') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
+            for row in csv.DictReader(csv_file):
                 normalized = normalize_guest_row(row)
                 if normalized.get('name'):
-                    guests.append(normalized)
-        return guests
+                    yield normalized
+        return
+
+    from openpyxl import load_workbook  # imported on first use; slow to import
 
     workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
     try:
-        sheet = workbook.active
-        rows = list(sheet.iter_rows(values_only=True))
-        if not rows:
-            return guests
+        rows = workbook.active.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return
 
-        headers = [str(cell).strip() if cell is not None else '' for cell in rows[0]]
-        for row_values in rows[1:]:
+        headers = [str(cell).strip() if cell is not None else '' for cell in header_row]
+        for row_values in rows:
             row_dict = {
                 headers[index]: row_values[index] if index < len(row_values) else ''
                 for index in range(len(headers))
@@ -252,12 +248,15 @@ def parse_guest_list_file(file_path, extension):
             }
             normalized = normalize_guest_row(row_dict)
             if normalized.get('name'):
-                guests.append(normalized)
+                yield normalized
     finally:
         # Explicit close is required on Windows to release file handle before os.remove.
         workbook.close()
 
-    return guests
+
+def parse_guest_list_file(file_path, extension):
+    """Parse guest list file and return normalized guest entries."""
+    return list(iter_guest_list_rows(file_path, extension))
 
 
 def normalize_file_key(value):
@@ -280,6 +279,102 @@ def build_guest_image_lookup(image_files):
     return lookup
 
 
+def create_guest_photo_ingest():
+    return GuestPhotoIngest(
+        get_blob_store(),
+        max_workers=int(current_app.config.get('GUEST_PHOTO_WORKERS', 8)),
+    )
+
+
+def save_guest_image_lookup(guest_image_lookup, ingest):
+    """
+    Save each unique uploaded image once (by full normalized filename keys)
+    and map both the filename and its stem to the stored path.
+    """
+    saved = ingest.ingest(
+        (key, file_obj) for key, file_obj in guest_image_lookup.items() if '.' in key
+    )
+
+    guest_photo_lookup = {}
+    for key, saved_relative in saved.items():
+        guest_photo_lookup[key] = saved_relative
+        stem = os.path.splitext(key)[0]
+        if stem and stem not in guest_photo_lookup:
+            guest_photo_lookup[stem] = saved_relative
+    return guest_photo_lookup
+
+
+def get_guest_photo_archive_store():
+    return ArchiveUploadStore(os.path.join(current_app.instance_path, 'guest_photo_archives'))
+
+
+class GuestPhotoSources:
+    """
+    Guest photos for one request: individual `guest_images` uploads plus an
+    optional ZIP, sent either inline as `guest_images_archive` or uploaded
+    beforehand through /guest-photo-archives and referenced by
+    `guest_images_archive_id`. Individual uploads win over archive entries
+    with the same name.
+    """
+
+    def __init__(self, data, user):
+        self.guest_images = request.files.getlist('guest_images')
+        self.archive_file = request.files.get('guest_images_archive')
+        self.archive_upload_id = str(data.get('guest_images_archive_id') or '').strip().lower()
+        self.user = user
+        self.archive = None
+        self.archive_entries = 0
+        self.inline_archive_path = None
+
+    def validate(self):
+        for guest_image in self.guest_images:
+            if guest_image and guest_image.filename and not is_allowed_file(guest_image.filename, GUEST_IMAGE_EXTENSIONS):
+                raise GuestPhotoArchiveError('Guest images must be valid image files')
+
+        if self.archive_file and self.archive_file.filename and get_file_extension(self.archive_file.filename) != 'zip':
+            raise GuestPhotoArchiveError('Guest photo archive must be a .zip file')
+
+        if self.archive_upload_id:
+            get_guest_photo_archive_store().completed_path(self.archive_upload_id, self.user.id)
+
+    def build_lookup(self):
+        """Open the archive (if any) and return build_guest_image_lookup over all photos."""
+        archive_path = None
+        if self.archive_upload_id:
+            archive_path = get_guest_photo_archive_store().completed_path(self.archive_upload_id, self.user.id)
+        elif self.archive_file and self.archive_file.filename:
+            store = get_guest_photo_archive_store()
+            self.inline_archive_path = os.path.join(store.directory, f"inline-{uuid.uuid4().hex}.zip")
+            self.archive_file.save(self.inline_archive_path)
+            archive_path = self.inline_archive_path
+
+        archive_photos = []
+        if archive_path:
+            self.archive, archive_photos = open_photo_archive(
+                archive_path,
+                GUEST_IMAGE_EXTENSIONS,
+                max_entries=int(current_app.config.get('GUEST_PHOTO_ARCHIVE_MAX_ENTRIES', 2000)),
+                max_entry_bytes=int(current_app.config.get('GUEST_PHOTO_ARCHIVE_MAX_ENTRY_MB', 25)) * 1024 * 1024,
+            )
+            self.archive_entries = len(archive_photos)
+
+        return build_guest_image_lookup(archive_photos + [image for image in self.guest_images if image])
+
+    def close(self, consumed=False):
+        """Release the archive; a resumable upload is only deleted once it was used successfully."""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        if self.inline_archive_path:
+            try:
+                os.remove(self.inline_archive_path)
+            except OSError:
+                pass
+            self.inline_archive_path = None
+        if consumed and self.archive_upload_id:
+            get_guest_photo_archive_store().delete(self.archive_upload_id)
+
+
 def get_guest_image_reference(guest_row):
     return (
         guest_row.get('image_name')
@@ -299,6 +394,83 @@ def parse_json_list(raw_value):
     except (TypeError, ValueError, json.JSONDecodeError):
         return []
 
+# ============================================
+# Guest Photo Archives (resumable ZIP upload)
+# ============================================
+
+@chatbot_bp.route('/guest-photo-archives', methods=['POST'])
+@token_required
+@admin_required
+def create_guest_photo_archive_upload(user):
+    """
+    Start a resumable ZIP upload. Send chunks in order with PUT, then pass
+    the upload_id as guest_images_archive_id to create/update chatbot.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        total_bytes = int(data.get('total_bytes') or 0)
+    except (TypeError, ValueError):
+        total_bytes = 0
+
+    if not is_allowed_file(data.get('file_name') or 'photos.zip', {'zip'}):
+        return jsonify({'success': False, 'message': 'Guest photo archive must be a .zip file'}), 400
+
+    try:
+        upload = get_guest_photo_archive_store().create(total_bytes, data.get('file_name'), user.id)
+    except GuestPhotoArchiveError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+
+    return jsonify({'success': True, 'data': upload}), 201
+
+
+@chatbot_bp.route('/guest-photo-archives/<upload_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_guest_photo_archive_upload(user, upload_id):
+    """Bytes received so far; a client resumes its upload from received_bytes."""
+    try:
+        upload = get_guest_photo_archive_store().get(upload_id, user.id)
+    except GuestPhotoArchiveError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+
+    return jsonify({'success': True, 'data': upload}), 200
+
+
+@chatbot_bp.route('/guest-photo-archives/<upload_id>', methods=['PUT'])
+@token_required
+@admin_required
+def append_guest_photo_archive_chunk(user, upload_id):
+    """Append one chunk (multipart field `chunk`) at form field `offset`."""
+    chunk = request.files.get('chunk')
+    if not chunk:
+        return jsonify({'success': False, 'message': 'No chunk provided'}), 400
+
+    try:
+        offset = int(request.form.get('offset', ''))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'offset is required'}), 400
+
+    try:
+        upload = get_guest_photo_archive_store().append(upload_id, offset, chunk.stream, user.id)
+    except GuestPhotoArchiveError as e:
+        return jsonify({'success': False, 'message': e.message, 'data': e.payload}), e.status_code
+
+    return jsonify({'success': True, 'data': upload}), 200
+
+
+@chatbot_bp.route('/guest-photo-archives/<upload_id>', methods=['DELETE'])
+@token_required
+@admin_required
+def delete_guest_photo_archive_upload(user, upload_id):
+    try:
+        store = get_guest_photo_archive_store()
+        store.get(upload_id, user.id)
+        store.delete(upload_id)
+    except GuestPhotoArchiveError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+
+    return jsonify({'success': True, 'message': 'Archive upload discarded'}), 200
+
 # ============================================
 # Create Chatbot
 # ============================================
@@ -334,7 +506,7 @@ def create_chatbot(user):
 
     background_image = request.files.get('background_image')
     guest_list = request.files.get('guest_list')
-    guest_images = request.files.getlist('guest_images')
+    photo_sources = GuestPhotoSources(data, user)
     manual_guests = parse_json_list(data.get('manual_guests'))
 
     has_excel_guest_list = bool(guest_list and guest_list.filename)
@@ -384,9 +556,10 @@ def create_chatbot(user):
                 'message': f'Invalid image type for manual guest #{index + 1}'
             }), 400
 
-    for guest_image in guest_images:
-        if guest_image and guest_image.filename and not is_allowed_file(guest_image.filename, GUEST_IMAGE_EXTENSIONS):
-            return jsonify({'success': False, 'message': 'Guest images must be valid image files'}), 400
+    try:
+        photo_sources.validate()
+    except GuestPhotoArchiveError as e:
+        return jsonify({'success': False, 'message': e.message, 'upload': e.payload}), e.status_code
 
     saved_background_abs = None
     saved_guest_list_abs = None
@@ -394,18 +567,31 @@ def create_chatbot(user):
     created_successfully = False
     guest_rows = []
     guest_photo_lookup = {}
+    photo_ingest = create_guest_photo_ingest()
     
     try:
-        saved_background_abs, background_image_path = save_uploaded_file(background_image, 'backgrounds')
-
-        if guest_list and guest_list.filename:
-            saved_guest_list_abs, _ = save_uploaded_file(guest_list, 'guest_lists')
+        background_blob = store_upload(background_image)
+        background_image_path = background_blob.relative_path
+        if background_blob.created:
+            saved_background_abs = background_blob.abs_path
+
+        # Guest photos are written, hashed and resized on native threads while
+        # the guest list is parsed; under gevent both stay off the event loop.
+        with ThreadPoolExecutor(max_workers=1) as photo_executor:
+            photo_lookup_future = photo_executor.submit(
+                save_guest_image_lookup,
+                photo_sources.build_lookup(),
+                photo_ingest,
+            )
 
             try:
-                guest_rows = parse_guest_list_file(
-                    saved_guest_list_abs,
-                    get_file_extension(guest_list.filename)
-                )
+                if guest_list and guest_list.filename:
+                    saved_guest_list_abs, _ = save_uploaded_file(guest_list, 'guest_lists')
+                    guest_rows = run_blocking(
+                        parse_guest_list_file,
+                        saved_guest_list_abs,
+                        get_file_extension(guest_list.filename)
+                    )
             finally:
                 if saved_guest_list_abs and os.path.exists(saved_guest_list_abs):
                     try:
@@ -413,24 +599,13 @@ def create_chatbot(user):
                     except OSError:
                         pass
                 saved_guest_list_abs = None
+                guest_photo_lookup = photo_lookup_future.result()
 
-            if len(guest_rows) == 0:
-                return jsonify({
-                    'success': False,
-                    'message': 'Guest list must contain at least one row with a name column (images are optional)'
-                }), 400
-
-        guest_image_lookup = build_guest_image_lookup(guest_images)
-        for key, file_obj in guest_image_lookup.items():
-            # Save each unique uploaded image only once (by full normalized filename keys)
-            if '.' not in key:
-                continue
-            saved_abs, saved_relative = save_uploaded_file(file_obj, 'guests')
-            saved_guest_image_abs_paths.append(saved_abs)
-            guest_photo_lookup[key] = saved_relative
-            stem = os.path.splitext(key)[0]
-            if stem and stem not in guest_photo_lookup:
-                guest_photo_lookup[stem] = saved_relative
+        if guest_list and guest_list.filename and len(guest_rows) == 0:
+            return jsonify({
+                'success': False,
+                'message': 'Guest list must contain at least one row with a name column (images are optional)'
+            }), 400
 
         chatbot = Chatbot(
             name=data['name'],
@@ -471,9 +646,10 @@ def create_chatbot(user):
             if photo_field:
                 manual_photo_file = request.files.get(photo_field)
                 if manual_photo_file and manual_photo_file.filename:
-                    saved_abs, saved_relative = save_guest_image_by_name(manual_photo_file, name)
-                    saved_guest_image_abs_paths.append(saved_abs)
-                    photo_path = saved_relative
+                    stored_photo = save_guest_image(manual_photo_file)
+                    if stored_photo.created:
+                        saved_guest_image_abs_paths.append(stored_photo.abs_path)
+                    photo_path = stored_photo.relative_path
 
             guest = Guest(
                 chatbot=chatbot,
@@ -490,9 +666,18 @@ def create_chatbot(user):
             'message': 'Chatbot created successfully',
             'data': chatbot.to_dict(),
             'guests_imported': len(guest_rows),
-            'manual_guests_added': len([g for g in manual_guests if str(g.get('name', '')).strip()])
+            'manual_guests_added': len([g for g in manual_guests if str(g.get('name', '')).strip()]),
+            'guest_photos': {
+                'stored': len(photo_ingest.saved_abs_paths),
+                'duplicates': photo_ingest.duplicates,
+                'reused': photo_ingest.reused,
+                'archive_entries': photo_sources.archive_entries,
+            },
         }), 201
     
+    except GuestPhotoArchiveError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': e.message}), e.status_code
     except ValueError as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Invalid date format: {str(e)}'}), 400
@@ -500,6 +685,8 @@ def create_chatbot(user):
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error creating chatbot: {str(e)}'}), 500
     finally:
+        photo_sources.close(consumed=created_successfully)
+
         if saved_guest_list_abs and os.path.exists(saved_guest_list_abs):
             try:
                 os.remove(saved_guest_list_abs)
@@ -507,12 +694,14 @@ def create_chatbot(user):
                 pass
 
         if not created_successfully:
+            photo_ingest.discard()
             for file_path in (saved_background_abs, *saved_guest_image_abs_paths):
                 if file_path and os.path.exists(file_path):
                     try:
                         os.remove(file_path)
                     except OSError:
                         pass
+                    remove_photo_variants(file_path)
 
 # ============================================
 # Update Chatbot
@@ -522,7 +711,12 @@ def create_chatbot(user):
 @token_required
 @admin_required
 def update_chatbot(user, chatbot_id):
-    """Update chatbot"""
+    """
+    Update chatbot. Guest changes (guest_list rows, manual_guests,
+    deleted_guest_ids) are diffed against the current guests and written in
+    bulk. With dry_run the diff is returned and nothing is saved; new photos
+    are then listed by their uploaded filename.
+    """
     
     chatbot = Chatbot.query.get(chatbot_id)
     
@@ -536,6 +730,11 @@ def update_chatbot(user, chatbot_id):
 
     if not isinstance(data, dict):
         return jsonify({'success': False, 'message': 'Invalid request body'}), 400
+
+    # Files whose reference is dropped here; removed after commit if unused.
+    released_file_paths = []
+    dry_run = to_bool(data.get('dry_run'), False)
+    guest_plan = GuestSyncPlan(chatbot.id)
     
     gemini_api_key = str(data.get('gemini_api_key', '')).strip()
     if not gemini_api_key:
@@ -573,122 +772,154 @@ def update_chatbot(user, chatbot_id):
             chatbot.allow_previous_year_users,
         )
 
-    if is_form_data:
-        background_image = request.files.get('background_image')
-        guest_list = request.files.get('guest_list')
-        guest_images = request.files.getlist('guest_images')
-
-        if background_image and background_image.filename:
-            if not is_allowed_file(background_image.filename, IMAGE_EXTENSIONS):
-                return jsonify({'success': False, 'message': 'Invalid background image type'}), 400
+    # The uploaded archive is only deleted once the update is committed;
+    # every other exit keeps it so the admin can retry with the same upload.
+    photo_sources = None
+    photo_ingest = None
+    saved_background_abs = None
+    saved_guest_image_abs_paths = []
+    updated_successfully = False
+    try:
+        if is_form_data:
+            background_image = request.files.get('background_image')
+            guest_list = request.files.get('guest_list')
+            photo_sources = GuestPhotoSources(data, user)
 
-            _, background_image_path = save_uploaded_file(background_image, 'backgrounds')
-            chatbot.background_image = background_image_path
+            if background_image and background_image.filename:
+                if not is_allowed_file(background_image.filename, IMAGE_EXTENSIONS):
+                    return jsonify({'success': False, 'message': 'Invalid background image type'}), 400
 
-        if guest_list and guest_list.filename and not is_allowed_file(guest_list.filename, GUEST_LIST_EXTENSIONS):
-            return jsonify({'success': False, 'message': 'Guest list must be .csv or .xlsx'}), 400
+                if not dry_run:
+                    released_file_paths.append(chatbot.background_image)
+                    background_blob = store_upload(background_image)
+                    if background_blob.created:
+                        saved_background_abs = background_blob.abs_path
+                    chatbot.background_image = background_blob.relative_path
 
-        for guest_image in guest_images:
-            if guest_image and guest_image.filename and not is_allowed_file(guest_image.filename, GUEST_IMAGE_EXTENSIONS):
-                return jsonify({'success': False, 'message': 'Guest images must be valid image files'}), 400
+            if guest_list and guest_list.filename and not is_allowed_file(guest_list.filename, GUEST_LIST_EXTENSIONS):
+                return jsonify({'success': False, 'message': 'Guest list must be .csv or .xlsx'}), 400
 
-        guest_photo_lookup = {}
-        guest_image_lookup = build_guest_image_lookup(guest_images)
-        for key, file_obj in guest_image_lookup.items():
-            if '.' not in key:
-                continue
-            _, saved_relative = save_uploaded_file(file_obj, 'guests')
-            guest_photo_lookup[key] = saved_relative
-            stem = os.path.splitext(key)[0]
-            if stem and stem not in guest_photo_lookup:
-                guest_photo_lookup[stem] = saved_relative
-
-        if guest_list and guest_list.filename:
-            saved_guest_list_abs, _ = save_uploaded_file(guest_list, 'guest_lists')
             try:
-                imported_rows = parse_guest_list_file(saved_guest_list_abs, get_file_extension(guest_list.filename))
-            finally:
-                if saved_guest_list_abs and os.path.exists(saved_guest_list_abs):
-                    try:
-                        os.remove(saved_guest_list_abs)
-                    except OSError:
-                        pass
+                photo_sources.validate()
+                guest_image_lookup = photo_sources.build_lookup()
+                if dry_run:
+                    guest_photo_lookup = {
+                        key: file_obj.filename for key, file_obj in guest_image_lookup.items()
+                    }
+                else:
+                    photo_ingest = create_guest_photo_ingest()
+                    guest_photo_lookup = save_guest_image_lookup(guest_image_lookup, photo_ingest)
+            except GuestPhotoArchiveError as e:
+                return jsonify({'success': False, 'message': e.message, 'upload': e.payload}), e.status_code
+
+            imported_guests = []
+
+            if guest_list and guest_list.filename:
+                saved_guest_list_abs, _ = save_uploaded_file(guest_list, 'guest_lists')
+                try:
+                    imported_rows = run_blocking(
+                        parse_guest_list_file,
+                        saved_guest_list_abs,
+                        get_file_extension(guest_list.filename),
+                    )
+                finally:
+                    if saved_guest_list_abs and os.path.exists(saved_guest_list_abs):
+                        try:
+                            os.remove(saved_guest_list_abs)
+                        except OSError:
+                            pass
+
+                for guest_row in imported_rows:
+                    name = str(guest_row.get('name', '')).strip()
+                    if not name:
+                        continue
+                    image_reference = normalize_file_key(get_guest_image_reference(guest_row))
+                    imported_guests.append({
+                        'name': name,
+                        'photo': guest_photo_lookup.get(image_reference) if image_reference else None,
+                    })
+
+            guest_ids_to_delete = []
+            for raw_id in deleted_guest_ids:
+                try:
+                    guest_ids_to_delete.append(int(raw_id))
+                except (TypeError, ValueError):
+                    continue
 
-            for guest_row in imported_rows:
-                name = str(guest_row.get('name', '')).strip()
+            manual_guest_rows = []
+            for index, manual_guest in enumerate(manual_guests):
+                name = str(manual_guest.get('name', '')).strip()
                 if not name:
                     continue
-                image_reference = normalize_file_key(get_guest_image_reference(guest_row))
-                photo_path = guest_photo_lookup.get(image_reference) if image_reference else None
-                db.session.add(Guest(
-                    chatbot=chatbot,
-                    name=name,
-                    photo=photo_path
-                ))
-
-        for raw_id in deleted_guest_ids:
-            try:
-                guest_id = int(raw_id)
-            except (TypeError, ValueError):
-                continue
-            existing_guest = Guest.query.filter_by(id=guest_id, chatbot_id=chatbot.id).first()
-            if existing_guest:
-                delete_guest_image_file(existing_guest.photo)
-                db.session.delete(existing_guest)
 
-        for index, manual_guest in enumerate(manual_guests):
-            name = str(manual_guest.get('name', '')).strip()
-            if not name:
-                continue
-
-            photo_field = str(manual_guest.get('photo_file_field', '')).strip()
-            photo_path = None
-            if photo_field:
-                manual_photo_file = request.files.get(photo_field)
-                if manual_photo_file and manual_photo_file.filename:
-                    if not is_allowed_file(manual_photo_file.filename, GUEST_IMAGE_EXTENSIONS):
-                        return jsonify({'success': False, 'message': f'Invalid image type for manual guest #{index + 1}'}), 400
-                    _, photo_path = save_guest_image_by_name(manual_photo_file, name)
+                photo_field = str(manual_guest.get('photo_file_field', '')).strip()
+                photo_path = None
+                if photo_field:
+                    manual_photo_file = request.files.get(photo_field)
+                    if manual_photo_file and manual_photo_file.filename:
+                        if not is_allowed_file(manual_photo_file.filename, GUEST_IMAGE_EXTENSIONS):
+                            return jsonify({'success': False, 'message': f'Invalid image type for manual guest #{index + 1}'}), 400
+                        if dry_run:
+                            photo_path = manual_photo_file.filename
+                        else:
+                            stored_photo = save_guest_image(manual_photo_file)
+                            if stored_photo.created:
+                                saved_guest_image_abs_paths.append(stored_photo.abs_path)
+                            photo_path = stored_photo.relative_path
 
-            guest_id = manual_guest.get('id')
-            existing_guest = None
-            if guest_id is not None:
                 try:
-                    guest_id = int(guest_id)
-                    existing_guest = Guest.query.filter_by(id=guest_id, chatbot_id=chatbot.id).first()
+                    guest_id = int(manual_guest.get('id'))
                 except (TypeError, ValueError):
-                    existing_guest = None
-
-            if existing_guest:
-                previous_name = str(existing_guest.name or '').strip()
-                existing_guest.name = name
-                if photo_path:
-                    existing_guest.photo = photo_path
-                elif existing_guest.photo and previous_name != name:
-                    renamed_photo_path = rename_guest_image_by_name(existing_guest.photo, name)
-                    if renamed_photo_path:
-                        existing_guest.photo = renamed_photo_path
-            else:
-                db.session.add(Guest(
-                    chatbot=chatbot,
-                    name=name,
-                    photo=photo_path
-                ))
+                    guest_id = None
+                manual_guest_rows.append({'id': guest_id, 'name': name, 'photo': photo_path})
+
+            guest_plan = plan_guest_sync(chatbot.id, imported_guests, manual_guest_rows, guest_ids_to_delete)
+            if not dry_run:
+                apply_guest_sync(guest_plan, rename_photo=rename_guest_image_by_name)
+                released_file_paths.extend(guest_plan.released_photos())
         
-        # Handle image clearing
+        # Handle image clearing (form or JSON data)
         if data.get('clear_background_image') == '1':
+            released_file_paths.append(chatbot.background_image)
             chatbot.background_image = None
     
-    # Handle image clearing from JSON data
-    if 'clear_background_image' in data and data.get('clear_background_image') == '1':
-        chatbot.background_image = None
-    
-    if 'start_date' in data:
-        chatbot.start_date = datetime.fromisoformat(data['start_date']).date()
-    if 'end_date' in data:
-        chatbot.end_date = parse_end_date(data['end_date'])
+        try:
+            if 'start_date' in data:
+                chatbot.start_date = datetime.fromisoformat(data['start_date']).date()
+            if 'end_date' in data:
+                chatbot.end_date = parse_end_date(data['end_date'])
+        except (TypeError, ValueError) as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': f'Invalid date format: {str(e)}'}), 400
+
+        if dry_run:
+            db.session.rollback()
+            return jsonify({
+                'success': True,
+                'dry_run': True,
+                'message': 'Dry run: no changes were saved',
+                'data': {'guests': guest_plan.to_dict()},
+            }), 200
     
-    db.session.commit()
+        # Files still used elsewhere survive; the asset reclaimer checks.
+        tombstone_assets(released_file_paths, 'chatbot_updated')
+        db.session.commit()
+        updated_successfully = True
+    finally:
+        if photo_sources is not None:
+            photo_sources.close(consumed=updated_successfully)
+
+        # A rejected or failed update leaves no files behind that nothing references.
+        if not updated_successfully:
+            if photo_ingest is not None:
+                photo_ingest.discard()
+            for file_path in (saved_background_abs, *saved_guest_image_abs_paths):
+                if file_path and os.path.exists(file_path):
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        pass
+                    remove_photo_variants(file_path)
     
     return jsonify({
         'success': True,
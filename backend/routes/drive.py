@@ -7,6 +7,7 @@ from flask import Blueprint, current_app, jsonify, request
 try:
     from models import Chatbot, ChatbotParticipant, DriveImageBackup, Message, db
     from routes.auth import token_required
+    from services.concurrency import release_db_connection
     from services.google_drive_service import (
         GoogleDriveServiceError,
         ensure_chatbot_folder,
@@ -16,6 +17,7 @@ try:
 except ImportError:
     from backend.models import Chatbot, ChatbotParticipant, DriveImageBackup, Message, db
     from backend.routes.auth import token_required
+    from backend.services.concurrency import release_db_connection
     from backend.services.google_drive_service import (
         GoogleDriveServiceError,
         ensure_chatbot_folder,
@@ -30,6 +32,7 @@ _ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
 _ALLOWED_PREFIXES = (
     "static/generated/",
     "uploads/messages/",
+    "uploads/blobs/",
 )
 
 
@@ -115,6 +118,7 @@ def list_drive_folders(user):
                 return jsonify({"success": False, "message": "Access denied for chatbot"}), 403
             chatbot_name = chatbot.name or f"Chatbot {chatbot.id}"
 
+    release_db_connection(db.session)
     options = get_folder_options(chatbot_name=chatbot_name)
 
     return jsonify({
@@ -155,6 +159,8 @@ def save_image_to_drive(user):
         ), 400
 
     normalized_image_path = _normalize_local_image_path(image_value)
+    # Drive folder lookup and upload can take seconds; don't hold a pooled connection meanwhile.
+    release_db_connection(db.session)
 
     try:
         target_folder_id = drive_folder_id
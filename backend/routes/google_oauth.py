@@ -2,16 +2,17 @@ import secrets
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
 
-import requests
 from flask import Blueprint, current_app, jsonify, redirect, request
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 try:
     from models import User, db
     from routes.auth import token_required
+    from services.instrumentation import track_outbound
 except ImportError:
     from backend.models import User, db
     from backend.routes.auth import token_required
+    from backend.services.instrumentation import track_outbound
 
 
 google_bp = Blueprint("google_oauth", __name__)
@@ -167,6 +168,8 @@ def google_auth_login(user):
 
 @google_bp.route("/auth/callback", methods=["GET"])
 def google_auth_callback():
+    import requests  # only needed for the token exchange; slow to import
+
     code = str(request.args.get("code") or "").strip()
     state = str(request.args.get("state") or "").strip()
     oauth_error = str(request.args.get("error") or "").strip()
@@ -208,17 +211,18 @@ def google_auth_callback():
         return _popup_callback_html(False, "Google OAuth configuration is missing."), 400
 
     try:
-        token_response = requests.post(
-            _GOOGLE_TOKEN_URL,
-            data={
-                "code": code,
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "redirect_uri": redirect_uri,
-                "grant_type": "authorization_code",
-            },
-            timeout=20,
-        )
+        with track_outbound("google_oauth"):
+            token_response = requests.post(
+                _GOOGLE_TOKEN_URL,
+                data={
+                    "code": code,
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "redirect_uri": redirect_uri,
+                    "grant_type": "authorization_code",
+                },
+                timeout=20,
+            )
     except requests.RequestException as exc:
         current_app.logger.warning("Google token exchange request failed: %s", exc)
         return _popup_callback_html(False, "Failed to connect to Google token endpoint."), 502
@@ -3,16 +3,14 @@
 # ============================================
 
 from flask import Blueprint, request, jsonify, current_app
-from sqlalchemy import and_, or_, extract
-from datetime import datetime
+from sqlalchemy import and_, or_, extract, func, select, tuple_
+from datetime import datetime, timezone
 import base64
 import json
 import os
 import time
 from pathlib import Path
 import re
-import requests
-import uuid
 from werkzeug.utils import secure_filename
 
 try:
@@ -23,6 +21,12 @@ try:
         get_or_create_chatbot_folder,
         upload_image_to_folder,
     )
+    from services.guest_photo_service import existing_variant_path
+    from services.blob_store import adjust_blob_references, get_blob_store
+    from services.asset_reclaimer import normalize_asset_path, tombstone_assets
+    from services.conditional_get import not_modified, read_validators, with_validators
+    from services.concurrency import release_db_connection
+    from services.instrumentation import track_outbound
 except ImportError:
     from backend.models import db, Chatbot, Message, ChatbotParticipant, User, Conversation, Guest, DriveImageBackup
     from backend.routes.auth import token_required
@@ -31,6 +35,12 @@ except ImportError:
         get_or_create_chatbot_folder,
         upload_image_to_folder,
     )
+    from backend.services.guest_photo_service import existing_variant_path
+    from backend.services.blob_store import adjust_blob_references, get_blob_store
+    from backend.services.asset_reclaimer import normalize_asset_path, tombstone_assets
+    from backend.services.conditional_get import not_modified, read_validators, with_validators
+    from backend.services.concurrency import release_db_connection
+    from backend.services.instrumentation import track_outbound
 
 user_bp = Blueprint('user', __name__)
 
@@ -69,11 +79,18 @@ def _is_limited_image_generation_user(user):
     return str(getattr(user, 'role', '') or '').strip().lower() == 'user'
 
 
+# requests is imported inside the functions that call out: it is slow to
+# import and only needed once a request talks to Gemini.
 def _do_gemini_post(endpoint, payload, timeout, retries=3, backoff=1.5):
+    import requests
+
+    # Generations take tens of seconds; don't keep a pooled connection out meanwhile.
+    release_db_connection(db.session)
     last_exc = None
     for attempt in range(1, retries + 1):
         try:
-            response = requests.post(endpoint, json=payload, timeout=timeout)
+            with track_outbound('gemini'):
+                response = requests.post(endpoint, json=payload, timeout=timeout)
             return response
         except requests.exceptions.RequestException as exc:
             last_exc = exc
@@ -190,6 +207,8 @@ def _build_guest_image_payloads(chatbot_id, guest_ids):
         if path_key in seen_paths:
             continue
 
+        # Prefer the downscaled JPEG written at upload time over the original.
+        photo_path = existing_variant_path(photo_path, 'reference') or photo_path
         extension = photo_path.suffix.lower()
         mime_type = IMAGE_EXTENSION_TO_MIME.get(extension)
         if mime_type not in ALLOWED_IMAGE_MIME_TYPES:
@@ -263,26 +282,13 @@ def _save_message_image(image_bytes, original_filename):
     if extension not in IMAGE_EXTENSION_TO_MIME:
         extension = '.jpg'
 
-    upload_root = Path(current_app.root_path) / 'uploads' / 'messages'
-    upload_root.mkdir(parents=True, exist_ok=True)
-
-    file_name = f"{uuid.uuid4().hex}{extension}"
-    absolute_path = upload_root / file_name
-    absolute_path.write_bytes(image_bytes)
-
-    return f"uploads/messages/{file_name}"
+    return get_blob_store().write_bytes(image_bytes, extension).relative_path
 
 
 def _save_generated_image_to_static(image_bytes, mime_type='image/png'):
     extension = MIME_TO_EXTENSION.get(str(mime_type or '').lower(), '.png')
-    static_root = Path(current_app.static_folder or (Path(current_app.root_path) / 'static'))
-    generated_root = static_root / 'generated'
-    generated_root.mkdir(parents=True, exist_ok=True)
-
-    file_name = f"{uuid.uuid4().hex}{extension}"
-    file_path = generated_root / file_name
-    file_path.write_bytes(image_bytes)
-    return f"/static/generated/{file_name}"
+    stored = get_blob_store().write_bytes(image_bytes, extension, area='generated')
+    return f"/{stored.relative_path}"
 
 
 def _sanitize_drive_filename_component(raw_value, fallback='user'):
@@ -326,7 +332,8 @@ def _upload_generated_image_to_admin_drive(chatbot, user, image_url, mime_type='
         from services.google_drive_service import upload_to_drive
         image_bytes = absolute_path.read_bytes()
         username = getattr(user, 'username', 'user')
-        
+        release_db_connection(db.session)
+
         uploaded = upload_to_drive(
             image_bytes=image_bytes,
             chatbot_id=chatbot.id,
@@ -383,55 +390,6 @@ def _is_path_within_root(candidate_path, root_path):
         return False
 
 
-def _resolve_deletable_message_image_path(image_url):
-    raw_value = str(image_url or '').strip().replace('\\', '/')
-    if not raw_value:
-        return None
-
-    if raw_value.startswith('http://') or raw_value.startswith('https://'):
-        return None
-
-    normalized = raw_value.split('?', 1)[0].split('#', 1)[0].lstrip('/')
-    if not normalized:
-        return None
-
-    uploads_root = Path(current_app.root_path) / 'uploads' / 'messages'
-    static_generated_root = Path(current_app.static_folder or (Path(current_app.root_path) / 'static')) / 'generated'
-
-    # Only delete user-uploaded message images, not AI-generated images
-    if normalized.startswith('uploads/messages/'):
-        candidate_path = Path(current_app.root_path) / normalized
-        if _is_path_within_root(candidate_path, uploads_root):
-            return candidate_path
-
-    # PRESERVE AI-generated images - do not delete them when conversation is deleted
-    if normalized.startswith('static/generated/'):
-        return None
-
-    return None
-
-
-def _delete_message_image_assets(messages):
-    seen_paths = set()
-
-    for message in messages:
-        image_path = _resolve_deletable_message_image_path(getattr(message, 'image_url', None))
-        if not image_path:
-            continue
-
-        path_key = str(image_path)
-        if path_key in seen_paths:
-            continue
-
-        seen_paths.add(path_key)
-
-        try:
-            if image_path.exists() and image_path.is_file():
-                image_path.unlink()
-        except Exception as error:
-            current_app.logger.warning('Failed to delete message image asset %s: %s', image_path, error)
-
-
 def _extract_first_http_image_url(text):
     lines = _extract_markdown_image_lines(text)
     for line in lines:
@@ -452,6 +410,8 @@ def _extract_first_http_image_url(text):
 
 
 def _download_image_from_url(url):
+    import requests
+
     try:
         response = requests.get(url, timeout=30)
     except Exception:
@@ -571,6 +531,8 @@ def _build_message_preview(message):
 
 def _generate_image_with_genai(chatbot, user, user_text, image_payloads=None, generation_mode='single'):
     """Generate image using Gemini REST API and parse image/text response safely."""
+    import requests
+
     api_key = (chatbot.gemini_api_key or '').strip()
     if not api_key:
         api_key = (
@@ -691,6 +653,8 @@ def _generate_image_with_genai(chatbot, user, user_text, image_payloads=None, ge
 
 
 def _call_gemini(chatbot, user, user_text, image_payloads=None, generation_mode='single', expect_image=False):
+    import requests
+
     # Use image generation endpoint path for image requests.
     if expect_image:
         return _generate_image_with_genai(chatbot, user, user_text, image_payloads, generation_mode)
@@ -778,22 +742,24 @@ def _call_gemini(chatbot, user, user_text, image_payloads=None, generation_mode=
         if include_response_modalities:
             generation_config['responseModalities'] = ['IMAGE', 'TEXT']
 
-        return requests.post(
-            endpoint,
-            json={
-                'contents': [{
-                    'role': 'user',
-                    'parts': parts
-                }],
-                'generationConfig': generation_config
-            },
-            timeout=45
-        )
+        with track_outbound('gemini'):
+            return requests.post(
+                endpoint,
+                json={
+                    'contents': [{
+                        'role': 'user',
+                        'parts': parts
+                    }],
+                    'generationConfig': generation_config
+                },
+                timeout=45
+            )
 
     payload = None
     model_name = GEMINI_MODEL
     errors = []
 
+    release_db_connection(db.session)
     response = _post_generate(GEMINI_MODEL, include_response_modalities=False)
     if response.status_code >= 400:
         try:
@@ -889,6 +855,98 @@ def _serialize_conversation(conversation):
     data['last_message_preview'] = _build_message_preview(latest_message)
     return data
 
+
+MESSAGE_PAGE_DEFAULT = 50
+MESSAGE_PAGE_MAX = 200
+
+
+def _page_messages(query):
+    """
+    Apply the history paging query params to a Message query.
+
+    No params returns the whole history (older clients). Otherwise:
+    limit (default 50, max 200) plus
+      before_id: older messages, ending just before that message;
+      after_id / since (ISO timestamp): newer messages, for incremental polls;
+      none of those: the latest page.
+    Pages are keyset ranges on (created_at, id), which the messages
+    indexes serve. Returns (messages, paging) with messages in
+    chronological order and paging None for the whole history; raises
+    ValueError for an unknown cursor or bad timestamp.
+    """
+    args = request.args
+    if not any(args.get(key) for key in ('limit', 'before_id', 'after_id', 'since')):
+        return query.order_by(Message.created_at, Message.id).all(), None
+
+    limit = args.get('limit', MESSAGE_PAGE_DEFAULT, type=int)
+    limit = max(1, min(limit or MESSAGE_PAGE_DEFAULT, MESSAGE_PAGE_MAX))
+    before_id = args.get('before_id', type=int)
+    after_id = args.get('after_id', type=int)
+    since = (args.get('since') or '').strip()
+
+    def cursor_key(message_id):
+        row = (
+            db.session.query(Message.created_at, Message.id)
+            .filter(Message.id == message_id)
+            .first()
+        )
+        if row is None:
+            raise ValueError('Unknown message cursor')
+        return tuple_(row.created_at, row.id)
+
+    position = tuple_(Message.created_at, Message.id)
+    newer = bool(after_id or since)
+    if after_id:
+        query = query.filter(position > cursor_key(after_id))
+    elif since:
+        try:
+            since_at = datetime.fromisoformat(since.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('Invalid since timestamp')
+        if since_at.tzinfo is not None:
+            since_at = since_at.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.filter(Message.created_at > since_at)
+    elif before_id:
+        query = query.filter(position < cursor_key(before_id))
+
+    if newer:
+        ordered = query.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        ordered = query.order_by(Message.created_at.desc(), Message.id.desc())
+
+    # Fetch one extra row to learn whether another page exists.
+    messages = ordered.limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not newer:
+        messages.reverse()
+
+    paging = {
+        'count': len(messages),
+        'limit': limit,
+        'has_more': has_more,
+        # Cursor for the page before this one (older history).
+        'next_before_id': messages[0].id if messages else before_id,
+        # Cursor to poll for messages after this page.
+        'next_after_id': messages[-1].id if messages else after_id,
+    }
+    return messages, paging
+
+
+def _message_page_response(query, etag, last_modified):
+    try:
+        messages, paging = _page_messages(query)
+    except ValueError as exc:
+        return jsonify({'success': False, 'message': str(exc)}), 400
+
+    payload = {
+        'success': True,
+        'data': Message.to_dict_many(messages),
+    }
+    if paging is not None:
+        payload.update(paging)
+    return with_validators(jsonify(payload), etag, last_modified), 200
+
 # ============================================
 # Available Chatbots
 # ============================================
@@ -908,6 +966,16 @@ def get_user_guests(user):
     if not participant:
         return jsonify({'success': False, 'message': 'Not joined this chatbot'}), 403
 
+    # Guest dicts carry the chatbot's name/event/active too.
+    etag, last_modified = read_validators(
+        ('guests', chatbot_id),
+        (Guest.updated_at, Guest.chatbot_id == chatbot_id),
+        (Chatbot.updated_at, Chatbot.id == chatbot_id),
+    )
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     guests = (
         Guest.query
         .filter_by(chatbot_id=chatbot_id, active=True)
@@ -915,10 +983,10 @@ def get_user_guests(user):
         .all()
     )
 
-    return jsonify({
+    return with_validators(jsonify({
         'success': True,
         'data': [guest.to_dict() for guest in guests]
-    }), 200
+    }), etag, last_modified), 200
 
 @user_bp.route('/chatbots', methods=['GET'])
 @token_required
@@ -1086,7 +1154,23 @@ def join_chatbot(user, chatbot_id):
 @token_required
 def get_my_chatbots(user):
     """Get chatbots user has joined"""
-    
+
+    # Chatbot dicts include guests and participant/message counts, and
+    # status/expiry depend on the date.
+    joined_ids = select(ChatbotParticipant.chatbot_id).where(ChatbotParticipant.user_id == user.id)
+    today = datetime.utcnow().date()
+    etag, last_modified = read_validators(
+        ('my-chatbots', user.id, today, datetime.now().date()),
+        (ChatbotParticipant.joined_at, ChatbotParticipant.user_id == user.id),
+        (Chatbot.updated_at, Chatbot.id.in_(joined_ids)),
+        (Guest.updated_at, Guest.chatbot_id.in_(joined_ids)),
+        (ChatbotParticipant.joined_at, ChatbotParticipant.chatbot_id.in_(joined_ids)),
+        (Message.created_at, Message.chatbot_id.in_(joined_ids)),
+    )
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     participants = ChatbotParticipant.query.filter_by(user_id=user.id).all()
     chatbot_ids = [p.chatbot_id for p in participants]
     
@@ -1107,11 +1191,12 @@ def get_my_chatbots(user):
 
     if changed:
         db.session.commit()
+        # The expiry sync bumped updated_at; the next poll revalidates against that.
 
-    return jsonify({
+    return with_validators(jsonify({
         'success': True,
         'data': results
-    }), 200
+    }), etag, last_modified), 200
 
 # ============================================
 # User Profile
@@ -1199,6 +1284,16 @@ def list_conversations(user, chatbot_id):
     if not participant:
         return jsonify({'success': False, 'message': 'Not joined this chatbot'}), 403
 
+    # Messages too: a bot reply can land after the conversation was last touched.
+    etag, last_modified = read_validators(
+        ('conversations', chatbot_id, user.id),
+        (Conversation.updated_at, Conversation.chatbot_id == chatbot_id, Conversation.user_id == user.id),
+        (Message.created_at, Message.chatbot_id == chatbot_id, Message.user_id == user.id),
+    )
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     rows = (
         Conversation.query
         .filter_by(chatbot_id=chatbot_id, user_id=user.id)
@@ -1206,10 +1301,10 @@ def list_conversations(user, chatbot_id):
         .all()
     )
 
-    return jsonify({
+    return with_validators(jsonify({
         'success': True,
         'data': [_serialize_conversation(row) for row in rows]
-    }), 200
+    }), etag, last_modified), 200
 
 
 @user_bp.route('/chatbots/<int:chatbot_id>/conversations', methods=['POST'])
@@ -1276,10 +1371,22 @@ def delete_conversation(user, chatbot_id, conversation_id):
     if not conversation:
         return jsonify({'success': False, 'message': 'Conversation not found'}), 404
 
-    conversation_messages = Message.query.filter_by(conversation_id=conversation.id).all()
-    _delete_message_image_assets(conversation_messages)
-    for message in conversation_messages:
-        db.session.delete(message)
+    image_counts = dict(
+        db.session.query(Message.image_url, func.count(Message.id))
+        .filter(Message.conversation_id == conversation.id, Message.image_url.isnot(None))
+        .group_by(Message.image_url)
+        .all()
+    )
+
+    # Bulk delete skips the flush hook, so release the image references here.
+    adjust_blob_references(db.session.connection(), {url: -count for url, count in image_counts.items()})
+    Message.query.filter_by(conversation_id=conversation.id).delete(synchronize_session=False)
+
+    # Uploaded images are reclaimed in the background; generated images are kept.
+    tombstone_assets(
+        [url for url in image_counts if (normalize_asset_path(url) or '').startswith('uploads/')],
+        'conversation_deleted'
+    )
 
     db.session.delete(conversation)
     db.session.commit()
@@ -1301,17 +1408,17 @@ def get_conversation_messages(user, chatbot_id, conversation_id):
     if not conversation:
         return jsonify({'success': False, 'message': 'Conversation not found'}), 404
 
-    messages = (
-        Message.query
-        .filter_by(chatbot_id=chatbot_id, user_id=user.id, conversation_id=conversation.id)
-        .order_by(Message.created_at)
-        .all()
+    # Messages are append-only; each one embeds the (already loaded) user.
+    etag, last_modified = read_validators(
+        ('conversation-messages', conversation.id, user.to_dict(), sorted(request.args.items())),
+        (Message.created_at, Message.conversation_id == conversation.id),
     )
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
 
-    return jsonify({
-        'success': True,
-        'data': [message.to_dict() for message in messages]
-    }), 200
+    query = Message.query.filter_by(chatbot_id=chatbot_id, user_id=user.id, conversation_id=conversation.id)
+    return _message_page_response(query, etag, last_modified)
 
 
 # ============================================
@@ -1321,7 +1428,7 @@ def get_conversation_messages(user, chatbot_id, conversation_id):
 @user_bp.route('/chatbots/<int:chatbot_id>/messages', methods=['GET'])
 @token_required
 def get_chatbot_messages(user, chatbot_id):
-    """Get messages for a chatbot"""
+    """Get messages for a chatbot (paging params: see _page_messages)"""
 
     participant = _get_participant(chatbot_id, user.id)
     if not participant:
@@ -1329,19 +1436,24 @@ def get_chatbot_messages(user, chatbot_id):
 
     conversation_id = request.args.get('conversation_id', type=int)
     query = Message.query.filter_by(chatbot_id=chatbot_id, user_id=user.id)
+    criteria = [Message.chatbot_id == chatbot_id, Message.user_id == user.id]
 
     if conversation_id:
         conversation = _get_conversation_for_user(chatbot_id, conversation_id, user.id)
         if not conversation:
             return jsonify({'success': False, 'message': 'Conversation not found'}), 404
         query = query.filter_by(conversation_id=conversation.id)
+        criteria.append(Message.conversation_id == conversation.id)
 
-    messages = query.order_by(Message.created_at).all()
-    
-    return jsonify({
-        'success': True,
-        'data': [message.to_dict() for message in messages]
-    }), 200
+    etag, last_modified = read_validators(
+        ('chatbot-messages', chatbot_id, user.to_dict(), sorted(request.args.items())),
+        (Message.created_at, *criteria),
+    )
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
+    return _message_page_response(query, etag, last_modified)
 
 @user_bp.route('/chatbots/<int:chatbot_id>/messages', methods=['POST'])
 @token_required
@@ -10,6 +10,7 @@ from flask import Blueprint, current_app, jsonify, request
 try:
     from models import WhatsAppSendHistory, db
     from routes.auth import token_required
+    from services.concurrency import release_db_connection
     from services.whatsapp_service import (
         WhatsAppServiceError,
         send_whatsapp_template_image,
@@ -19,6 +20,7 @@ try:
 except ImportError:
     from backend.models import WhatsAppSendHistory, db
     from backend.routes.auth import token_required
+    from backend.services.concurrency import release_db_connection
     from backend.services.whatsapp_service import (
         WhatsAppServiceError,
         send_whatsapp_template_image,
@@ -474,6 +476,8 @@ def send_image_via_whatsapp(user):
         return jsonify({"success": False, "message": "WHATSAPP_TEMPLATE_NAME is not configured"}), 500
 
     normalized_to = _normalize_whatsapp_number(whatsapp_number)
+    # Meta's API can take seconds; don't hold a pooled connection meanwhile.
+    release_db_connection(db.session)
 
     try:
         try:
@@ -602,6 +606,8 @@ def send_text_via_whatsapp(user):
         return jsonify({"success": False, "message": "text is required"}), 400
 
     normalized_to = _normalize_whatsapp_number(whatsapp_number)
+    # Meta's API can take seconds; don't hold a pooled connection meanwhile.
+    release_db_connection(db.session)
 
     try:
         api_response = send_whatsapp_text(normalized_to, text)
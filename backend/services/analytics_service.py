@@ -0,0 +1,385 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func, select
+
+try:
+    from models import (
+        db, Message, SessionToken, WhatsAppSendHistory, DriveImageBackup, ChatbotParticipant,
+    )
+except ImportError:
+    from backend.models import (
+        db, Message, SessionToken, WhatsAppSendHistory, DriveImageBackup, ChatbotParticipant,
+    )
+
+
+class AnalyticsServiceError(Exception):
+    def __init__(self, message: str, status_code: int = 400, payload: Any = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.payload = payload
+
+
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Window used when the caller does not pass start/end.
+DEFAULT_WINDOWS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(hours=48),
+    "day": timedelta(days=30),
+}
+
+_SQLITE_BUCKET_FORMATS = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+MAX_BUCKETS = 2000
+_MAX_CACHE_ENTRIES = 256
+
+_cache: Dict[str, Dict[str, Any]] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_config_int(name: str, default: int) -> int:
+    try:
+        return int(current_app.config.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _image_filters() -> list:
+    return [
+        Message.is_user_message.is_(False),
+        func.lower(Message.message_type) == "image",
+        Message.image_url.isnot(None),
+        func.length(func.trim(Message.image_url)) > 0,
+    ]
+
+
+def _participant_user_ids(chatbot_ids: List[int]):
+    return db.session.query(ChatbotParticipant.user_id).filter(
+        ChatbotParticipant.chatbot_id.in_(chatbot_ids)
+    )
+
+
+# Each metric: source model, timestamp column, chatbot column (None when rows
+# are attributed to chatbots through participants) and extra filters.
+# Logins are counted from session tokens, so sessions ended by logout drop out.
+METRICS = {
+    "messages": {
+        "model": Message,
+        "created_at": Message.created_at,
+        "chatbot_id": Message.chatbot_id,
+        "filters": lambda: [],
+    },
+    "images": {
+        "model": Message,
+        "created_at": Message.created_at,
+        "chatbot_id": Message.chatbot_id,
+        "filters": _image_filters,
+    },
+    "logins": {
+        "model": SessionToken,
+        "created_at": SessionToken.created_at,
+        "chatbot_id": None,
+        "user_id": SessionToken.user_id,
+        "filters": lambda: [],
+    },
+    "whatsapp_sends": {
+        "model": WhatsAppSendHistory,
+        "created_at": WhatsAppSendHistory.created_at,
+        "chatbot_id": None,
+        "user_id": WhatsAppSendHistory.user_id,
+        "filters": lambda: [WhatsAppSendHistory.status.like("sent:%")],
+    },
+    "drive_backups": {
+        "model": DriveImageBackup,
+        "created_at": DriveImageBackup.created_at,
+        "chatbot_id": DriveImageBackup.chatbot_id,
+        "filters": lambda: [],
+    },
+}
+
+
+def floor_to_bucket(value: datetime, bucket: str) -> datetime:
+    if bucket == "minute":
+        return value.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_expression(column, bucket: str):
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return func.strftime(_SQLITE_BUCKET_FORMATS[bucket], column)
+    return func.date_trunc(bucket, column)
+
+
+def _coerce_bucket_value(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_datetime(raw_value: Optional[str], field: str) -> Optional[datetime]:
+    if not raw_value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(raw_value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise AnalyticsServiceError(f"{field} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def parse_timeseries_request(args) -> Dict[str, Any]:
+    """Validate query args into a normalized request dict (raises AnalyticsServiceError)."""
+    bucket = str(args.get("bucket") or "hour").strip().lower()
+    if bucket not in BUCKET_SIZES:
+        raise AnalyticsServiceError("bucket must be one of: minute, hour, day")
+
+    raw_metrics = args.get("metrics") or "messages"
+    metrics = []
+    for name in str(raw_metrics).split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in METRICS:
+            raise AnalyticsServiceError(
+                f"Unknown metric '{name}'. Supported: {', '.join(sorted(METRICS))}"
+            )
+        if name not in metrics:
+            metrics.append(name)
+    if not metrics:
+        raise AnalyticsServiceError("At least one metric is required")
+
+    chatbot_ids = []
+    raw_chatbot_ids = args.getlist("chatbot_id") + [
+        part for value in args.getlist("chatbot_ids") for part in str(value).split(",")
+    ]
+    for raw_id in raw_chatbot_ids:
+        try:
+            parsed_id = int(str(raw_id).strip())
+        except (TypeError, ValueError):
+            raise AnalyticsServiceError("chatbot_ids must be integers")
+        if parsed_id > 0 and parsed_id not in chatbot_ids:
+            chatbot_ids.append(parsed_id)
+
+    start = _parse_datetime(args.get("start"), "start")
+    end = _parse_datetime(args.get("end"), "end")
+    live = end is None
+    if end is None:
+        end = datetime.utcnow()
+    if start is None:
+        start = floor_to_bucket(end - DEFAULT_WINDOWS[bucket], bucket)
+        # Live default windows slide with the clock; cache them by bucket.
+        range_key = "live" if live else f"..{end.isoformat()}"
+    else:
+        start = floor_to_bucket(start, bucket)
+        range_key = f"{start.isoformat()}..{'' if live else end.isoformat()}"
+    if start >= end:
+        raise AnalyticsServiceError("start must be before end")
+
+    if (end - start) / BUCKET_SIZES[bucket] > MAX_BUCKETS:
+        raise AnalyticsServiceError(
+            f"Requested range spans more than {MAX_BUCKETS} {bucket} buckets; narrow it or use a larger bucket"
+        )
+
+    return {
+        "bucket": bucket,
+        "metrics": metrics,
+        "chatbot_ids": sorted(chatbot_ids),
+        "start": start,
+        "end": end,
+        "live": live,
+        "range_key": range_key,
+        "split_by_chatbot": str(args.get("split") or "").strip().lower() == "chatbot",
+    }
+
+
+def _cache_key(params: Dict[str, Any]) -> str:
+    key_data = {
+        "bucket": params["bucket"],
+        "metrics": params["metrics"],
+        "chatbot_ids": params["chatbot_ids"],
+        "split": params["split_by_chatbot"],
+        "range": params["range_key"],
+    }
+    return json.dumps(key_data, sort_keys=True)
+
+
+def _data_fingerprint(params: Dict[str, Any]) -> List[Any]:
+    """
+    Row count and newest row id per source table, plus the current bucket
+    for live windows. The count catches deletes, which leave max(id) as is.
+    """
+    models = []
+    for metric in params["metrics"]:
+        model = METRICS[metric]["model"]
+        if model not in models:
+            models.append(model)
+
+    columns = []
+    for model in models:
+        columns.append(select(func.count()).select_from(model).scalar_subquery())
+        columns.append(select(func.max(model.id)).scalar_subquery())
+    values = list(db.session.execute(select(*columns)).one()) if columns else []
+
+    fingerprint: List[Any] = [
+        [model.__tablename__, values[2 * index], values[2 * index + 1]]
+        for index, model in enumerate(models)
+    ]
+    if params["live"]:
+        fingerprint.append(floor_to_bucket(params["end"], params["bucket"]).isoformat())
+    return fingerprint
+
+
+def _query_metric(metric: str, params: Dict[str, Any]) -> Dict[Optional[int], Dict[datetime, int]]:
+    definition = METRICS[metric]
+    created_at = definition["created_at"]
+    bucket_expr = _bucket_expression(created_at, params["bucket"])
+    chatbot_column = definition["chatbot_id"]
+    split = params["split_by_chatbot"] and chatbot_column is not None
+
+    columns = [bucket_expr.label("bucket"), func.count().label("count")]
+    if split:
+        columns.insert(0, chatbot_column.label("chatbot_id"))
+
+    query = db.session.query(*columns).filter(
+        created_at >= params["start"],
+        created_at < params["end"],
+        *definition["filters"](),
+    )
+
+    if params["chatbot_ids"]:
+        if chatbot_column is not None:
+            query = query.filter(chatbot_column.in_(params["chatbot_ids"]))
+        else:
+            query = query.filter(definition["user_id"].in_(_participant_user_ids(params["chatbot_ids"])))
+
+    group_columns = [bucket_expr]
+    if split:
+        group_columns.insert(0, chatbot_column)
+    rows = query.group_by(*group_columns).all()
+
+    results: Dict[Optional[int], Dict[datetime, int]] = {}
+    for row in rows:
+        bucket_value = _coerce_bucket_value(row.bucket)
+        if bucket_value is None:
+            continue
+        series_key = row.chatbot_id if split else None
+        series = results.setdefault(series_key, {})
+        series[bucket_value] = series.get(bucket_value, 0) + int(row.count or 0)
+    return results
+
+
+def _bucket_starts(params: Dict[str, Any]) -> List[datetime]:
+    step = BUCKET_SIZES[params["bucket"]]
+    cursor = params["start"]
+    starts = []
+    while cursor < params["end"]:
+        starts.append(cursor)
+        cursor += step
+    return starts
+
+
+def _fill_series(counts: Dict[datetime, int], bucket_starts: List[datetime]) -> List[Dict[str, Any]]:
+    return [
+        {"t": bucket_start.isoformat(), "count": counts.get(bucket_start, 0)}
+        for bucket_start in bucket_starts
+    ]
+
+
+def _build_payload(params: Dict[str, Any]) -> Dict[str, Any]:
+    bucket_starts = _bucket_starts(params)
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    totals: Dict[str, int] = {}
+    by_chatbot: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+
+    for metric in params["metrics"]:
+        results = _query_metric(metric, params)
+
+        combined: Dict[datetime, int] = {}
+        for counts in results.values():
+            for bucket_start, count in counts.items():
+                combined[bucket_start] = combined.get(bucket_start, 0) + count
+
+        series[metric] = _fill_series(combined, bucket_starts)
+        totals[metric] = sum(combined.values())
+
+        if params["split_by_chatbot"] and METRICS[metric]["chatbot_id"] is not None:
+            by_chatbot[metric] = {
+                str(chatbot_id): _fill_series(counts, bucket_starts)
+                for chatbot_id, counts in sorted(results.items(), key=lambda item: item[0] or 0)
+            }
+
+    payload = {
+        "success": True,
+        "bucket": params["bucket"],
+        "start": params["start"].isoformat(),
+        "end": params["end"].isoformat(),
+        "chatbot_ids": params["chatbot_ids"],
+        "metrics": params["metrics"],
+        "totals": totals,
+        "series": series,
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    if params["split_by_chatbot"]:
+        payload["series_by_chatbot"] = by_chatbot
+    return payload
+
+
+def get_timeseries(params: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    Return (payload, etag) for a parsed time-series request.
+
+    Results are cached per process. Within ANALYTICS_CACHE_TTL_SECONDS a hit
+    costs no queries; after that the cache is revalidated with a single query
+    for each source table's row count and max(id), and only recomputed when rows
+    were written or deleted (or a live window rolled into a new bucket).
+    """
+    ttl = _get_config_int("ANALYTICS_CACHE_TTL_SECONDS", 5)
+    key = _cache_key(params)
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry["expires_at"] > now:
+            return entry["payload"], entry["etag"]
+
+    fingerprint = _data_fingerprint(params)
+    etag = hashlib.sha1(
+        json.dumps([key, fingerprint], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    if entry and entry["etag"] == etag:
+        payload = entry["payload"]
+    else:
+        payload = _build_payload(params)
+
+    with _cache_lock:
+        if key not in _cache and len(_cache) >= _MAX_CACHE_ENTRIES:
+            oldest_key = min(_cache, key=lambda item: _cache[item]["expires_at"])
+            _cache.pop(oldest_key, None)
+        _cache[key] = {"payload": payload, "etag": etag, "expires_at": now + ttl}
+
+    return payload, etag
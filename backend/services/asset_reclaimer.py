@@ -0,0 +1,414 @@
+"""
+Deferred deletion of uploaded and generated files.
+
+Request handlers never unlink files. They record an AssetTombstone in the
+same transaction that drops the last reference. The AssetReclaimer thread
+works through due tombstones in batches. For each one it re-checks that
+nothing references the path any more before removing the file and its
+variants. A periodic orphan sweep walks uploads/ and static/generated/ and
+tombstones files that no row references, which also repairs leaks left by
+crashes or older code.
+"""
+
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import func, insert, text
+
+try:
+    from models import db, AssetTombstone
+    from services.blob_store import (
+        DERIVED_DIRNAME, TRACKED_COLUMNS, blob_reference, get_blob_store, release_blob_row,
+    )
+except ImportError:
+    from backend.models import db, AssetTombstone
+    from backend.services.blob_store import (
+        DERIVED_DIRNAME, TRACKED_COLUMNS, blob_reference, get_blob_store, release_blob_row,
+    )
+
+
+MANAGED_ROOTS = ("uploads", "static/generated")
+# Older rows sometimes store upload paths without the uploads/ prefix.
+_BARE_UPLOAD_DIRS = ("backgrounds/", "guests/", "guest_lists/", "messages/")
+_QUERY_CHUNK_SIZE = 500
+# pg_try_advisory_lock key, so only one process sweeps at a time.
+_SWEEP_LOCK_KEY = 73121
+
+_reclaimer_lock = threading.Lock()
+_reclaimer: Optional["AssetReclaimer"] = None
+_wake_event = threading.Event()
+_sweep_requested = threading.Event()
+
+
+def _get_config_int(name: str, default: int) -> int:
+    try:
+        return int(current_app.config.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _chunked(values: List[Any], size: int = _QUERY_CHUNK_SIZE) -> Iterator[List[Any]]:
+    for index in range(0, len(values), size):
+        yield values[index:index + size]
+
+
+def normalize_asset_path(value: Any) -> Optional[str]:
+    """
+    Map a stored path or URL to a path relative to the app root under
+    uploads/ or static/generated/; None for anything else.
+    """
+    normalized = str(value or "").strip().replace("\\", "/")
+    if not normalized:
+        return None
+    if normalized.startswith("http://") or normalized.startswith("https://"):
+        normalized = urlparse(normalized).path
+    normalized = normalized.split("?", 1)[0].split("#", 1)[0].lstrip("/")
+
+    for root in MANAGED_ROOTS:
+        marker = f"/{root}/"
+        if marker in normalized:
+            normalized = f"{root}/{normalized.split(marker, 1)[1]}"
+            break
+    if normalized.startswith(_BARE_UPLOAD_DIRS):
+        normalized = f"uploads/{normalized}"
+
+    if not any(normalized.startswith(f"{root}/") for root in MANAGED_ROOTS):
+        return None
+    if any(part in ("", ".", "..") for part in normalized.split("/")):
+        return None
+    return normalized
+
+
+def _reference_forms(path: str) -> Set[str]:
+    """The spellings under which rows store a path."""
+    forms = {path, f"/{path}"}
+    if path.startswith("uploads/"):
+        forms.add(path[len("uploads/"):])
+    public_url = str(current_app.config.get("PUBLIC_URL") or "").rstrip("/")
+    if public_url:
+        forms.add(f"{public_url}/{path}")
+    return forms
+
+
+def referenced_asset_paths(paths: Iterable[str]) -> Set[str]:
+    """Subset of the given normalized paths that some row still references."""
+    path_by_form: Dict[str, str] = {}
+    for path in paths:
+        for form in _reference_forms(path):
+            path_by_form[form] = path
+
+    referenced: Set[str] = set()
+    for chunk in _chunked(list(path_by_form)):
+        for model, column_name in TRACKED_COLUMNS:
+            column = getattr(model, column_name)
+            for (value,) in db.session.query(column).filter(column.in_(chunk)).distinct():
+                referenced.add(path_by_form[value])
+    return referenced
+
+
+def tombstone_assets(paths: Iterable[Any], reason: str, delay_seconds: Optional[int] = None) -> int:
+    """
+    Schedule files for deletion in the caller's transaction (no commit).
+    They are removed after the grace period if still unreferenced.
+    """
+    normalized = sorted({path for path in (normalize_asset_path(value) for value in paths) if path})
+    if not normalized:
+        return 0
+
+    if delay_seconds is None:
+        delay_seconds = max(0, _get_config_int("ASSET_RECLAIM_GRACE_SECONDS", 60))
+    now = datetime.utcnow()
+    not_before = now + timedelta(seconds=delay_seconds)
+    db.session.execute(
+        insert(AssetTombstone),
+        [
+            {"path": path, "reason": reason[:50], "not_before": not_before, "created_at": now}
+            for path in normalized
+        ],
+    )
+    return len(normalized)
+
+
+def _managed_abs_path(path: str) -> Optional[str]:
+    root_path = os.path.realpath(current_app.root_path)
+    abs_path = os.path.realpath(os.path.join(root_path, path.replace("/", os.sep)))
+    for root in MANAGED_ROOTS:
+        managed_root = os.path.join(root_path, root.replace("/", os.sep))
+        if abs_path.startswith(managed_root + os.sep):
+            return abs_path
+    return None
+
+
+# ============================================
+# Reclaiming tombstones
+# ============================================
+
+def reclaim_due_tombstones(limit: int = 500) -> Dict[str, int]:
+    """Process one batch of due tombstones; returns counts."""
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(AssetTombstone.id, AssetTombstone.path)
+        .filter(AssetTombstone.not_before <= now)
+        .order_by(AssetTombstone.not_before, AssetTombstone.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not rows:
+        db.session.rollback()
+        return {"processed": 0, "removed": 0}
+
+    paths = {path for _, path in rows}
+    referenced = referenced_asset_paths(paths)
+    removable = []
+    for path in sorted(paths - referenced):
+        # A blob still counted as in use (e.g. by a not-yet-visible row) stays.
+        if blob_reference(path) and not release_blob_row(path):
+            continue
+        removable.append(path)
+
+    AssetTombstone.query.filter(
+        AssetTombstone.id.in_([row_id for row_id, _ in rows])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    # Unlink after commit; anything missed here is picked up by the orphan sweep.
+    store = get_blob_store()
+    touched_after = time.time() - max(0, _get_config_int("ASSET_RECLAIM_GRACE_SECONDS", 60))
+    removed = 0
+    for path in removable:
+        abs_path = _managed_abs_path(path)
+        if abs_path is None:
+            continue
+        try:
+            # Blobs are touched when identical content is stored again.
+            if blob_reference(path) and os.path.getmtime(abs_path) > touched_after:
+                continue
+        except OSError:
+            pass
+        store.remove(path)
+        removed += 1
+
+    return {"processed": len(rows), "removed": removed}
+
+
+# ============================================
+# Orphan sweep
+# ============================================
+
+def _all_referenced_paths() -> Set[str]:
+    referenced: Set[str] = set()
+    for model, column_name in TRACKED_COLUMNS:
+        column = getattr(model, column_name)
+        query = db.session.query(column).filter(column.isnot(None)).distinct()
+        for (value,) in query.yield_per(5000):
+            path = normalize_asset_path(value)
+            if path:
+                referenced.add(path)
+    return referenced
+
+
+def _iter_managed_files(root: str) -> Iterator[str]:
+    base = os.path.join(current_app.root_path, root.replace("/", os.sep))
+    for directory, _, filenames in os.walk(base):
+        for filename in filenames:
+            if filename == ".gitkeep":
+                continue
+            abs_path = os.path.join(directory, filename)
+            yield os.path.relpath(abs_path, current_app.root_path).replace(os.sep, "/")
+
+
+def _is_orphaned_variant(path: str) -> Optional[bool]:
+    """None if path is not a derived file, else whether its source image is gone."""
+    parts = path.split("/")
+    if len(parts) < 2 or parts[-2] != DERIVED_DIRNAME:
+        return None
+    # <stem>.<variant>.jpg -> any <stem>.* next to the variants directory
+    stem = parts[-1].rsplit(".", 2)[0]
+    source_dir = os.path.join(current_app.root_path, *parts[:-2])
+    return not glob.glob(os.path.join(glob.escape(source_dir), f"{glob.escape(stem)}.*"))
+
+
+@contextmanager
+def _sweep_lock():
+    if db.engine.dialect.name != "postgresql":
+        yield True
+        return
+    with db.engine.connect() as connection:
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": _SWEEP_LOCK_KEY}
+        ).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _SWEEP_LOCK_KEY})
+
+
+def sweep_orphan_assets(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Tombstone files under the managed roots that no row references and that
+    are older than ASSET_ORPHAN_MIN_AGE_HOURS. With dry_run only counts.
+    """
+    started = time.time()
+    min_age_seconds = max(0, _get_config_int("ASSET_ORPHAN_MIN_AGE_HOURS", 24)) * 3600
+    cutoff = started - min_age_seconds
+    roots = ["uploads"]
+    if current_app.config.get("ASSET_SWEEP_GENERATED", True):
+        roots.append("static/generated")
+
+    result = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "skipped": False,
+        "started_at": datetime.utcnow().isoformat(),
+    }
+
+    with _sweep_lock() as acquired:
+        if not acquired:
+            result["skipped"] = True
+            return result
+
+        referenced = _all_referenced_paths()
+        pending = {row[0] for row in db.session.query(AssetTombstone.path).distinct()}
+        db.session.rollback()
+
+        batch: List[str] = []
+
+        def flush_batch():
+            if not batch:
+                return
+            if not dry_run:
+                tombstone_assets(batch, "orphan_sweep", delay_seconds=0)
+                db.session.commit()
+            batch.clear()
+
+        for root in roots:
+            for path in _iter_managed_files(root):
+                result["scanned"] += 1
+                abs_path = os.path.join(current_app.root_path, path.replace("/", os.sep))
+                try:
+                    stat = os.stat(abs_path)
+                except OSError:
+                    continue
+                if stat.st_mtime > cutoff or path in pending:
+                    continue
+
+                orphaned_variant = _is_orphaned_variant(path)
+                if orphaned_variant is False:
+                    continue
+                if orphaned_variant is None and path in referenced:
+                    continue
+
+                result["orphans"] += 1
+                result["orphan_bytes"] += stat.st_size
+                batch.append(path)
+                if len(batch) >= _QUERY_CHUNK_SIZE:
+                    flush_batch()
+        flush_batch()
+
+    result["duration_seconds"] = round(time.time() - started, 2)
+    return result
+
+
+def get_tombstone_counts() -> Dict[str, int]:
+    now = datetime.utcnow()
+    total, due = db.session.query(
+        func.count(AssetTombstone.id),
+        func.count(AssetTombstone.id).filter(AssetTombstone.not_before <= now),
+    ).one()
+    return {"pending": int(total or 0), "due": int(due or 0)}
+
+
+# ============================================
+# Background reclaimer
+# ============================================
+
+class AssetReclaimer:
+    """
+    Background thread that drains due tombstones and runs the orphan sweep
+    every ASSET_ORPHAN_SWEEP_HOURS. Tombstones are locked with SKIP LOCKED,
+    so every app process may run one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="asset-reclaimer", daemon=True)
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        # First sweep shortly after start, so frequent restarts still sweep.
+        self.next_sweep_at = time.time() + 600
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        _wake_event.set()
+        self.thread.join(timeout)
+
+    def _sweep_due(self) -> bool:
+        if _sweep_requested.is_set():
+            return True
+        sweep_hours = _get_config_int("ASSET_ORPHAN_SWEEP_HOURS", 24)
+        return sweep_hours > 0 and time.time() >= self.next_sweep_at
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            poll_seconds = max(1, _get_config_int("ASSET_RECLAIM_POLL_SECONDS", 30))
+            batch_size = max(1, _get_config_int("ASSET_RECLAIM_BATCH_SIZE", 500))
+
+            while not self.stop_event.is_set():
+                processed = 0
+                try:
+                    processed = reclaim_due_tombstones(batch_size)["processed"]
+                    if processed < batch_size and self._sweep_due():
+                        _sweep_requested.clear()
+                        self.last_sweep = sweep_orphan_assets()
+                        sweep_hours = max(1, _get_config_int("ASSET_ORPHAN_SWEEP_HOURS", 24))
+                        self.next_sweep_at = time.time() + sweep_hours * 3600
+                except Exception as exc:
+                    db.session.rollback()
+                    current_app.logger.warning("Asset reclaimer failed: %s", exc)
+                finally:
+                    db.session.remove()
+
+                if processed < batch_size:
+                    _wake_event.wait(poll_seconds)
+                    _wake_event.clear()
+
+
+def request_orphan_sweep() -> bool:
+    """Ask this process's reclaimer to sweep now; False if none is running."""
+    if _reclaimer is None:
+        return False
+    _sweep_requested.set()
+    _wake_event.set()
+    return True
+
+
+def get_last_sweep() -> Optional[Dict[str, Any]]:
+    return _reclaimer.last_sweep if _reclaimer is not None else None
+
+
+def start_asset_reclaimer(app) -> Optional[AssetReclaimer]:
+    """Start this process's reclaimer once (no-op when disabled)."""
+    global _reclaimer
+
+    if not app.config.get("ASSET_RECLAIMER_ENABLED", True):
+        return None
+
+    with _reclaimer_lock:
+        if _reclaimer is None:
+            _reclaimer = AssetReclaimer(app)
+            _reclaimer.start()
+    return _reclaimer
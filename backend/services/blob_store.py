@@ -0,0 +1,330 @@
+"""
+Content-addressed storage for uploaded and generated images.
+
+Files are named after the sha256 of their bytes, so the same photo uploaded
+for several events (or re-uploaded) is written once:
+
+    uploads/blobs/ab/<sha256>.jpg            backgrounds, guest photos, message images
+    static/generated/blobs/ab/<sha256>.png   generated images
+
+Rows keep referencing files by path (Guest.photo, Chatbot.background_image,
+Message.image_url, ...). StoredBlob counts those references; a before_flush
+hook keeps the counts in step with ORM inserts, updates and deletes in the
+same transaction, and the asset reclaimer only removes a blob file once its
+count has dropped to zero. Paths outside the blob directories (files
+written before the store existed) are not tracked by StoredBlob.
+"""
+
+import glob
+import hashlib
+import io
+import os
+import re
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+
+try:
+    from models import db, Chatbot, DriveImageBackup, Guest, Message, StoredBlob, WhatsAppSendHistory
+except ImportError:
+    from backend.models import db, Chatbot, DriveImageBackup, Guest, Message, StoredBlob, WhatsAppSendHistory
+
+
+BLOB_AREAS = {
+    "uploads": "uploads/blobs",
+    "generated": "static/generated/blobs",
+}
+# Derived files (e.g. guest photo thumbnails) live in <shard>/variants/<sha256>.*
+DERIVED_DIRNAME = "variants"
+
+# Columns that hold a path to a stored file.
+TRACKED_COLUMNS = (
+    (Guest, "photo"),
+    (Chatbot, "background_image"),
+    (Message, "image_url"),
+    (DriveImageBackup, "image_path"),
+    (WhatsAppSendHistory, "image_url"),
+)
+
+_COPY_CHUNK_BYTES = 1024 * 1024
+_QUERY_CHUNK_SIZE = 500
+_BLOB_PATH_RE = re.compile(
+    r"^(?:uploads|static/generated)/blobs/([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.[a-z0-9]{1,8})?$"
+)
+
+
+def blob_reference(value: Any) -> Optional[str]:
+    """Normalise a stored path or URL to its blob path; None if it is not a blob."""
+    normalized = str(value or "").strip().replace("\\", "/")
+    if not normalized:
+        return None
+    if normalized.startswith("http://") or normalized.startswith("https://"):
+        normalized = urlparse(normalized).path
+    normalized = normalized.split("?", 1)[0].split("#", 1)[0].lstrip("/")
+    return normalized if _BLOB_PATH_RE.match(normalized) else None
+
+
+def _normalize_extension(extension: Optional[str]) -> str:
+    extension = str(extension or "").strip().lower().lstrip(".")
+    if not re.match(r"^[a-z0-9]{1,8}$", extension):
+        return ""
+    # One name per format, so photo.jpeg and photo.jpg share a blob.
+    return ".jpg" if extension == "jpeg" else f".{extension}"
+
+
+class StoredFile:
+    def __init__(self, sha256: str, size_bytes: int, relative_path: str, abs_path: str, created: bool):
+        self.sha256 = sha256
+        self.size_bytes = size_bytes
+        self.relative_path = relative_path
+        self.abs_path = abs_path
+        # False when identical content was already stored.
+        self.created = created
+
+
+class BlobStore:
+    """
+    Filesystem side of the store. Needs no app context, so upload workers
+    can write through it directly.
+    """
+
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+
+    def absolute_path(self, relative_path: str) -> str:
+        return os.path.join(self.root_path, relative_path.replace("/", os.sep))
+
+    def write_stream(self, stream, extension: Optional[str], area: str = "uploads") -> StoredFile:
+        """Copy a stream into the store while hashing it."""
+        area_dir = self.absolute_path(BLOB_AREAS[area])
+        os.makedirs(area_dir, exist_ok=True)
+        temp_path = os.path.join(area_dir, f".incoming-{uuid.uuid4().hex}")
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as handle:
+                while True:
+                    chunk = stream.read(_COPY_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        sha256 = digest.hexdigest()
+        relative_path = f"{BLOB_AREAS[area]}/{sha256[:2]}/{sha256}{_normalize_extension(extension)}"
+        final_path = self.absolute_path(relative_path)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+        try:
+            # Touching an existing blob tells the asset reclaimer it is in use again.
+            os.utime(final_path)
+            created = False
+            os.remove(temp_path)
+        except FileNotFoundError:
+            os.replace(temp_path, final_path)
+            created = True
+        return StoredFile(sha256, size, relative_path, final_path, created)
+
+    def write_bytes(self, data: bytes, extension: Optional[str], area: str = "uploads") -> StoredFile:
+        return self.write_stream(io.BytesIO(data), extension, area)
+
+    def remove(self, relative_path: str) -> None:
+        """Delete a blob file and anything derived from it."""
+        abs_path = self.absolute_path(relative_path)
+        stem = os.path.splitext(os.path.basename(abs_path))[0]
+        derived = glob.glob(os.path.join(os.path.dirname(abs_path), DERIVED_DIRNAME, f"{stem}.*"))
+        for path in (abs_path, *derived):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_blob_store() -> BlobStore:
+    return BlobStore(current_app.root_path)
+
+
+def store_upload(file_obj, area: str = "uploads") -> StoredFile:
+    """Store a werkzeug FileStorage by content."""
+    filename = str(file_obj.filename or "")
+    extension = filename.rsplit(".", 1)[1] if "." in filename else ""
+    stream = file_obj.stream
+    try:
+        stream.seek(0)
+    except (AttributeError, OSError):
+        pass
+    return get_blob_store().write_stream(stream, extension, area)
+
+
+# ============================================
+# Reference counting
+# ============================================
+
+def adjust_blob_references(connection, deltas: Dict[str, int]) -> None:
+    """
+    Apply {path: +/-n} to stored_blobs on the given connection. Use this
+    for bulk query deletes, which bypass the flush hook.
+    """
+    table = StoredBlob.__table__
+    now = datetime.utcnow()
+
+    merged: Dict[str, int] = defaultdict(int)
+    for path, delta in deltas.items():
+        key = blob_reference(path)
+        if key:
+            merged[key] += delta
+
+    # Paths sharing a delta are updated together, in sorted order so
+    # concurrent transactions lock rows in the same order.
+    by_delta: Dict[int, List[str]] = defaultdict(list)
+    for path in sorted(merged):
+        if merged[path]:
+            by_delta[merged[path]].append(path)
+
+    for delta, paths in sorted(by_delta.items()):
+        for start in range(0, len(paths), _QUERY_CHUNK_SIZE):
+            chunk = paths[start:start + _QUERY_CHUNK_SIZE]
+            connection.execute(
+                table.update()
+                .where(table.c.path.in_(chunk))
+                .values(ref_count=table.c.ref_count + delta, updated_at=now)
+            )
+            if delta < 0:
+                continue
+
+            existing = {
+                row[0] for row in connection.execute(select(table.c.path).where(table.c.path.in_(chunk)))
+            }
+            rows = [
+                {
+                    "path": path,
+                    "sha256": _BLOB_PATH_RE.match(path).group(2),
+                    "size_bytes": _blob_size(path),
+                    "ref_count": delta,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for path in chunk
+                if path not in existing
+            ]
+            if rows:
+                _insert_blob_rows(connection, table, rows, delta, now)
+
+
+def _insert_blob_rows(connection, table, rows: List[Dict[str, Any]], delta: int, now: datetime) -> None:
+    statement = _insert_statement(connection.dialect.name, table)
+    if statement is None:
+        connection.execute(table.insert(), rows)
+        return
+    # Another transaction may have inserted the same blob meanwhile.
+    connection.execute(statement.values(rows).on_conflict_do_update(
+        index_elements=[table.c.path],
+        set_={"ref_count": table.c.ref_count + delta, "updated_at": now},
+    ))
+
+
+def _insert_statement(dialect_name: str, table):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+
+def _blob_size(path: str) -> Optional[int]:
+    if not has_app_context():
+        return None
+    try:
+        return os.path.getsize(get_blob_store().absolute_path(path))
+    except OSError:
+        return None
+
+
+def _committed_value(attr_state) -> Any:
+    history = attr_state.load_history()
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _collect_reference_deltas(session) -> Dict[str, int]:
+    deltas: Dict[str, int] = defaultdict(int)
+    tracked = defaultdict(list)
+    for model, column in TRACKED_COLUMNS:
+        tracked[model].append(column)
+
+    def columns_for(instance) -> Iterable[str]:
+        return tracked.get(type(instance), ())
+
+    for instance in session.new:
+        for column in columns_for(instance):
+            value = getattr(instance, column)
+            if blob_reference(value):
+                deltas[value] += 1
+
+    for instance in session.deleted:
+        state = inspect(instance)
+        for column in columns_for(instance):
+            value = _committed_value(state.attrs[column])
+            if blob_reference(value):
+                deltas[value] -= 1
+
+    for instance in session.dirty:
+        if instance in session.deleted:
+            continue
+        state = inspect(instance)
+        for column in columns_for(instance):
+            history = state.attrs[column].load_history()
+            if not history.has_changes():
+                continue
+            for value in history.deleted:
+                if blob_reference(value):
+                    deltas[value] -= 1
+            for value in history.added:
+                if blob_reference(value):
+                    deltas[value] += 1
+
+    return deltas
+
+
+def _track_blob_references(session, flush_context, instances) -> None:
+    with session.no_autoflush:
+        deltas = _collect_reference_deltas(session)
+    if any(deltas.values()):
+        adjust_blob_references(session.connection(), deltas)
+
+
+def init_blob_store(app) -> None:
+    """Keep stored_blobs.ref_count in step with every ORM flush."""
+    if not event.contains(db.session, "before_flush", _track_blob_references):
+        event.listen(db.session, "before_flush", _track_blob_references)
+
+
+def release_blob_row(path: str) -> bool:
+    """
+    Drop the stored_blobs row of an unreferenced blob (in the current
+    transaction). Returns False while the blob is still counted as in use.
+    """
+    table = StoredBlob.__table__
+    db.session.execute(table.delete().where(table.c.path == path, table.c.ref_count <= 0))
+    still_referenced = db.session.execute(
+        table.select().with_only_columns(table.c.id).where(table.c.path == path)
+    ).first()
+    return still_referenced is None
@@ -0,0 +1,97 @@
+"""
+Helpers for running under cooperative (gevent) workers.
+
+With GUNICORN_WORKER_CLASS=gevent (see gunicorn.conf.py) sockets, SSL,
+time.sleep and threading are monkeypatched. A request that waits on
+Gemini, WhatsApp, Drive or SMTP then yields to other requests instead of
+holding a worker. Two things still need care:
+- A database connection checked out by the request's session stays out
+  of the pool for as long as the request runs, including a 60-second
+  generation wait. release_db_connection() ends the read-only
+  transaction first, so a few hundred in-flight generations share a
+  pool of tens of connections.
+- CPU-bound work (Pillow, password hashing) blocks every greenlet in the
+  process, and a ThreadPoolExecutor doesn't help: its threads are
+  greenlets too. run_blocking() and map_blocking() move the work to the
+  hub's native thread pool.
+
+Under sync workers release_db_connection still shortens transactions,
+run_blocking calls the function directly and map_blocking uses a
+ThreadPoolExecutor. Background samplers that must
+keep running while greenlets block use the native_* helpers. This module
+imports no models, so image_derivatives can use it.
+"""
+
+import _thread
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+
+
+def gevent_active() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def release_db_connection(session) -> bool:
+    """
+    Return the session's connection to the pool before a long network
+    wait. Only a session without pending changes is touched (a commit then
+    just ends the read transaction); loaded objects are expired and reload
+    on next access. Returns whether the connection was released.
+    """
+    if session.new or session.dirty or session.deleted:
+        return False
+    session.commit()
+    return True
+
+
+def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-bound func off the event loop under gevent; directly otherwise."""
+    if not gevent_active():
+        return func(*args, **kwargs)
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(func, args, kwargs)
+
+
+def map_blocking(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int) -> List[Any]:
+    """
+    func(item) for each item on native threads, results in order. Under
+    gevent the hub's thread pool runs them while the caller's greenlet
+    waits; otherwise up to max_workers threads of a ThreadPoolExecutor.
+    """
+    items = list(items)
+    if gevent_active():
+        import gevent
+
+        return list(gevent.get_hub().threadpool.map(func, items))
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(func, items))
+
+
+def _original(module: str, name: str):
+    if gevent_active():
+        from gevent import monkey
+
+        return monkey.get_original(module, name)
+    return getattr(_thread if module == "_thread" else time, name)
+
+
+def start_native_thread(func: Callable[[], Any]) -> None:
+    """Start func on an OS thread, not a greenlet, even under gevent."""
+    _original("_thread", "start_new_thread")(func, ())
+
+
+def native_sleep(seconds: float) -> None:
+    _original("time", "sleep")(seconds)
+
+
+def native_thread_ident() -> int:
+    """OS thread id (the key of sys._current_frames), not a greenlet id."""
+    return _original("_thread", "get_ident")()
@@ -0,0 +1,73 @@
+"""
+Conditional GET for polled read APIs.
+
+The chat UI re-polls conversation history, the conversation list, joined
+chatbots and guests. Their validators come from aggregates rather than
+from the rows themselves. Each source is a (column, *criteria) pair
+contributing count() and max(column), and all of them are read in one
+statement, which indexes on the filtered columns serve. For that to
+track every change:
+- rows that can change carry an updated_at (chatbots, guests,
+  conversations)
+- append-only rows (messages) use their created_at
+
+A poll whose If-None-Match (or If-Modified-Since) still matches gets a 304
+without any rows being loaded or serialized. The ETag is weak because it
+names the data, not the bytes (the body may also be compressed).
+Responses are marked "private, no-cache" so the browser keeps the body and
+revalidates it on every fetch. No frontend change is needed.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from flask import current_app, request
+from sqlalchemy import func, select
+
+try:
+    from models import db
+except ImportError:
+    from backend.models import db
+
+
+def read_validators(key: Tuple[Any, ...], *sources) -> Tuple[str, Optional[datetime]]:
+    """
+    (etag, last_modified) for a response. key holds request-specific parts
+    (endpoint, user, ids, anything computed in memory); each source is
+    (column, *criteria).
+    """
+    columns = []
+    for column, *criteria in sources:
+        columns.append(select(func.count()).select_from(column.table).where(*criteria).scalar_subquery())
+        columns.append(select(func.max(column)).where(*criteria).scalar_subquery())
+    values = list(db.session.execute(select(*columns)).one()) if columns else []
+
+    digest = hashlib.sha1(json.dumps([key, values], default=str).encode("utf-8")).hexdigest()
+    timestamps = [value for value in values[1::2] if isinstance(value, datetime)]
+    return digest, max(timestamps) if timestamps else None
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]):
+    """A 304 response when the client's copy is current, otherwise None."""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def with_validators(response, etag: str, last_modified: Optional[datetime]):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    # Different users' bodies share a URL.
+    response.vary.add("Authorization")
+    return response
@@ -0,0 +1,591 @@
+import smtplib
+import socket
+import ssl
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, func, insert, or_, text
+
+try:
+    from models import db, OutboundEmail
+    from services.email_templates import build_user_credentials_email
+    from services.instrumentation import track_outbound
+except ImportError:
+    from backend.models import db, OutboundEmail
+    from backend.services.email_templates import build_user_credentials_email
+    from backend.services.instrumentation import track_outbound
+
+
+# Claims older than this are assumed to belong to a dead worker and are re-queued.
+STALE_CLAIM_SECONDS = 600
+# A batch still being sent has its claim renewed this often.
+CLAIM_REFRESH_SECONDS = STALE_CLAIM_SECONDS // 4
+MAX_BACKOFF_SECONDS = 3600
+# How often the sender clears bodies of failed emails past their retention.
+FAILED_BODY_PURGE_SECONDS = 3600
+# pg_try_advisory_lock key held by the one process that is sending.
+SENDER_LOCK_KEY = 0x656D61696C71
+
+_worker_lock = threading.Lock()
+_worker: Optional["EmailDeliveryWorker"] = None
+_wake_event = threading.Event()
+
+
+def _get_config_value(name: str, default: Any = None) -> Any:
+    return current_app.config.get(name, default)
+
+
+def _get_config_int(name: str, default: int) -> int:
+    try:
+        return int(current_app.config.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# ============================================
+# Queueing
+# ============================================
+
+def build_credentials_email(
+    recipient_email: str,
+    role: str,
+    username: str,
+    password: str,
+    allowed_events: Optional[List[str]] = None,
+    allowed_chatbots: Optional[List[str]] = None,
+    user_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    template = build_user_credentials_email(
+        role=role,
+        username=username,
+        email=recipient_email,
+        password=password,
+        allowed_events=allowed_events,
+        allowed_chatbots=allowed_chatbots,
+    )
+    return {
+        "user_id": user_id,
+        "kind": "user_credentials",
+        "recipient": recipient_email,
+        "subject": template["subject"],
+        "body": template["body"],
+    }
+
+
+def enqueue_emails(
+    emails: Iterable[Dict[str, Any]],
+    batch_key: Optional[str] = None,
+    created_by_id: Optional[int] = None,
+    commit: bool = True,
+) -> int:
+    """Insert emails into the outbound queue and wake the delivery worker."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": email.get("user_id"),
+            "created_by_id": created_by_id,
+            "batch_key": batch_key,
+            "kind": email.get("kind") or "generic",
+            "recipient": email["recipient"],
+            "subject": email["subject"][:255],
+            "body": email["body"],
+            "status": "queued",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for email in emails
+        if email.get("recipient")
+    ]
+    if not rows:
+        return 0
+
+    db.session.execute(insert(OutboundEmail), rows)
+    if commit:
+        db.session.commit()
+        _wake_event.set()
+    return len(rows)
+
+
+def notify_email_worker() -> None:
+    """Wake the worker after committing emails enqueued with commit=False."""
+    _wake_event.set()
+
+
+def get_email_status_counts(batch_key: Optional[str] = None) -> Dict[str, int]:
+    query = db.session.query(OutboundEmail.status, func.count(OutboundEmail.id))
+    if batch_key:
+        query = query.filter(OutboundEmail.batch_key == batch_key)
+    counts = {"queued": 0, "sending": 0, "sent": 0, "failed": 0}
+    for status, count in query.group_by(OutboundEmail.status).all():
+        counts[status] = int(count)
+    return counts
+
+
+def retry_failed_emails(batch_key: Optional[str] = None, email_ids: Optional[List[int]] = None) -> int:
+    query = OutboundEmail.query.filter(
+        OutboundEmail.status == "failed",
+        OutboundEmail.body.isnot(None),
+    )
+    if batch_key:
+        query = query.filter(OutboundEmail.batch_key == batch_key)
+    if email_ids:
+        query = query.filter(OutboundEmail.id.in_(email_ids))
+
+    changed = query.update(
+        {
+            "status": "queued",
+            "attempts": 0,
+            "next_attempt_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    if changed:
+        _wake_event.set()
+    return changed
+
+
+def purge_failed_email_bodies(retention_hours: Optional[int] = None) -> int:
+    """
+    Clear the body of emails that failed more than retention_hours ago.
+    Credential emails carry the user's password, so a failed row must not
+    keep it forever; once cleared it can no longer be retried.
+    """
+    if retention_hours is None:
+        retention_hours = max(0, _get_config_int("EMAIL_FAILED_BODY_RETENTION_HOURS", 72))
+    changed = OutboundEmail.query.filter(
+        OutboundEmail.status == "failed",
+        OutboundEmail.body.isnot(None),
+        OutboundEmail.updated_at <= datetime.utcnow() - timedelta(hours=retention_hours),
+    ).update({"body": None}, synchronize_session=False)
+    db.session.commit()
+    return changed
+
+
+# ============================================
+# SMTP delivery
+# ============================================
+
+class SmtpSettings:
+    def __init__(self):
+        self.server = _get_config_value("MAIL_SERVER")
+        self.port = _get_config_int("MAIL_PORT", 587)
+        self.username = _get_config_value("MAIL_USERNAME")
+        self.password = _get_config_value("MAIL_PASSWORD") or ""
+        self.sender = _get_config_value("MAIL_DEFAULT_SENDER") or self.username or "noreply@localhost"
+        self.use_tls = bool(_get_config_value("MAIL_USE_TLS", True))
+        self.use_ssl = bool(_get_config_value("MAIL_USE_SSL", False))
+        self.messages_per_connection = max(1, _get_config_int("EMAIL_MESSAGES_PER_CONNECTION", 100))
+
+
+class SmtpConnection:
+    """
+    One authenticated SMTP session reused across messages. Providers cap
+    messages per session, so it is recycled every messages_per_connection sends.
+    """
+
+    def __init__(self, settings: SmtpSettings):
+        self.settings = settings
+        self.server: Optional[smtplib.SMTP] = None
+        self.sent_on_connection = 0
+
+    def _open(self) -> None:
+        settings = self.settings
+        context = ssl.create_default_context()
+        if settings.use_ssl:
+            server = smtplib.SMTP_SSL(settings.server, settings.port, context=context, timeout=20)
+        else:
+            server = smtplib.SMTP(settings.server, settings.port, timeout=20)
+            if settings.use_tls:
+                server.starttls(context=context)
+        if settings.username:
+            server.login(settings.username, settings.password)
+        self.server = server
+        self.sent_on_connection = 0
+
+    def close(self) -> None:
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+        self.server = None
+
+    def send(self, recipient: str, subject: str, body: str) -> None:
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = self.settings.sender
+        msg["To"] = recipient
+        msg.set_content(body)
+
+        if self.server is not None and self.sent_on_connection >= self.settings.messages_per_connection:
+            self.close()
+
+        for attempt in range(2):
+            try:
+                with track_outbound("smtp"):
+                    if self.server is None:
+                        self._open()
+                    self.server.send_message(msg)
+                self.sent_on_connection += 1
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                # An idle session timed out server side; reconnect once.
+                self.close()
+                if attempt:
+                    raise
+
+
+class RateLimiter:
+    """Token bucket shared by the sender threads; rate is messages per minute."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SenderLock:
+    """
+    Makes one process the sender, so EMAIL_RATE_PER_MINUTE holds for the
+    whole deployment rather than for each gunicorn worker.
+
+    On Postgres the sender holds a session advisory lock on a connection of
+    its own. If that process dies the connection closes, the lock is
+    released, and another worker takes over within EMAIL_WORKER_POLL_SECONDS.
+    Other databases (SQLite in development) have no such lock; every process
+    sends and the limit is per process.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.connection = None
+
+    def acquire(self) -> bool:
+        """True while this process is the sender; call before every batch."""
+        if self.engine.dialect.name != "postgresql":
+            return True
+
+        if self.connection is not None:
+            try:
+                # A dropped connection has lost the lock with it.
+                self.connection.exec_driver_sql("SELECT 1")
+                self.connection.commit()
+                return True
+            except Exception:
+                self._discard()
+
+        connection = self.engine.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": SENDER_LOCK_KEY}
+            ).scalar()
+            # The lock is session level; don't sit idle in a transaction.
+            connection.commit()
+        except Exception:
+            connection.invalidate()
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def release(self) -> None:
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SENDER_LOCK_KEY})
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+        except Exception:
+            self._discard()
+
+    def _discard(self) -> None:
+        # Never hand a connection that may still hold the lock back to the pool.
+        try:
+            self.connection.invalidate()
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+
+
+def _is_permanent_failure(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(exc, "smtp_code", None)
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def _retry_delay(attempts: int, base_seconds: int) -> int:
+    return min(MAX_BACKOFF_SECONDS, base_seconds * (2 ** max(0, attempts - 1)))
+
+
+def _claim_size(concurrency: int, per_minute: int) -> int:
+    """Rows per claim: small enough to send within half of STALE_CLAIM_SECONDS at the rate limit."""
+    size = concurrency * 25
+    if per_minute > 0:
+        size = min(size, per_minute * STALE_CLAIM_SECONDS // 120)
+    return max(1, size)
+
+
+# ============================================
+# Delivery worker
+# ============================================
+
+class EmailDeliveryWorker:
+    """
+    Background thread that drains the outbound_emails queue.
+
+    Every app process runs one, but only the holder of the SenderLock sends;
+    the others stand by to take over. Rows are still claimed with a
+    per-batch token so two senders never send the same email twice.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="email-delivery", daemon=True)
+        self._local = threading.local()
+        self._connections: List[SmtpConnection] = []
+        self._connections_lock = threading.Lock()
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        _wake_event.set()
+        self.thread.join(timeout)
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            concurrency = max(1, _get_config_int("EMAIL_WORKER_CONCURRENCY", 4))
+            poll_seconds = max(1, _get_config_int("EMAIL_WORKER_POLL_SECONDS", 10))
+            per_minute = _get_config_int("EMAIL_RATE_PER_MINUTE", 600)
+            limiter = RateLimiter(per_minute)
+            claim_size = _claim_size(concurrency, per_minute)
+            sender_lock = SenderLock(db.engine)
+            next_purge_at = 0.0
+
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="email-send") as executor:
+                while not self.stop_event.is_set():
+                    try:
+                        is_sender = sender_lock.acquire()
+                    except Exception as exc:
+                        current_app.logger.warning("Email sender lock check failed: %s", exc)
+                        is_sender = False
+                    if not is_sender:
+                        # Another process is sending.
+                        self._close_connections()
+                        self.stop_event.wait(poll_seconds)
+                        continue
+
+                    if time.monotonic() >= next_purge_at:
+                        next_purge_at = time.monotonic() + FAILED_BODY_PURGE_SECONDS
+                        try:
+                            purge_failed_email_bodies()
+                        except Exception as exc:
+                            db.session.rollback()
+                            current_app.logger.warning("Failed email body purge failed: %s", exc)
+
+                    try:
+                        token, batch = self._claim_batch(claim_size)
+                    except Exception as exc:
+                        db.session.rollback()
+                        current_app.logger.warning("Email queue claim failed: %s", exc)
+                        token, batch = None, []
+
+                    if not batch:
+                        self._close_connections()
+                        _wake_event.wait(poll_seconds)
+                        _wake_event.clear()
+                        continue
+
+                    settings = SmtpSettings()
+                    futures = [executor.submit(self._deliver, item, settings, limiter) for item in batch]
+                    # Slow SMTP can outlast the stale window; keep the claim
+                    # fresh so no other sender re-queues rows still waiting.
+                    while wait(futures, timeout=CLAIM_REFRESH_SECONDS).not_done:
+                        self._refresh_claim(token)
+                    self._record_results([future.result() for future in futures])
+                    db.session.remove()
+
+            sender_lock.release()
+            self._close_connections()
+
+    def _claim_batch(self, limit: int) -> Tuple[Optional[str], List[Tuple[int, str, str, str, int]]]:
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=STALE_CLAIM_SECONDS)
+        claimable = or_(
+            and_(OutboundEmail.status == "queued", OutboundEmail.next_attempt_at <= now),
+            and_(OutboundEmail.status == "sending", OutboundEmail.claimed_at < stale_before),
+        )
+
+        candidate_ids = [
+            row[0]
+            for row in db.session.query(OutboundEmail.id)
+            .filter(claimable)
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+            .limit(limit)
+            .all()
+        ]
+        if not candidate_ids:
+            db.session.rollback()
+            return None, []
+
+        # Re-checking the claimable condition in the UPDATE makes the claim
+        # atomic against other workers that picked the same candidates.
+        token = uuid.uuid4().hex
+        OutboundEmail.query.filter(OutboundEmail.id.in_(candidate_ids), claimable).update(
+            {
+                "status": "sending",
+                "claim_token": token,
+                "claimed_at": now,
+                "updated_at": now,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+        return token, [
+            tuple(row)
+            for row in db.session.query(
+                OutboundEmail.id,
+                OutboundEmail.recipient,
+                OutboundEmail.subject,
+                OutboundEmail.body,
+                OutboundEmail.attempts,
+            )
+            .filter(OutboundEmail.claim_token == token)
+            .order_by(OutboundEmail.id)
+            .all()
+        ]
+
+    def _refresh_claim(self, token: str) -> None:
+        try:
+            now = datetime.utcnow()
+            OutboundEmail.query.filter(
+                OutboundEmail.claim_token == token,
+                OutboundEmail.status == "sending",
+            ).update({"claimed_at": now, "updated_at": now}, synchronize_session=False)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.warning("Email claim refresh failed: %s", exc)
+
+    def _connection(self, settings: SmtpSettings) -> SmtpConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = SmtpConnection(settings)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        connection.settings = settings
+        return connection
+
+    def _close_connections(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+
+    def _deliver(self, item, settings: SmtpSettings, limiter: RateLimiter) -> Dict[str, Any]:
+        email_id, recipient, subject, body, attempts = item
+        result = {"id": email_id, "attempts": attempts + 1, "error": None, "permanent": False}
+
+        if not settings.server:
+            result["error"] = "MAIL_SERVER is not configured"
+            return result
+        if body is None:
+            result["error"] = "Message body is no longer available"
+            result["permanent"] = True
+            return result
+
+        limiter.wait()
+        try:
+            self._connection(settings).send(recipient, subject, body)
+        except Exception as exc:
+            result["error"] = str(exc) or exc.__class__.__name__
+            result["permanent"] = _is_permanent_failure(exc)
+        return result
+
+    def _record_results(self, results: List[Dict[str, Any]]) -> None:
+        now = datetime.utcnow()
+        max_attempts = max(1, _get_config_int("EMAIL_MAX_ATTEMPTS", 5))
+        base_delay = max(1, _get_config_int("EMAIL_RETRY_BASE_SECONDS", 30))
+        keep_failed_body = _get_config_int("EMAIL_FAILED_BODY_RETENTION_HOURS", 72) > 0
+
+        sent_ids = [result["id"] for result in results if result["error"] is None]
+        if sent_ids:
+            OutboundEmail.query.filter(OutboundEmail.id.in_(sent_ids)).update(
+                {
+                    "status": "sent",
+                    "body": None,
+                    "attempts": OutboundEmail.attempts + 1,
+                    "claim_token": None,
+                    "last_error": None,
+                    "sent_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+
+        for result in results:
+            if result["error"] is None:
+                continue
+            give_up = result["permanent"] or result["attempts"] >= max_attempts
+            values = {
+                "status": "failed" if give_up else "queued",
+                "attempts": result["attempts"],
+                "claim_token": None,
+                "last_error": result["error"][:2000],
+                "next_attempt_at": now + timedelta(seconds=_retry_delay(result["attempts"], base_delay)),
+                "updated_at": now,
+            }
+            if give_up and not keep_failed_body:
+                values["body"] = None
+            OutboundEmail.query.filter_by(id=result["id"]).update(values, synchronize_session=False)
+        db.session.commit()
+
+
+def start_email_worker(app) -> Optional[EmailDeliveryWorker]:
+    """Start this process's delivery worker once (no-op when disabled)."""
+    global _worker
+
+    if not app.config.get("EMAIL_WORKER_ENABLED", True):
+        return None
+
+    with _worker_lock:
+        if _worker is None:
+            _worker = EmailDeliveryWorker(app)
+            _worker.start()
+    return _worker
@@ -0,0 +1,274 @@
+"""
+Fingerprinted, precompressed build of frontend/.
+
+Build (no app or database needed):
+
+    python -m backend.services.frontend_assets [--frontend DIR] [--out DIR]
+
+copies frontend/ to the output directory (default build/frontend) and:
+- gives every .js/.css file under js/, css/ and components/ a content-hashed
+  copy (main.js -> main.<sha12>.js) next to the original
+- points the src/href references in the HTML pages at the hashed copies
+  (the old ?v= cache busters are dropped)
+- writes .gz and .br (when the brotli package is installed) variants of
+  text files that compress
+- writes manifest.json with each file's sha256 and available encodings
+
+With FRONTEND_BUILD_DIR pointing at the output, FrontendAssets serves it:
+files are looked up in the manifest instead of the filesystem, the
+Accept-Encoding header picks the precompressed variant, hashed files are
+cached as immutable and the HTML pages are revalidated.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+from typing import Dict, List, Optional
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # Only gzip variants are written without it.
+    brotli = None
+
+try:
+    from services.media_delivery import IMMUTABLE_MAX_AGE, offload_response
+except ImportError:
+    from backend.services.media_delivery import IMMUTABLE_MAX_AGE, offload_response
+
+
+MANIFEST_NAME = "manifest.json"
+FINGERPRINT_DIRS = ("js/", "css/", "components/")
+FINGERPRINT_EXTENSIONS = {".js", ".css"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+# Below this a compressed variant saves less than its extra headers cost.
+MIN_COMPRESS_BYTES = 1024
+# Preferred first; only encodings the build writes.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+FINGERPRINT_LENGTH = 12
+
+_REFERENCE_RE = re.compile(r"""(\b(?:src|href)\s*=\s*)(["'])([^"'#?]+)(?:\?[^"'#]*)?(#[^"']*)?\2""", re.IGNORECASE)
+
+
+# ============================================
+# Build
+# ============================================
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _relative_files(root: str) -> List[str]:
+    files = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            files.append(os.path.relpath(path, root).replace(os.sep, "/"))
+    return sorted(files)
+
+
+def _fingerprinted_name(rel_path: str, sha256: str) -> str:
+    stem, extension = posixpath.splitext(rel_path)
+    return f"{stem}.{sha256[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def _rewrite_html(html: str, html_path: str, fingerprinted: Dict[str, str]) -> str:
+    html_dir = posixpath.dirname(html_path)
+
+    def replace(match):
+        reference = match.group(3)
+        if reference.startswith(("//", "data:")) or re.match(r"^[a-z][a-z0-9+.-]*:", reference, re.IGNORECASE):
+            return match.group(0)
+        if reference.startswith("/"):
+            target = posixpath.normpath(reference.lstrip("/"))
+        else:
+            target = posixpath.normpath(posixpath.join(html_dir, reference))
+        hashed = fingerprinted.get(target)
+        if not hashed:
+            return match.group(0)
+        new_reference = posixpath.join(posixpath.dirname(reference), posixpath.basename(hashed))
+        quote_char = match.group(2)
+        return f"{match.group(1)}{quote_char}{new_reference}{match.group(4) or ''}{quote_char}"
+
+    return _REFERENCE_RE.sub(replace, html)
+
+
+def _write_variants(path: str, data: bytes) -> List[str]:
+    """Write the compressed variants that are smaller than the file; returns their encodings."""
+    encodings = []
+    if len(data) < MIN_COMPRESS_BYTES:
+        return encodings
+    candidates = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        candidates["br"] = brotli.compress(data, quality=11)
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        compressed = candidates.get(encoding)
+        if compressed is None or len(compressed) >= len(data):
+            continue
+        with open(path + suffix, "wb") as handle:
+            handle.write(compressed)
+        encodings.append(encoding)
+    return encodings
+
+
+def build_frontend(source_dir: str, out_dir: str) -> Dict:
+    """Build source_dir into out_dir (replaced as a whole) and return the manifest."""
+    source_dir = os.path.realpath(source_dir)
+    out_dir = os.path.realpath(out_dir)
+    if out_dir == source_dir or out_dir.startswith(source_dir + os.sep):
+        raise ValueError("The build directory must be outside the frontend directory")
+
+    staging_dir = out_dir + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    shutil.copytree(source_dir, staging_dir)
+
+    contents: Dict[str, bytes] = {}
+    fingerprinted: Dict[str, str] = {}
+    for rel_path in _relative_files(staging_dir):
+        if not rel_path.startswith(FINGERPRINT_DIRS):
+            continue
+        if posixpath.splitext(rel_path)[1].lower() not in FINGERPRINT_EXTENSIONS:
+            continue
+        with open(os.path.join(staging_dir, rel_path), "rb") as handle:
+            data = handle.read()
+        hashed = _fingerprinted_name(rel_path, _sha256(data))
+        with open(os.path.join(staging_dir, hashed), "wb") as handle:
+            handle.write(data)
+        fingerprinted[rel_path] = hashed
+        contents[hashed] = data
+
+    files: Dict[str, Dict] = {}
+    for rel_path in _relative_files(staging_dir):
+        abs_path = os.path.join(staging_dir, rel_path)
+        extension = posixpath.splitext(rel_path)[1].lower()
+        data = contents.get(rel_path)
+        if data is None:
+            with open(abs_path, "rb") as handle:
+                data = handle.read()
+        if extension == ".html":
+            rewritten = _rewrite_html(data.decode("utf-8"), rel_path, fingerprinted).encode("utf-8")
+            if rewritten != data:
+                data = rewritten
+                with open(abs_path, "wb") as handle:
+                    handle.write(data)
+
+        encodings = _write_variants(abs_path, data) if extension in COMPRESSIBLE_EXTENSIONS else []
+        files[rel_path] = {"sha256": _sha256(data), "encodings": encodings}
+
+    manifest = {
+        "version": _sha256("".join(f"{path}:{entry['sha256']}\n" for path, entry in files.items()).encode("utf-8")),
+        "fingerprinted": fingerprinted,
+        "files": files,
+    }
+    with open(os.path.join(staging_dir, MANIFEST_NAME), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging_dir, out_dir)
+    return manifest
+
+
+# ============================================
+# Serving
+# ============================================
+
+class FrontendAssets:
+    """In-memory index of a build; send() answers a request from it."""
+
+    def __init__(self, root: str, manifest: Dict):
+        self.root = root
+        self.version = manifest.get("version")
+        self.files: Dict[str, Dict] = manifest.get("files", {})
+        self.immutable = set(manifest.get("fingerprinted", {}).values())
+
+    @classmethod
+    def load(cls, root: str) -> Optional["FrontendAssets"]:
+        try:
+            with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return cls(os.path.realpath(root), manifest)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def _encoding_for(self, entry: Dict) -> Optional[str]:
+        for encoding in ENCODING_SUFFIXES:
+            if encoding in entry["encodings"] and request.accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+    def send(self, path: str):
+        """Response for a file of the build, or None when it is not part of it."""
+        entry = self.files.get(path)
+        if entry is None:
+            return None
+
+        abs_path = os.path.join(self.root, *path.split("/"))
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        immutable = path in self.immutable
+
+        response = offload_response(abs_path, mimetype)
+        if response is None:
+            # nginx negotiates the encoding itself (gzip_static/brotli_static) when offloaded.
+            encoding = self._encoding_for(entry)
+            response = send_file(
+                abs_path + ENCODING_SUFFIXES[encoding] if encoding else abs_path,
+                mimetype=mimetype,
+                etag=f"{entry['sha256']}-{encoding}" if encoding else entry["sha256"],
+                max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+                conditional=True,
+            )
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        if entry["encodings"]:
+            response.vary.add("Accept-Encoding")
+
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+def load_frontend_assets(app) -> Optional[FrontendAssets]:
+    """The build named by FRONTEND_BUILD_DIR, or None to serve frontend/ as is."""
+    build_dir = app.config.get("FRONTEND_BUILD_DIR")
+    if not build_dir:
+        return None
+    assets = FrontendAssets.load(build_dir)
+    if assets is None:
+        app.logger.warning("No frontend build at %s; serving frontend/ uncompressed", build_dir)
+    return assets
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the frontend.")
+    parser.add_argument("--frontend", default=os.path.join(repo_root, "frontend"))
+    parser.add_argument("--out", default=os.path.join(repo_root, "build", "frontend"))
+    args = parser.parse_args(argv)
+
+    manifest = build_frontend(args.frontend, args.out)
+    compressed = sum(1 for entry in manifest["files"].values() if entry["encodings"])
+    print(
+        f"Built {len(manifest['files'])} files into {args.out}: "
+        f"{len(manifest['fingerprinted'])} fingerprinted, {compressed} precompressed"
+        + ("" if brotli else " (gzip only; install brotli for .br)")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,13 @@ import os
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
-import requests
 from flask import current_app
 
+try:
+    from services.instrumentation import track_outbound
+except ImportError:
+    from backend.services.instrumentation import track_outbound
+
 
 class GoogleDriveServiceError(Exception):
     def __init__(self, message: str, status_code: int = 500, payload: Any = None):
@@ -55,6 +59,7 @@ def _build_drive_client():
         from google.oauth2 import service_account
         from google.oauth2.credentials import Credentials
         from googleapiclient.discovery import build
+        from googleapiclient.http import HttpRequest
     except Exception as exc:
         raise GoogleDriveServiceError(
             "Google Drive dependencies are missing. Install google-api-python-client and google-auth packages.",
@@ -113,8 +118,20 @@ def _build_drive_client():
             status_code=500,
         )
 
+    class TimedHttpRequest(HttpRequest):
+        # Every .execute() on this client is one Drive API call.
+        def execute(self, *args, **kwargs):
+            with track_outbound("drive"):
+                return super().execute(*args, **kwargs)
+
     try:
-        return build("drive", "v3", credentials=credentials, cache_discovery=False)
+        return build(
+            "drive",
+            "v3",
+            credentials=credentials,
+            cache_discovery=False,
+            requestBuilder=TimedHttpRequest,
+        )
     except Exception as exc:
         raise GoogleDriveServiceError(
             "Failed to initialize Google Drive API client.",
@@ -0,0 +1,372 @@
+import json
+import os
+import re
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+try:
+    from services.blob_store import DERIVED_DIRNAME, BlobStore, StoredFile
+    from services.concurrency import map_blocking
+    from services.image_derivatives import load_pillow
+except ImportError:
+    from backend.services.blob_store import DERIVED_DIRNAME, BlobStore, StoredFile
+    from backend.services.concurrency import map_blocking
+    from backend.services.image_derivatives import load_pillow
+
+
+VARIANTS_DIRNAME = DERIVED_DIRNAME
+# Square-bounded sizes; the reference variant is what image generation sends upstream.
+VARIANT_SIZES = {
+    "thumb": 256,
+    "reference": 1536,
+}
+VARIANT_JPEG_QUALITY = 85
+_COPY_CHUNK_BYTES = 1024 * 1024
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class GuestPhotoArchiveError(Exception):
+    def __init__(self, message: str, status_code: int = 400, payload: Any = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.payload = payload
+
+
+def guest_photo_variant_path(photo_abs_path: os.PathLike, variant: str) -> Path:
+    """uploads/guests/<name>.<ext> -> uploads/guests/variants/<name>.<variant>.jpg"""
+    photo_abs_path = Path(photo_abs_path)
+    return photo_abs_path.parent / VARIANTS_DIRNAME / f"{photo_abs_path.stem}.{variant}.jpg"
+
+
+def existing_variant_path(photo_abs_path: os.PathLike, variant: str) -> Optional[Path]:
+    path = guest_photo_variant_path(photo_abs_path, variant)
+    return path if path.is_file() else None
+
+
+def generate_photo_variants(photo_abs_path: os.PathLike) -> List[str]:
+    """
+    Write EXIF-oriented RGB JPEG variants next to a guest photo. Returns the
+    written paths; an unreadable image simply gets no variants.
+    """
+    pillow = load_pillow()
+    if pillow is None:  # Variants are skipped when Pillow is not installed.
+        return []
+
+    Image, ImageOps = pillow
+    written = []
+    largest = max(VARIANT_SIZES.values())
+    try:
+        with Image.open(photo_abs_path) as source:
+            # JPEG can decode straight at a reduced scale, far cheaper than a full decode.
+            source.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ("RGB", "L"):
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                rgba = image.convert("RGBA")
+                background.paste(rgba, mask=rgba.split()[-1])
+                image = background
+            elif image.mode == "L":
+                image = image.convert("RGB")
+
+            # Largest first, each smaller variant resized from the previous one.
+            for variant, max_side in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+                target = guest_photo_variant_path(photo_abs_path, variant)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                image = image.copy()
+                image.thumbnail((max_side, max_side), Image.LANCZOS)
+                # Blobs are shared, so never expose a half-written variant.
+                temp_target = target.with_name(f".{uuid.uuid4().hex}.tmp")
+                image.save(temp_target, "JPEG", quality=VARIANT_JPEG_QUALITY)
+                os.replace(temp_target, target)
+                written.append(str(target))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return written
+    return written
+
+
+def remove_photo_variants(photo_abs_path: os.PathLike) -> None:
+    for variant in VARIANT_SIZES:
+        try:
+            guest_photo_variant_path(photo_abs_path, variant).unlink()
+        except OSError:
+            pass
+
+
+def move_photo_variants(old_abs_path: os.PathLike, new_abs_path: os.PathLike) -> None:
+    """Keep variants in step with a renamed photo; regenerates any that are missing."""
+    missing = False
+    for variant in VARIANT_SIZES:
+        source = guest_photo_variant_path(old_abs_path, variant)
+        try:
+            os.replace(source, guest_photo_variant_path(new_abs_path, variant))
+        except OSError:
+            missing = True
+    if missing:
+        generate_photo_variants(new_abs_path)
+
+
+def store_guest_photo(blob_store: BlobStore, file_obj) -> StoredFile:
+    """Store a guest photo by content and make sure its variants exist."""
+    if isinstance(file_obj, ArchivePhoto):
+        stream = file_obj.open()
+    else:
+        stream = file_obj.stream
+        try:
+            stream.seek(0)
+        except (AttributeError, OSError):
+            pass
+
+    filename = secure_filename(file_obj.filename or "")
+    extension = filename.rsplit(".", 1)[1] if "." in filename else ""
+    try:
+        stored = blob_store.write_stream(stream, extension)
+    finally:
+        if isinstance(file_obj, ArchivePhoto):
+            stream.close()
+
+    if stored.created or existing_variant_path(stored.abs_path, "reference") is None:
+        generate_photo_variants(stored.abs_path)
+    return stored
+
+
+class GuestPhotoIngest:
+    """
+    Saves uploaded guest photos on a thread pool.
+
+    Each worker streams its upload into the content-addressed blob store
+    while hashing it, so byte-identical photos are stored once whether they
+    repeat within this upload or were uploaded before. Thumbnail/reference
+    variants are generated for each new file. Uploads are FileStorage or
+    ArchivePhoto objects; workers never touch the app context.
+    """
+
+    def __init__(self, blob_store: BlobStore, max_workers: int = 8):
+        self.blob_store = blob_store
+        self.max_workers = max(1, max_workers)
+        # Files this ingest created; discard() removes them.
+        self.saved_abs_paths: List[str] = []
+        # Repeats within this upload / files already in the store.
+        self.duplicates = 0
+        self.reused = 0
+        self._digests: set = set()
+
+    def _record(self, stored: StoredFile) -> str:
+        if stored.sha256 in self._digests:
+            self.duplicates += 1
+        else:
+            self._digests.add(stored.sha256)
+            if stored.created:
+                self.saved_abs_paths.append(stored.abs_path)
+            else:
+                self.reused += 1
+        return stored.relative_path
+
+    def ingest(self, files_by_key: Iterable[Tuple[str, Any]]) -> Dict[str, str]:
+        """Store each (key, FileStorage) pair; returns key -> relative photo path."""
+        items = list(files_by_key)
+        if not items:
+            return {}
+
+        # Native threads even under gevent, where hashing and Pillow would
+        # otherwise stall every request of the worker.
+        stored_files = map_blocking(
+            lambda item: store_guest_photo(self.blob_store, item[1]),
+            items,
+            self.max_workers,
+        )
+        return {key: self._record(stored) for (key, _), stored in zip(items, stored_files)}
+
+    def discard(self) -> None:
+        """Remove the files this ingest created (request failed)."""
+        for path in self.saved_abs_paths:
+            remove_photo_variants(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# ============================================
+# ZIP archives of guest photos
+# ============================================
+
+class ArchivePhoto:
+    """
+    A photo inside a ZIP archive, usable wherever an uploaded FileStorage is
+    (build_guest_image_lookup only needs .filename). Entries are decompressed
+    on demand, so the archive is never extracted as a whole.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+        self.archive = archive
+        self.info = info
+        self.filename = os.path.basename(info.filename)
+
+    def open(self):
+        # ZipFile serialises the underlying file reads, so entries can be
+        # decompressed from several threads at once.
+        return self.archive.open(self.info)
+
+
+def open_photo_archive(
+    zip_path: str,
+    allowed_extensions: Iterable[str],
+    max_entries: int = 2000,
+    max_entry_bytes: int = 25 * 1024 * 1024,
+) -> Tuple[zipfile.ZipFile, List[ArchivePhoto]]:
+    """Open a ZIP and list its image entries; the caller closes the ZipFile."""
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except (zipfile.BadZipFile, OSError) as exc:
+        raise GuestPhotoArchiveError(f"Guest photo archive is not a valid ZIP file: {exc}")
+
+    allowed = {extension.lower() for extension in allowed_extensions}
+    photos = []
+    try:
+        for info in archive.infolist():
+            name = info.filename.replace("\\", "/")
+            basename = os.path.basename(name)
+            if info.is_dir() or not basename or basename.startswith(".") or name.startswith("__MACOSX/"):
+                continue
+            if os.path.splitext(basename)[1].lower().lstrip(".") not in allowed:
+                continue
+            if info.flag_bits & 0x1:
+                raise GuestPhotoArchiveError("Encrypted ZIP archives are not supported")
+            if info.file_size > max_entry_bytes:
+                raise GuestPhotoArchiveError(
+                    f"'{basename}' is larger than {max_entry_bytes // (1024 * 1024)} MB"
+                )
+            photos.append(ArchivePhoto(archive, info))
+            if len(photos) > max_entries:
+                raise GuestPhotoArchiveError(f"Archive contains more than {max_entries} images")
+    except Exception:
+        archive.close()
+        raise
+
+    return archive, photos
+
+
+class ArchiveUploadStore:
+    """
+    Resumable uploads of photo archives, kept as <upload_id>.zip.part plus a
+    JSON sidecar. Chunks must arrive in order; a client that lost its
+    connection asks for received_bytes and continues from there.
+    """
+
+    def __init__(self, directory: str, max_age_seconds: int = 24 * 3600):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        if not _UPLOAD_ID_RE.match(str(upload_id or "")):
+            raise GuestPhotoArchiveError("Archive upload not found", 404)
+        base = os.path.join(self.directory, upload_id)
+        return f"{base}.zip.part", f"{base}.json"
+
+    def _write_meta(self, meta_path: str, meta: Dict[str, Any]) -> None:
+        temp_path = f"{meta_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        os.replace(temp_path, meta_path)
+
+    def _status(self, upload_id: str, meta: Dict[str, Any], data_path: str) -> Dict[str, Any]:
+        received = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        return {
+            "upload_id": upload_id,
+            "file_name": meta.get("file_name"),
+            "total_bytes": meta["total_bytes"],
+            "received_bytes": received,
+            "complete": received == meta["total_bytes"],
+        }
+
+    def purge_stale(self) -> None:
+        cutoff = time.time() - self.max_age_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def create(self, total_bytes: int, file_name: str, created_by_id: Optional[int]) -> Dict[str, Any]:
+        if total_bytes <= 0:
+            raise GuestPhotoArchiveError("total_bytes must be a positive integer")
+
+        self.purge_stale()
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = self._paths(upload_id)
+        open(data_path, "wb").close()
+        meta = {
+            "total_bytes": total_bytes,
+            "file_name": secure_filename(file_name or "") or "guest-photos.zip",
+            "created_by_id": created_by_id,
+        }
+        self._write_meta(meta_path, meta)
+        return self._status(upload_id, meta, data_path)
+
+    def get(self, upload_id: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+        data_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            raise GuestPhotoArchiveError("Archive upload not found or expired", 404)
+
+        if user_id is not None and meta.get("created_by_id") not in (None, user_id):
+            raise GuestPhotoArchiveError("Archive upload not found", 404)
+        return self._status(upload_id, meta, data_path)
+
+    def append(self, upload_id: str, offset: int, stream, user_id: Optional[int] = None) -> Dict[str, Any]:
+        status = self.get(upload_id, user_id)
+        if offset != status["received_bytes"]:
+            raise GuestPhotoArchiveError(
+                "Chunk offset does not match the bytes received so far",
+                409,
+                status,
+            )
+
+        data_path, meta_path = self._paths(upload_id)
+        remaining = status["total_bytes"] - status["received_bytes"]
+        with open(data_path, "ab") as handle:
+            while True:
+                chunk = stream.read(_COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if len(chunk) > remaining:
+                    handle.truncate(offset)
+                    raise GuestPhotoArchiveError("Chunk extends past the declared total_bytes")
+                handle.write(chunk)
+                remaining -= len(chunk)
+
+        status = self.get(upload_id, user_id)
+        if status["complete"] and not zipfile.is_zipfile(data_path):
+            self.delete(upload_id)
+            raise GuestPhotoArchiveError("Uploaded file is not a valid ZIP archive")
+        # Touch the sidecar so active uploads are not purged as stale.
+        os.utime(meta_path)
+        return status
+
+    def completed_path(self, upload_id: str, user_id: Optional[int] = None) -> str:
+        status = self.get(upload_id, user_id)
+        if not status["complete"]:
+            raise GuestPhotoArchiveError(
+                "Guest photo archive upload is incomplete",
+                409,
+                status,
+            )
+        return self._paths(upload_id)[0]
+
+    def delete(self, upload_id: str) -> None:
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,198 @@
+"""
+Bulk reconciliation of a chatbot's guest list.
+
+The chatbot's guests are read once and the requested changes become an
+insert/update/delete diff in memory (GuestSyncPlan). apply_guest_sync
+writes that diff with one statement per kind of change. A dry run returns
+the diff without applying it.
+"""
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, update
+
+try:
+    from models import db, Guest
+    from services.blob_store import adjust_blob_references
+except ImportError:
+    from backend.models import db, Guest
+    from backend.services.blob_store import adjust_blob_references
+
+
+_QUERY_CHUNK_SIZE = 500
+
+
+def _chunked(values: List[Any], size: int = _QUERY_CHUNK_SIZE) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class GuestSyncPlan:
+    """
+    Guest changes for one chatbot. Updates carry previous_name and
+    previous_photo so the diff reads on its own and photo references can be
+    released.
+    """
+
+    def __init__(self, chatbot_id: int):
+        self.chatbot_id = chatbot_id
+        self.inserts: List[Dict[str, Any]] = []
+        self.updates: List[Dict[str, Any]] = []
+        self.deletes: List[Dict[str, Any]] = []
+        self.unchanged = 0
+
+    def released_photos(self) -> List[str]:
+        """Photo paths the plan stops referencing (renamed files excluded)."""
+        released = [row["photo"] for row in self.deletes]
+        released.extend(
+            row["previous_photo"]
+            for row in self.updates
+            if row["photo"] != row["previous_photo"] and not row.get("renamed")
+        )
+        return [path for path in released if path]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": len(self.inserts),
+            "updated": len(self.updates),
+            "deleted": len(self.deletes),
+            "unchanged": self.unchanged,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "deletes": self.deletes,
+        }
+
+
+def plan_guest_sync(
+    chatbot_id: int,
+    imported_guests: Iterable[Dict[str, Any]],
+    manual_guests: Iterable[Dict[str, Any]],
+    deleted_guest_ids: Iterable[int],
+) -> GuestSyncPlan:
+    """
+    Diff the requested guests against the chatbot's current guests.
+
+    imported_guests: {"name", "photo"} rows from a guest list; always inserted.
+    manual_guests: {"id", "name", "photo"} entries. An id of an existing,
+        not deleted guest updates it (photo None keeps the current photo);
+        anything else is inserted.
+    deleted_guest_ids: guests to remove; ids of other chatbots are ignored.
+    """
+    existing = {
+        row.id: row
+        for row in db.session.query(Guest.id, Guest.name, Guest.photo).filter(Guest.chatbot_id == chatbot_id)
+    }
+    plan = GuestSyncPlan(chatbot_id)
+    plan.inserts.extend({"name": guest["name"], "photo": guest.get("photo")} for guest in imported_guests)
+
+    deleted = set()
+    for guest_id in deleted_guest_ids:
+        row = existing.get(guest_id)
+        if row is None or guest_id in deleted:
+            continue
+        deleted.add(guest_id)
+        plan.deletes.append({"id": row.id, "name": row.name, "photo": row.photo})
+
+    changes: Dict[int, Dict[str, Any]] = {}
+    for guest in manual_guests:
+        row = existing.get(guest.get("id"))
+        if row is None or row.id in deleted:
+            plan.inserts.append({"name": guest["name"], "photo": guest.get("photo")})
+            continue
+
+        change = changes.setdefault(row.id, {
+            "id": row.id,
+            "name": row.name,
+            "photo": row.photo,
+            "previous_name": row.name,
+            "previous_photo": row.photo,
+        })
+        change["name"] = guest["name"]
+        if guest.get("photo"):
+            change["photo"] = guest["photo"]
+
+    for change in changes.values():
+        if change["name"] == change["previous_name"] and change["photo"] == change["previous_photo"]:
+            plan.unchanged += 1
+        else:
+            plan.updates.append(change)
+
+    return plan
+
+
+def _rename_photos(plan: GuestSyncPlan, rename_photo: Callable[[str, str], Optional[str]]) -> None:
+    """Rename kept photos of renamed guests, skipping files other guests share."""
+    candidates = [
+        change for change in plan.updates
+        if change["photo"]
+        and change["photo"] == change["previous_photo"]
+        and str(change["previous_name"] or "").strip() != change["name"]
+    ]
+    if not candidates:
+        return
+
+    use_counts: Dict[str, int] = {}
+    for chunk in _chunked(sorted({change["photo"] for change in candidates})):
+        use_counts.update(
+            db.session.query(Guest.photo, func.count(Guest.id))
+            .filter(Guest.photo.in_(chunk))
+            .group_by(Guest.photo)
+            .all()
+        )
+
+    for change in candidates:
+        if use_counts.get(change["photo"], 0) > 1:
+            continue
+        renamed_path = rename_photo(change["photo"], change["name"])
+        if renamed_path and renamed_path != change["photo"]:
+            change["photo"] = renamed_path
+            change["renamed"] = True
+
+
+def apply_guest_sync(
+    plan: GuestSyncPlan,
+    rename_photo: Optional[Callable[[str, str], Optional[str]]] = None,
+) -> None:
+    """
+    Write the plan in the current transaction (the caller commits).
+    Bulk statements bypass the blob flush hook, so photo reference counts
+    are adjusted here. rename_photo(path, name) may return a new path for
+    the photo of a renamed guest.
+    """
+    if rename_photo is not None:
+        _rename_photos(plan, rename_photo)
+
+    deltas: Dict[str, int] = defaultdict(int)
+    for row in plan.inserts:
+        if row["photo"]:
+            deltas[row["photo"]] += 1
+    for row in plan.deletes:
+        if row["photo"]:
+            deltas[row["photo"]] -= 1
+    for row in plan.updates:
+        if row["photo"] != row["previous_photo"]:
+            if row["previous_photo"]:
+                deltas[row["previous_photo"]] -= 1
+            if row["photo"]:
+                deltas[row["photo"]] += 1
+    if deltas:
+        adjust_blob_references(db.session.connection(), deltas)
+
+    for chunk in _chunked([row["id"] for row in plan.deletes]):
+        db.session.execute(
+            delete(Guest).where(Guest.id.in_(chunk)),
+            execution_options={"synchronize_session": False},
+        )
+
+    if plan.updates:
+        db.session.execute(
+            update(Guest),
+            [{"id": row["id"], "name": row["name"], "photo": row["photo"]} for row in plan.updates],
+        )
+
+    if plan.inserts:
+        db.session.execute(
+            insert(Guest),
+            [{"chatbot_id": plan.chatbot_id, "name": row["name"], "photo": row["photo"]} for row in plan.inserts],
+        )
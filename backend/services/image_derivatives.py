@@ -0,0 +1,237 @@
+"""
+Resized copies of uploaded and generated images.
+
+Chat history and guest pickers used to load full-resolution files. Stored
+images are now also offered in smaller tiers:
+
+    /media/thumb/<path>     JPEG bounded to 320px (guest cards, pickers)
+    /media/preview/<path>   JPEG bounded to 1280px (chat history)
+    /<path>                 the original ("full")
+
+A derivative is rendered with Pillow on its first request and cached under
+IMAGE_DERIVATIVE_DIR. When the cache grows past IMAGE_DERIVATIVE_CACHE_MB
+the least recently used files are evicted. This module imports no models,
+so Model.to_dict can use derivative_urls.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+try:
+    from services.concurrency import run_blocking
+except ImportError:
+    from backend.services.concurrency import run_blocking
+
+_pillow: Optional[tuple] = None
+
+
+DERIVATIVE_TIERS = {
+    "thumb": 320,
+    "preview": 1280,
+}
+DERIVATIVE_JPEG_QUALITY = 82
+SOURCE_ROOTS = ("uploads/", "static/generated/")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+# Older rows sometimes store upload paths without the uploads/ prefix.
+_BARE_UPLOAD_DIRS = ("backgrounds/", "guests/", "messages/")
+# Evict down to this share of the budget so eviction does not run on every write.
+_EVICT_TO_RATIO = 0.9
+# Refresh a cached file's mtime (its LRU position) at most this often.
+_TOUCH_INTERVAL_SECONDS = 3600
+_LOCK_STRIPES = 64
+
+
+def media_path(value) -> Optional[str]:
+    """Stored path or same-site URL -> 'uploads/...'/'static/generated/...'; None otherwise."""
+    normalized = str(value or "").strip().replace("\\", "/")
+    if not normalized:
+        return None
+    if normalized.startswith("http://") or normalized.startswith("https://"):
+        normalized = urlparse(normalized).path
+    normalized = normalized.split("?", 1)[0].split("#", 1)[0].lstrip("/")
+    if normalized.startswith(_BARE_UPLOAD_DIRS):
+        normalized = f"uploads/{normalized}"
+
+    if not normalized.startswith(SOURCE_ROOTS):
+        return None
+    if any(part in ("", ".", "..") for part in normalized.split("/")):
+        return None
+    if os.path.splitext(normalized)[1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    return normalized
+
+
+def derivative_urls(value) -> Optional[Dict[str, str]]:
+    """{tier: url} for a stored image, or None for external or non-image values."""
+    path = media_path(value)
+    if not path:
+        return None
+    if urlparse(str(value).strip()).netloc:
+        # Absolute URLs (e.g. another host) are only resized when they point at our media.
+        return None
+    quoted = quote(path)
+    urls = {tier: f"/media/{tier}/{quoted}" for tier in DERIVATIVE_TIERS}
+    urls["full"] = f"/{quoted}"
+    return urls
+
+
+def load_pillow() -> Optional[tuple]:
+    """
+    (Image, ImageOps), imported on first use so workers boot without
+    Pillow; None when it is not installed (originals are served as-is).
+    """
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            _pillow = ()
+        else:
+            _pillow = (Image, ImageOps)
+    return _pillow or None
+
+
+def _render(source_abs: str, target: str, max_side: int) -> bool:
+    Image, ImageOps = load_pillow()
+    with Image.open(source_abs) as source:
+        # JPEG can decode straight at a reduced scale, far cheaper than a full decode.
+        source.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "L"):
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode == "L":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_target = os.path.join(os.path.dirname(target), f".{uuid.uuid4().hex}.tmp")
+        image.save(temp_target, "JPEG", quality=DERIVATIVE_JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_target, target)
+    return True
+
+
+class DerivativeCache:
+    """
+    On-disk cache of rendered derivatives with a size budget. Each file is
+    named after its source path and size, so content-addressed sources never
+    serve stale derivatives and replaced legacy files usually get a new key.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(0, max_bytes)
+        self._size_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        # Bytes on disk; computed by scanning on first write.
+        self._total_bytes: Optional[int] = None
+
+    def path_for(self, source_path: str, source_size: int, tier: str) -> str:
+        key = hashlib.sha1(f"{source_path}\0{source_size}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, tier, key[:2], f"{key}.jpg")
+
+    def derivative(self, source_abs: str, source_path: str, tier: str) -> Optional[str]:
+        """
+        Path of the cached derivative, rendering it if needed. None when the
+        source cannot be resized (Pillow missing, unreadable image); callers
+        then serve the original.
+        """
+        pillow = load_pillow()
+        if pillow is None or tier not in DERIVATIVE_TIERS:
+            return None
+        try:
+            source_size = os.path.getsize(source_abs)
+        except OSError:
+            return None
+
+        target = self.path_for(source_path, source_size, tier)
+        if self._touch(target):
+            return target
+
+        key_lock = self._locks[hash(target) % _LOCK_STRIPES]
+        with key_lock:
+            # Another request may have rendered it while we waited.
+            if os.path.isfile(target):
+                return target
+            try:
+                # Pillow work would otherwise stall every request of a gevent worker.
+                run_blocking(_render, source_abs, target, DERIVATIVE_TIERS[tier])
+            except (OSError, ValueError, pillow[0].DecompressionBombError):
+                return None
+
+        try:
+            self._account(os.path.getsize(target), keep=target)
+        except OSError:
+            pass
+        return target
+
+    def _touch(self, target: str) -> bool:
+        try:
+            modified = os.stat(target).st_mtime
+        except OSError:
+            return False
+        if time.time() - modified > _TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(target)
+            except OSError:
+                pass
+        return True
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _account(self, added_bytes: int, keep: str) -> None:
+        with self._size_lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += added_bytes
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            # Oldest mtime first; hits refresh mtime, so this is least recently used.
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            limit = int(self.max_bytes * _EVICT_TO_RATIO)
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                if path == keep:
+                    # About to be served.
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self._total_bytes = total
+
+
+_caches: Dict[str, DerivativeCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_derivative_cache(app) -> DerivativeCache:
+    root = app.config.get("IMAGE_DERIVATIVE_DIR") or os.path.join(app.instance_path, "image_derivatives")
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            max_bytes = int(app.config.get("IMAGE_DERIVATIVE_CACHE_MB", 2048)) * 1024 * 1024
+            cache = _caches[root] = DerivativeCache(root, max_bytes)
+    return cache
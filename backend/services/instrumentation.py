@@ -0,0 +1,282 @@
+"""
+Request timing and slow-query instrumentation.
+
+init_instrumentation() hooks into the app and its engine and records:
+- per-endpoint latency (http_request_duration_seconds)
+- statements and time spent in the database per request
+  (http_request_db_queries, http_request_db_seconds), from SQLAlchemy
+  cursor events
+- outbound calls to Gemini, WhatsApp, Drive and SMTP
+  (outbound_request_duration_seconds), wrapped in track_outbound() at
+  the call sites
+
+Each response carries a Server-Timing header (app, db and one entry per
+outbound service) so the browser's network panel shows where the time
+went. Statements slower than SLOW_QUERY_MS are logged with the statement
+and the first application frame that issued them.
+
+The series are kept in memory per process and rendered in the Prometheus
+text format by render_metrics() (GET /api/metrics). With several gunicorn
+workers each scrape sees one worker; add an instance label per worker
+when aggregating.
+"""
+
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Slow-query log lines keep this much of the statement.
+STATEMENT_LOG_CHARS = 2000
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            # bucket counts, then +Inf count, then sum
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            base = _format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_with_le(base, _format_number(bound))} {_format_number(count)}")
+            lines.append(f"{self.name}_bucket{_with_le(base, '+Inf')} {_format_number(series[-2])}")
+            lines.append(f"{self.name}_sum{base} {_format_number(series[-1])}")
+            lines.append(f"{self.name}_count{base} {_format_number(series[-2])}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _with_le(base: str, bound: str) -> str:
+    if not base:
+        return f'{{le="{bound}"}}'
+    return f'{base[:-1]},le="{bound}"}}'
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response was returned to the server.",
+    ("endpoint", "method", "status"),
+    LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request.",
+    ("endpoint",),
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request.",
+    ("endpoint",),
+    LATENCY_BUCKETS,
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "Calls to external services (gemini, whatsapp, drive, google_oauth, smtp).",
+    ("service", "outcome"),
+    LATENCY_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_MS.",
+    ("endpoint",),
+)
+METRICS = (REQUEST_LATENCY, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, OUTBOUND_LATENCY, SLOW_QUERIES)
+
+
+class RequestTimings:
+    """Per-request accumulators, stored on flask.g."""
+
+    __slots__ = ("started", "db_queries", "db_seconds", "outbound")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.outbound: Dict[str, List[float]] = {}
+
+
+def _current_timings() -> Optional[RequestTimings]:
+    if not has_request_context():
+        return None
+    return g.get("_request_timings")
+
+
+def _endpoint_label() -> str:
+    if not has_request_context():
+        return "background"
+    return request.endpoint or "unmatched"
+
+
+@contextmanager
+def track_outbound(service: str) -> Iterator[None]:
+    """Time a call to an external service; exceptions count as outcome=error."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        OUTBOUND_LATENCY.observe(elapsed, service, outcome)
+        timings = _current_timings()
+        if timings is not None:
+            entry = timings.outbound.setdefault(service, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def _call_site(app_root: str) -> str:
+    """First frame inside the application that led to the statement."""
+    this_file = os.path.abspath(__file__)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename == this_file or not filename.startswith(app_root) or os.sep + "site-packages" + os.sep in filename:
+            continue
+        return f"{os.path.relpath(filename, app_root)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+def _instrument_engine(engine, app) -> None:
+    threshold = float(app.config.get("SLOW_QUERY_MS") or 0) / 1000.0
+    app_root = os.path.abspath(app.root_path) + os.sep
+    logger = app.logger
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed = time.perf_counter() - started
+        timings = _current_timings()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_seconds += elapsed
+        if threshold and elapsed >= threshold:
+            SLOW_QUERIES.inc(_endpoint_label())
+            logger.warning(
+                "Slow query (%.0f ms) from %s: %s",
+                elapsed * 1000,
+                _call_site(app_root),
+                " ".join(statement.split())[:STATEMENT_LOG_CHARS],
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute.
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def _server_timing(timings: RequestTimings, total: float) -> str:
+    parts = [
+        f"app;dur={total * 1000:.1f}",
+        f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.db_queries} queries"',
+    ]
+    for service, (count, seconds) in sorted(timings.outbound.items()):
+        parts.append(f'{service};dur={seconds * 1000:.1f};desc="{count} calls"')
+    return ", ".join(parts)
+
+
+def init_instrumentation(app, db) -> None:
+    """Register the request hooks and the engine's cursor listeners."""
+    if not app.config.get("INSTRUMENTATION_ENABLED", True):
+        return
+
+    with app.app_context():
+        _instrument_engine(db.engine, app)
+
+    server_timing = app.config.get("SERVER_TIMING_ENABLED", True)
+
+    @app.before_request
+    def _start_request_timings():
+        g._request_timings = RequestTimings()
+
+    @app.after_request
+    def _record_request_timings(response):
+        timings = _current_timings()
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        endpoint = _endpoint_label()
+        if endpoint != "metrics":
+            REQUEST_LATENCY.observe(total, endpoint, request.method, str(response.status_code))
+            REQUEST_DB_QUERIES.observe(timings.db_queries, endpoint)
+            REQUEST_DB_SECONDS.observe(timings.db_seconds, endpoint)
+        if server_timing:
+            response.headers["Server-Timing"] = _server_timing(timings, total)
+        return response
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,141 @@
+"""
+HTTP delivery of uploaded, generated and derived images.
+
+Files whose URL can never point at different bytes are served with a
+one-year immutable Cache-Control:
+- content-addressed blobs (uploads/blobs/, static/generated/blobs/)
+- files named with a uuid4 hex, such as legacy message images and backgrounds
+- derivatives of either kind
+
+Their strong ETag is the blob's sha256 when there is one. Everything else
+(e.g. legacy guest photos named after the guest, which can be renamed or
+replaced) may be cached but is revalidated on each use. Conditional GETs
+(304) and Range requests (206) are handled by send_file.
+
+MEDIA_OFFLOAD hands the transfer itself to a fronting web server. The route
+still does its checks and picks the headers, then returns an empty
+response:
+- "x-accel-redirect" (nginx) points at an internal location
+  (MEDIA_ACCEL_PREFIX for the backend directory, FRONTEND_ACCEL_PREFIX for
+  frontend/)
+- "x-sendfile" (Apache mod_xsendfile, lighttpd) names the absolute path
+Files outside the mapped directories are still sent by Flask.
+"""
+
+import mimetypes
+import os
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from flask import current_app, send_file, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    from services.blob_store import blob_reference
+except ImportError:
+    from backend.services.blob_store import blob_reference
+
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Endpoints whose responses carry their own Cache-Control (see add_security_headers).
+MEDIA_ENDPOINTS = {"serve_uploads", "serve_generated", "serve_image_derivative"}
+
+OFFLOAD_MODES = ("x-accel-redirect", "x-sendfile")
+
+_UUID_NAME_RE = re.compile(r"(?:^|[^0-9a-f])[0-9a-f]{32}(?:[^0-9a-f]|$)")
+
+
+def init_media_delivery(app, frontend_dir: str) -> None:
+    """Read MEDIA_OFFLOAD and map local directories to internal nginx locations."""
+    mode = str(app.config.get("MEDIA_OFFLOAD") or "").strip().lower()
+    if mode and mode != "off" and mode not in OFFLOAD_MODES:
+        raise ValueError(f"MEDIA_OFFLOAD must be one of off, {', '.join(OFFLOAD_MODES)}")
+
+    # Flask's send_file emits X-Sendfile itself when this is set.
+    app.config["USE_X_SENDFILE"] = mode == "x-sendfile"
+
+    locations: List[Tuple[str, str]] = []
+    if mode == "x-accel-redirect":
+        for root, prefix in (
+            (app.root_path, app.config.get("MEDIA_ACCEL_PREFIX")),
+            (frontend_dir, app.config.get("FRONTEND_ACCEL_PREFIX")),
+        ):
+            if prefix:
+                locations.append((os.path.realpath(root), "/" + str(prefix).strip("/")))
+    app.extensions["media_accel_locations"] = locations
+
+
+def offload_response(abs_path: str, mimetype: Optional[str] = None):
+    """
+    Empty X-Accel-Redirect response for a file under a mapped directory;
+    nginx serves it with its own 304/Range handling. None when not offloaded.
+    """
+    real_path = os.path.realpath(abs_path)
+    for root, prefix in current_app.extensions.get("media_accel_locations", ()):
+        if real_path.startswith(root + os.sep):
+            relative = os.path.relpath(real_path, root).replace(os.sep, "/")
+            break
+    else:
+        return None
+
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(abs_path)[0] or "application/octet-stream"
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(relative)}"
+    return response
+
+
+def is_immutable_media(relative_path: str) -> bool:
+    if blob_reference(relative_path):
+        return True
+    return bool(_UUID_NAME_RE.search(os.path.basename(str(relative_path or "")).lower()))
+
+
+def _strong_etag(relative_path: str, variant: Optional[str]) -> Optional[str]:
+    blob_path = blob_reference(relative_path)
+    if not blob_path:
+        return None
+    sha256 = os.path.splitext(os.path.basename(blob_path))[0]
+    return f"{sha256}-{variant}" if variant else sha256
+
+
+def send_media(abs_path: str, relative_path: str, variant: Optional[str] = None, mimetype: Optional[str] = None):
+    """
+    Send a media file with cache headers for its class. relative_path is the
+    file's path under the app root (for a derivative, its source's path) and
+    variant names the derivative tier.
+    """
+    immutable = is_immutable_media(relative_path)
+    response = offload_response(abs_path, mimetype)
+    if response is not None:
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    response = send_file(
+        abs_path,
+        mimetype=mimetype,
+        etag=_strong_etag(relative_path, variant) or True,
+        max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+        conditional=True,
+    )
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def send_frontend_file(frontend_dir: str, filename: str):
+    """Frontend asset, offloaded like media when a location is configured."""
+    abs_path = safe_join(frontend_dir, filename)
+    response = offload_response(abs_path) if abs_path and os.path.isfile(abs_path) else None
+    if response is not None:
+        return response
+    return send_from_directory(frontend_dir, filename)
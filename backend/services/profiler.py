@@ -0,0 +1,322 @@
+"""
+Opt-in sampling profiler for live workers.
+
+An admin starts a profiling session (POST /api/admin/profiling/start) with
+a sample rate and/or an endpoint and a duration. The session is a small
+JSON file in PROFILING_DIR, and every worker of every gunicorn process
+picks it up within a second; nothing is restarted or reconfigured.
+
+Requests chosen for a session are profiled by one background sampler
+thread per process. Every PROFILE_INTERVAL_MS it records the stack of
+each profiled request:
+- sync workers: the request thread's current frame
+- gevent workers: the request greenlet's frame, including the point where
+  it waits on I/O
+
+Samples are wall-clock, so time spent waiting on Gemini or Postgres shows
+up next to CPU time. Unsampled requests only pay for one mtime check a
+second. Each capture is written as collapsed stacks ("frame;frame;frame
+count" lines), which flamegraph.pl, speedscope and inferno read directly,
+under PROFILING_DIR/<session>/.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from flask import current_app, g, request
+
+try:
+    from services.concurrency import gevent_active, native_sleep, native_thread_ident, start_native_thread
+except ImportError:
+    from backend.services.concurrency import gevent_active, native_sleep, native_thread_ident, start_native_thread
+
+
+SESSION_FILE = "session.json"
+SESSION_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}$")
+CAPTURE_NAME_PATTERN = re.compile(r"^[\w.-]+\.folded$")
+MAX_SESSION_SECONDS = 3600
+MAX_STACK_DEPTH = 128
+# How often workers re-read the session file.
+SESSION_CHECK_SECONDS = 1.0
+
+
+class ProfilerError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def profiling_dir(app=None) -> str:
+    app = app or current_app
+    path = str(app.config.get("PROFILING_DIR") or "logs/profiles")
+    if not os.path.isabs(path):
+        path = os.path.join(app.root_path, "..", path)
+    return os.path.abspath(path)
+
+
+# ============================================
+# Sampler
+# ============================================
+
+class _Sampler:
+    """
+    One native thread per process sampling every registered target. A
+    target is (thread id, greenlet or None); samples accumulate in a
+    Counter of collapsed stacks per target.
+    """
+
+    def __init__(self, interval: float, app_root: str):
+        self.interval = interval
+        self.app_root = app_root
+        self.targets: Dict[int, Any] = {}
+        self.samples: Dict[int, Counter] = {}
+        self.started = False
+        self.lock = threading.Lock()
+
+    def add(self, key: int, thread_id: int, glet) -> None:
+        self.samples[key] = Counter()
+        self.targets[key] = (thread_id, glet)
+        if not self.started:
+            with self.lock:
+                if not self.started:
+                    start_native_thread(self._run)
+                    self.started = True
+
+    def remove(self, key: int) -> Counter:
+        self.targets.pop(key, None)
+        return self.samples.pop(key, Counter())
+
+    def _run(self) -> None:
+        while True:
+            if not self.targets:
+                native_sleep(0.05)
+                continue
+            frames = sys._current_frames()
+            for key, (thread_id, glet) in list(self.targets.items()):
+                # A suspended greenlet keeps its frame on gr_frame; the running one
+                # is the thread's current frame.
+                frame = glet.gr_frame if glet is not None else None
+                if frame is None:
+                    frame = frames.get(thread_id)
+                samples = self.samples.get(key)
+                if frame is not None and samples is not None:
+                    samples[self._collapse(frame)] += 1
+            native_sleep(self.interval)
+
+    def _label(self, code) -> str:
+        filename = code.co_filename
+        if filename.startswith(self.app_root):
+            filename = filename[len(self.app_root):]
+        else:
+            filename = os.path.basename(filename)
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+    def _collapse(self, frame) -> str:
+        labels: List[str] = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code).replace(";", ":"))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+
+_sampler: Optional[_Sampler] = None
+
+
+# ============================================
+# Sessions
+# ============================================
+
+def _session_path(root: str) -> str:
+    return os.path.join(root, SESSION_FILE)
+
+
+def read_session(root: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_session_path(root), "r", encoding="utf-8") as handle:
+            session = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(session, dict) or session.get("expires_at", 0) <= time.time():
+        return None
+    return session
+
+
+def start_session(
+    root: str,
+    sample_rate: float,
+    endpoint: Optional[str],
+    duration_seconds: int,
+    max_captures: int,
+    started_by: str,
+) -> Dict[str, Any]:
+    if not 0 <= sample_rate <= 1:
+        raise ProfilerError("sample_rate must be between 0 and 1")
+    if sample_rate == 0 and not endpoint:
+        raise ProfilerError("Provide a sample_rate above 0 or an endpoint")
+    if not 1 <= duration_seconds <= MAX_SESSION_SECONDS:
+        raise ProfilerError(f"duration_seconds must be between 1 and {MAX_SESSION_SECONDS}")
+    if max_captures < 1:
+        raise ProfilerError("max_captures must be at least 1")
+
+    now = time.time()
+    session = {
+        "id": datetime.utcnow().strftime("%Y%m%dT%H%M%S"),
+        "sample_rate": sample_rate,
+        # An endpoint on its own means every request to it.
+        "endpoint": endpoint or None,
+        "started_at": now,
+        "expires_at": now + duration_seconds,
+        "max_captures": max_captures,
+        "started_by": started_by,
+    }
+    os.makedirs(os.path.join(root, session["id"]), exist_ok=True)
+    # Written atomically; workers may read it at any moment.
+    temp_path = _session_path(root) + f".{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(session, handle)
+    os.replace(temp_path, _session_path(root))
+    return session
+
+
+def stop_session(root: str) -> Optional[Dict[str, Any]]:
+    session = read_session(root)
+    try:
+        os.remove(_session_path(root))
+    except FileNotFoundError:
+        pass
+    return session
+
+
+def list_captures(root: str) -> List[Dict[str, Any]]:
+    """Sessions newest first, each with its capture files."""
+    sessions = []
+    try:
+        names = sorted(os.listdir(root), reverse=True)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        directory = os.path.join(root, name)
+        if not SESSION_ID_PATTERN.match(name) or not os.path.isdir(directory):
+            continue
+        captures = []
+        for entry in sorted(os.scandir(directory), key=lambda item: item.name):
+            if entry.is_file() and CAPTURE_NAME_PATTERN.match(entry.name):
+                captures.append({"name": entry.name, "bytes": entry.stat().st_size})
+        sessions.append({"session": name, "captures": captures})
+    return sessions
+
+
+def capture_path(root: str, session_id: str, name: str) -> Optional[str]:
+    if not SESSION_ID_PATTERN.match(session_id) or not CAPTURE_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(root, session_id, name)
+    return path if os.path.isfile(path) else None
+
+
+def merged_session(root: str, session_id: str) -> Optional[str]:
+    """All captures of a session summed into one collapsed-stack document."""
+    if not SESSION_ID_PATTERN.match(session_id):
+        return None
+    directory = os.path.join(root, session_id)
+    if not os.path.isdir(directory):
+        return None
+    totals: Counter = Counter()
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not CAPTURE_NAME_PATTERN.match(entry.name):
+            continue
+        with open(entry.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    totals[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in totals.most_common())
+
+
+# ============================================
+# Request hooks
+# ============================================
+
+def init_profiler(app) -> None:
+    """Register the hooks; inactive until an admin starts a session."""
+    global _sampler
+    if not app.config.get("PROFILING_ENABLED", True):
+        return
+
+    root = profiling_dir(app)
+    interval = max(int(app.config.get("PROFILE_INTERVAL_MS") or 5), 1) / 1000.0
+    if _sampler is None:
+        _sampler = _Sampler(interval, os.path.abspath(app.root_path) + os.sep)
+    state = {"checked_at": 0.0, "mtime": None, "session": None}
+
+    def active_session() -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        if now - state["checked_at"] >= SESSION_CHECK_SECONDS:
+            state["checked_at"] = now
+            try:
+                mtime = os.stat(_session_path(root)).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != state["mtime"]:
+                state["mtime"] = mtime
+                state["session"] = read_session(root) if mtime is not None else None
+        session = state["session"]
+        if session is not None and session["expires_at"] <= time.time():
+            return None
+        return session
+
+    @app.before_request
+    def _start_profiling():
+        session = active_session()
+        # The profiling API itself is never profiled.
+        if session is None or (request.endpoint or "").startswith("admin.profiling"):
+            return
+        if session["endpoint"]:
+            chosen = request.endpoint == session["endpoint"]
+        else:
+            chosen = random.random() < session["sample_rate"]
+        if not chosen:
+            return
+        directory = os.path.join(root, session["id"])
+        try:
+            if len(os.listdir(directory)) >= session["max_captures"]:
+                return
+        except OSError:
+            return
+
+        glet = None
+        if gevent_active():
+            import gevent
+
+            glet = gevent.getcurrent()
+        thread_id = native_thread_ident()
+        key = id(glet) if glet is not None else thread_id
+        _sampler.add(key, thread_id, glet)
+        g._profile = (key, directory, time.perf_counter())
+
+    @app.teardown_request
+    def _finish_profiling(exc):
+        profile = g.pop("_profile", None)
+        if profile is None:
+            return
+        key, directory, started = profile
+        samples = _sampler.remove(key)
+        if not samples:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        endpoint = re.sub(r"[^\w.-]", "_", request.endpoint or "unmatched")
+        name = f"{datetime.utcnow().strftime('%H%M%S%f')}-{os.getpid()}-{endpoint}-{elapsed_ms:.0f}ms.folded"
+        try:
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as handle:
+                for stack, count in samples.most_common():
+                    handle.write(f"{stack} {count}\n")
+        except OSError as write_exc:
+            current_app.logger.warning("Could not write profile capture %s: %s", name, write_exc)
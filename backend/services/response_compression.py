@@ -0,0 +1,134 @@
+"""
+Compression of dynamic responses (API JSON, exports).
+
+Chat history, user and guest listings are large, repetitive JSON. An
+after_request hook compresses responses whose mimetype is in
+RESPONSE_COMPRESSION_MIMETYPES:
+- buffered responses at or above RESPONSE_COMPRESSION_MIN_BYTES are
+  compressed in one go
+- streamed responses (e.g. the NDJSON guest export) are compressed chunk
+  by chunk as they are generated, so nothing is buffered in full
+
+Brotli is used when the client accepts it and the brotli package is
+installed, otherwise gzip. Files sent by send_file (media, frontend build)
+are left alone; they are either precompressed or already compressed
+images.
+"""
+
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+DEFAULT_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+)
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor with one interface."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _compress_stream(chunks: Iterable, compressor: _Compressor) -> Iterator[bytes]:
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            # The compressor buffers small chunks; yield only when it emits output.
+            output = compressor.compress(chunk)
+            if output:
+                yield output
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _negotiate(brotli_enabled: bool) -> Optional[str]:
+    if brotli is not None and brotli_enabled and request.accept_encodings["br"] > 0:
+        return "br"
+    if request.accept_encodings["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def init_response_compression(app) -> None:
+    """Register the compression hook when RESPONSE_COMPRESSION_ENABLED is set."""
+    if not app.config.get("RESPONSE_COMPRESSION_ENABLED", True):
+        return
+
+    min_bytes = int(app.config.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+    mimetypes = {
+        value.strip().lower()
+        for value in (app.config.get("RESPONSE_COMPRESSION_MIMETYPES") or DEFAULT_MIMETYPES)
+        if value.strip()
+    }
+    gzip_level = int(app.config.get("RESPONSE_COMPRESSION_GZIP_LEVEL", 6))
+    brotli_quality = int(app.config.get("RESPONSE_COMPRESSION_BROTLI_QUALITY", 4))
+    brotli_enabled = bool(app.config.get("RESPONSE_COMPRESSION_BROTLI", True))
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "X-Accel-Redirect" in response.headers
+            or (response.mimetype or "").lower() not in mimetypes
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if not response.is_streamed and response.calculate_content_length() < min_bytes:
+            return response
+        encoding = _negotiate(brotli_enabled)
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(encoding, gzip_level, brotli_quality)
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+
+        response.headers["Content-Encoding"] = encoding
+        # The body differs from the identity representation a strong ETag names.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,11 +1,18 @@
 import mimetypes
 import os
 import time
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import requests
 from flask import current_app
 
+if TYPE_CHECKING:
+    import requests
+
+try:
+    from services.instrumentation import track_outbound
+except ImportError:
+    from backend.services.instrumentation import track_outbound
+
 
 class WhatsAppServiceError(Exception):
     """Raised when WhatsApp Cloud API request fails."""
@@ -114,8 +121,11 @@ def _post_with_retry(
     json_payload: Dict[str, Any] = None,
     form_data: Dict[str, Any] = None,
     files: Dict[str, Any] = None,
-) -> requests.Response:
+) -> "requests.Response":
     """Retry transient network errors (connection reset, timeout, etc.)."""
+    # Imported on first send; requests is slow to import.
+    import requests
+
     max_attempts = 5
     backoff_seconds = 0.8
     last_exception: Any = None
@@ -125,14 +135,15 @@ def _post_with_retry(
 
     for attempt in range(1, max_attempts + 1):
         try:
-            response = requests.post(
-                endpoint_url,
-                headers=headers,
-                json=json_payload,
-                data=form_data,
-                files=files,
-                timeout=timeout if timeout else 60,
-            )
+            with track_outbound("whatsapp"):
+                response = requests.post(
+                    endpoint_url,
+                    headers=headers,
+                    json=json_payload,
+                    data=form_data,
+                    files=files,
+                    timeout=timeout if timeout else 60,
+                )
 
             if response.status_code >= 500 and attempt < max_attempts:
                 # Retry transient server errors (502/503/504 etc.)
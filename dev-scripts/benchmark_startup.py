@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Measure worker boot time and report where import time goes.
+
+Usage (from the project root):
+    python dev-scripts/benchmark_startup.py               # 5 cold runs, top 25 modules
+    python dev-scripts/benchmark_startup.py --runs 10 --top 40
+    python dev-scripts/benchmark_startup.py --json        # machine-readable
+
+Each run starts a fresh interpreter with `python -X importtime`, imports
+backend/app.py and calls create_app() the way wsgi.py does, with the
+background threads deferred so the process exits right away. It reports
+the median wall time of the import and of create_app (which includes the
+schema check against DATABASE_URL), the modules with the largest
+cumulative import time, and self time per top-level package. Run it
+before and after touching imports; with gunicorn's preload_app this cost
+is paid once in the master instead of in every worker.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app({config!r})
+created = time.perf_counter()
+print(json.dumps({{"import_s": imported - started, "create_app_s": created - imported}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def run_once(config_name):
+    env = dict(os.environ)
+    env.setdefault("DEFER_BACKGROUND_WORKERS", "true")
+    code = CHILD.format(backend=os.path.join(ROOT, "backend"), config=config_name)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(f"create_app failed (exit {result.returncode})")
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return timings, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="modules to list by cumulative time")
+    parser.add_argument("--config", default="development", help="config name passed to create_app")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    runs = [run_once(args.config) for _ in range(max(args.runs, 1))]
+
+    def median(values):
+        return statistics.median(values) if values else 0.0
+
+    import_s = median([timings["import_s"] for timings, _ in runs])
+    create_app_s = median([timings["create_app_s"] for timings, _ in runs])
+
+    names = set().union(*(modules for _, modules in runs))
+    per_module = {}
+    for name in names:
+        samples = [modules[name] for _, modules in runs if name in modules]
+        per_module[name] = {
+            "self_ms": median([sample[0] for sample in samples]) / 1000,
+            "cumulative_ms": median([sample[1] for sample in samples]) / 1000,
+            "depth": samples[0][2],
+        }
+
+    per_package = defaultdict(float)
+    for name, stats in per_module.items():
+        per_package[name.split(".")[0]] += stats["self_ms"]
+
+    top_modules = sorted(per_module.items(), key=lambda item: -item[1]["cumulative_ms"])[:args.top]
+    top_packages = sorted(per_package.items(), key=lambda item: -item[1])[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            "runs": len(runs),
+            "import_ms": round(import_s * 1000, 1),
+            "create_app_ms": round(create_app_s * 1000, 1),
+            "modules_imported": len(per_module),
+            "top_modules": [{"module": name, **stats} for name, stats in top_modules],
+            "packages_self_ms": dict((name, round(ms, 1)) for name, ms in top_packages),
+        }, indent=2))
+        return
+
+    print(f"Runs: {len(runs)} (medians)")
+    print(f"import app:    {import_s * 1000:8.1f} ms")
+    print(f"create_app():  {create_app_s * 1000:8.1f} ms")
+    print(f"total:         {(import_s + create_app_s) * 1000:8.1f} ms")
+    print(f"modules:       {len(per_module):8d}")
+
+    print(f"\nTop {len(top_modules)} modules by cumulative import time")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, stats in top_modules:
+        print(f"{stats['cumulative_ms']:14.1f} {stats['self_ms']:9.1f}  {'  ' * stats['depth']}{name}")
+
+    print(f"\nTop {len(top_packages)} packages by self time")
+    for name, ms in top_packages:
+        print(f"{ms:14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
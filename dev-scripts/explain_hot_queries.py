@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""Run EXPLAIN on the hot query paths and flag sequential scans.
+
+Usage (from the project root):
+    python dev-scripts/explain_hot_queries.py            # index availability check
+    python dev-scripts/explain_hot_queries.py --natural  # planner's real choice
+
+By default the session runs with enable_seqscan = off, so a Seq Scan that
+still shows up means no usable index exists for that access path. With
+--natural the planner is left alone, which is what you want on production
+sized data (small tables legitimately prefer sequential scans).
+
+Exits with status 1 when any hot query still plans a sequential scan on a
+flagged table. Postgres only.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from sqlalchemy import func, or_, text
+
+sys.path.insert(0, os.getcwd())
+
+# Read-only diagnostic: never migrate the database or start the background
+# workers. Config reads these when backend.app is imported.
+os.environ['SCHEMA_VERSION_CHECK'] = 'off'
+os.environ['DB_AUTO_UPGRADE'] = 'false'
+os.environ['EMAIL_WORKER_ENABLED'] = 'false'
+os.environ['ASSET_RECLAIMER_ENABLED'] = 'false'
+
+from backend.app import create_app
+from backend.models import db, User, Message, ChatbotParticipant, Conversation
+
+app = create_app('development')
+
+# Tables where a sequential scan on a hot path is considered a regression.
+WATCHED_TABLES = {'users', 'messages', 'chatbot_participants'}
+
+
+def _sample_ids():
+    message = db.session.query(Message.chatbot_id, Message.user_id).first()
+    conversation_id = db.session.query(Conversation.id).order_by(Conversation.id.desc()).limit(1).scalar()
+    user_id = db.session.query(User.id).order_by(User.id.desc()).limit(1).scalar()
+    return {
+        'chatbot_id': message[0] if message else 1,
+        'user_id': message[1] if message else (user_id or 1),
+        'conversation_id': conversation_id or 1,
+    }
+
+
+def build_hot_queries():
+    ids = _sample_ids()
+    email_keys = ['someone@example.com', 'other@example.com']
+    username_keys = ['someone', 'other']
+    search_pattern = '%kumar%'
+
+    return [
+        (
+            '_existing_email_keys',
+            db.session.query(User.email).filter(func.lower(User.email).in_(email_keys)),
+        ),
+        (
+            '_existing_username_keys',
+            db.session.query(User.username).filter(func.lower(User.username).in_(username_keys)),
+        ),
+        (
+            'list_users search',
+            db.session.query(User.id).filter(
+                or_(User.name.ilike(search_pattern), User.username.ilike(search_pattern))
+            ),
+        ),
+        (
+            '_build_recent_context',
+            db.session.query(Message.id).filter_by(
+                chatbot_id=ids['chatbot_id'], user_id=ids['user_id']
+            ).order_by(Message.created_at.desc()).limit(8),
+        ),
+        (
+            'conversation history',
+            db.session.query(Message.id).filter_by(
+                conversation_id=ids['conversation_id']
+            ).order_by(Message.created_at),
+        ),
+        (
+            'participants by user',
+            db.session.query(ChatbotParticipant.chatbot_id).filter_by(user_id=ids['user_id']),
+        ),
+    ]
+
+
+def _compile(query):
+    # Expanding IN lists otherwise stay as __[POSTCOMPILE_...] placeholders.
+    compiled = query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'render_postcompile': True},
+    )
+    return str(compiled), compiled.params
+
+
+def _walk_plan(node):
+    yield node
+    for child in node.get('Plans', []) or []:
+        yield from _walk_plan(child)
+
+
+def explain(sql, params):
+    # Driver-level execution keeps the dialect's bind/percent escaping intact.
+    row = db.session.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', params).scalar()
+    plan = row if isinstance(row, list) else json.loads(row)
+    return plan[0]['Plan']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--natural', action='store_true', help='Do not disable sequential scans')
+    parser.add_argument('--verbose', action='store_true', help='Print full plans')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print('EXPLAIN checks require PostgreSQL; current dialect is', db.engine.dialect.name)
+            return 2
+
+        if not args.natural:
+            db.session.execute(text('SET enable_seqscan = off'))
+
+        flagged = []
+        for label, query in build_hot_queries():
+            sql, params = _compile(query)
+            plan = explain(sql, params)
+            seq_scans = [
+                node.get('Relation Name')
+                for node in _walk_plan(plan)
+                if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in WATCHED_TABLES
+            ]
+            index_names = sorted({
+                node['Index Name']
+                for node in _walk_plan(plan)
+                if node.get('Index Name')
+            })
+
+            status = 'SEQ SCAN' if seq_scans else 'ok'
+            print(f"[{status:8}] {label}")
+            if index_names:
+                print(f"           indexes: {', '.join(index_names)}")
+            if seq_scans:
+                print(f"           seq scan on: {', '.join(seq_scans)}")
+                flagged.append(label)
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+
+        db.session.rollback()
+
+        print()
+        if flagged:
+            print(f"{len(flagged)} hot query path(s) without index support: {', '.join(flagged)}")
+            print('Run `flask db upgrade` to apply migrations/versions/0002_hot_path_indexes.py.')
+            return 1
+
+        print('All hot query paths are index-backed.')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
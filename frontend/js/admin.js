@@ -1047,6 +1047,59 @@ class ChatbotFormHandler {
     NotificationManager.success("Image cleared. Select a new one to replace.");
   }
 
+  async uploadGuestPhotoArchive(file, onProgress) {
+    // Upload in chunks; a failed save resumes from the bytes already received.
+    const resumeKey = `guest_photo_archive:${file.name}:${file.size}:${file.lastModified}`;
+    const baseUrl = "/api/chatbots/guest-photo-archives";
+    let upload = null;
+
+    const savedId = sessionStorage.getItem(resumeKey);
+    if (savedId) {
+      try {
+        upload = (await API.get(`${baseUrl}/${savedId}`)).data;
+      } catch (error) {
+        upload = null;
+      }
+    }
+
+    if (!upload) {
+      upload = (
+        await API.post(baseUrl, {
+          file_name: file.name,
+          total_bytes: file.size,
+        })
+      ).data;
+      sessionStorage.setItem(resumeKey, upload.upload_id);
+    }
+
+    let offset = Number(upload.received_bytes || 0);
+    onProgress?.(Math.round((offset * 100) / file.size));
+
+    while (offset < file.size) {
+      const chunkData = new FormData();
+      chunkData.append("offset", String(offset));
+      chunkData.append(
+        "chunk",
+        file.slice(offset, offset + ChatbotFormHandler.ARCHIVE_CHUNK_BYTES),
+        "chunk",
+      );
+
+      try {
+        upload = (await API.put(`${baseUrl}/${upload.upload_id}`, chunkData))
+          .data;
+      } catch (error) {
+        if (error.status !== 409) throw error;
+        // Out of sync with the server (e.g. a retried chunk); continue from its offset.
+        upload = (await API.get(`${baseUrl}/${upload.upload_id}`)).data;
+      }
+
+      offset = Number(upload.received_bytes || 0);
+      onProgress?.(Math.round((offset * 100) / file.size));
+    }
+
+    return { uploadId: upload.upload_id, resumeKey };
+  }
+
   setupFileUpload() {
     const uploadAreas = DomUtils.$$(".file-upload");
     uploadAreas.forEach((area) => {
@@ -1512,10 +1565,30 @@ class ChatbotFormHandler {
       const chatbotId = formData.get("id");
       const endpoint = isEdit ? `/api/chatbots/${chatbotId}` : "/api/chatbots";
 
+      const archiveFile = this.form.querySelector("#guest-photos-archive")
+        ?.files?.[0];
+      let archiveUpload = null;
+      if (archiveFile) {
+        archiveUpload = await this.uploadGuestPhotoArchive(
+          archiveFile,
+          (percent) => {
+            submitBtn.innerHTML = `<i class="fas fa-spinner fa-spin" style="margin-right: 8px;"></i>Uploading photos ${percent}%`;
+          },
+        );
+        formData.set("guest_images_archive_id", archiveUpload.uploadId);
+        submitBtn.innerHTML =
+          '<i class="fas fa-spinner fa-spin" style="margin-right: 8px;"></i>' +
+          (isEdit ? "Saving..." : "Creating...");
+      }
+
       const response = isEdit
         ? await API.put(endpoint, formData)
         : await API.post(endpoint, formData);
 
+      if (archiveUpload) {
+        sessionStorage.removeItem(archiveUpload.resumeKey);
+      }
+
       NotificationManager.success(
         `Chatbot ${isEdit ? "updated" : "created"} successfully`,
       );
@@ -1536,6 +1609,9 @@ class ChatbotFormHandler {
   }
 }
 
+// Chunk size for resumable guest photo ZIP uploads.
+ChatbotFormHandler.ARCHIVE_CHUNK_BYTES = 8 * 1024 * 1024;
+
 // ============================================
 // IMPORT EXCEL HANDLER
 // ============================================
@@ -1549,6 +1625,8 @@ class ImportExcelHandler {
     this.isSubmitting = false;
     this.eventSelect = DomUtils.$("#event-select");
     this.roleSelect = DomUtils.$("#role-select");
+    this.sheetSelect = DomUtils.$("#sheet-select");
+    this.sheetSelectRow = DomUtils.$("#sheet-select-row");
     this.recentImportsBody = DomUtils.$("#recent-imports-body");
     this.recentImportsKey = "admin_recent_imports";
     this.maxRecentImports = 10;
@@ -1560,6 +1638,12 @@ class ImportExcelHandler {
   init() {
     this.form.addEventListener("submit", (e) => this.handleSubmit(e));
     this.setupFileInput();
+    this.sheetSelect?.addEventListener("change", () => {
+      const input = this.form.querySelector('input[type="file"]');
+      if (input?.files?.[0]) {
+        this.previewFile(input.files[0], this.sheetSelect.value);
+      }
+    });
     this.loadEventOptions();
     this.loadRecentImports();
   }
@@ -1635,12 +1719,48 @@ class ImportExcelHandler {
     });
   }
 
-  async previewFile(file) {
-    if (!file || !file.name.endsWith(".xlsx")) {
-      NotificationManager.error("Please upload an Excel file (.xlsx)");
+  isImportFile(file) {
+    const name = String(file?.name || "").toLowerCase();
+    return name.endsWith(".xlsx") || name.endsWith(".csv");
+  }
+
+  renderSheetOptions(sheets, selectedSheet) {
+    if (!this.sheetSelect || !this.sheetSelectRow) return;
+
+    const names = Array.isArray(sheets) ? sheets : [];
+    if (names.length < 2) {
+      this.sheetSelectRow.style.display = "none";
+      this.sheetSelect.innerHTML = "";
+      return;
+    }
+
+    const escapeHtml = (value) =>
+      String(value)
+        .replaceAll("&", "&amp;")
+        .replaceAll("<", "&lt;")
+        .replaceAll(">", "&gt;")
+        .replaceAll('"', "&quot;");
+    const current = selectedSheet || names[0];
+    this.sheetSelect.innerHTML = names
+      .map(
+        (name) =>
+          `<option value="${escapeHtml(name)}" ${name === current ? "selected" : ""}>${escapeHtml(name)}</option>`,
+      )
+      .join("");
+    this.sheetSelectRow.style.display = "";
+  }
+
+  async previewFile(file, sheet = "") {
+    if (!file || !this.isImportFile(file)) {
+      NotificationManager.error("Please upload an Excel (.xlsx) or CSV (.csv) file");
       return;
     }
 
+    if (!sheet) {
+      // A new file starts on its first/active sheet.
+      this.renderSheetOptions([], "");
+    }
+
     const countBox = DomUtils.$("#uploaded-user-count");
     const fileInput = this.form.querySelector('input[type="file"]');
     const uploadArea = fileInput?.closest(".file-upload");
@@ -1675,11 +1795,20 @@ class ImportExcelHandler {
         '<p><strong>Users:</strong> <span style="color: var(--accent-blue);">...</span></p>';
     }
 
+    this.previewToken = null;
+    this.previewKey = null;
+
     try {
       const formData = new FormData();
       formData.append("file", file);
+      if (sheet) formData.append("sheet", sheet);
       const data = await API.post("/api/admin/import/excel/preview", formData);
       const info = data?.preview || {};
+      this.renderSheetOptions(info.sheets, info.sheet);
+      // The import step commits the rows validated here instead of re-uploading.
+      this.previewToken = data?.preview_token || null;
+      // Decrypts the passwords stored with the preview; the server keeps no copy.
+      this.previewKey = data?.preview_key || null;
       const emailConflicts = Number(info.email_conflict_rows || 0);
       const usernameConflicts = Number(info.username_conflict_rows || 0);
 
@@ -1691,6 +1820,7 @@ class ImportExcelHandler {
         const totalRows = Number(info.total_rows || 0);
         const validRows = Number(info.valid_rows || 0);
         const skippedRows = Number(info.skipped_rows || 0);
+        const alreadyImportedRows = Number(info.already_imported_rows || 0);
         const missingRequiredRows = Number(info.missing_required_rows || 0);
         const invalidEmailRows = Number(info.invalid_email_rows || 0);
         const invalidWhatsappRows = Number(info.invalid_whatsapp_rows || 0);
@@ -1788,6 +1918,7 @@ class ImportExcelHandler {
           <p><strong>Total rows:</strong> <span style="color: var(--accent-blue);">${totalRows}</span></p>
           <p><strong>Ready to import:</strong> <span style="color: ${readyColor};">${validRows}</span></p>
           <p><strong>Skipped rows:</strong> <span style="color: var(--accent-orange);">${skippedRows}</span></p>
+          <p><strong>Already imported:</strong> <span style="color: var(--accent-green);">${alreadyImportedRows}</span></p>
           <p><strong>Missing required fields:</strong> <span style="color: var(--accent-orange);">${missingRequiredRows}</span></p>
           <p><strong>Email duplicates (auto-adjusted):</strong> <span style="color: ${emailConflicts > 0 ? "var(--accent-orange)" : "var(--accent-green)"};">${emailConflicts}</span></p>
           <p><strong>Username conflicts:</strong> <span style="color: ${conflictColor};">${usernameConflicts}</span></p>
@@ -1829,11 +1960,12 @@ class ImportExcelHandler {
       return;
     }
 
-    const formData = new FormData();
-    formData.append("file", file);
-
     const selectedRole = this.roleSelect?.value || "user";
     const selectedEvent = this.eventSelect?.value || "";
+    const selectedSheet =
+      this.sheetSelectRow?.style.display !== "none"
+        ? this.sheetSelect?.value || ""
+        : "";
 
     if (!selectedEvent) {
       NotificationManager.error(
@@ -1842,15 +1974,40 @@ class ImportExcelHandler {
       return;
     }
 
-    if (selectedRole) formData.append("default_role", selectedRole);
-    if (selectedEvent) formData.append("event_id", selectedEvent);
+    const buildFormData = (usePreview) => {
+      const formData = new FormData();
+      if (usePreview) {
+        formData.append("preview_token", this.previewToken);
+        formData.append("preview_key", this.previewKey);
+      } else {
+        formData.append("file", file);
+      }
+      if (selectedRole) formData.append("default_role", selectedRole);
+      if (selectedEvent) formData.append("event_id", selectedEvent);
+      if (!usePreview && selectedSheet) formData.append("sheet", selectedSheet);
+      return formData;
+    };
+
     this.setSubmitLoading(true);
 
     try {
-      const data = await API.post("/api/admin/import/excel", formData);
-      const skipped = Number.isFinite(Number(data.skipped))
-        ? Number(data.skipped)
-        : 0;
+      let started;
+      try {
+        started = await API.post(
+          "/api/admin/import/excel",
+          buildFormData(Boolean(this.previewToken)),
+        );
+      } catch (error) {
+        // The stored preview expired; fall back to uploading the file.
+        if (error.status !== 410) throw error;
+        this.previewToken = null;
+        started = await API.post("/api/admin/import/excel", buildFormData(false));
+      }
+      const job = await this.waitForImportJob(started.job_id);
+
+      if (job.status !== "completed") {
+        throw new Error(job.error_message || "Failed to import file");
+      }
 
       NotificationManager.success(
         "Credentials emails are being sent successfully",
@@ -1867,6 +2024,28 @@ class ImportExcelHandler {
     }
   }
 
+  async waitForImportJob(jobId) {
+    // The import runs in the background; poll its persisted progress.
+    while (true) {
+      const response = await API.get(`/api/admin/import/excel/jobs/${jobId}`);
+      const job = response?.job || {};
+
+      if (job.done) {
+        return job;
+      }
+
+      if (this.submitBtn) {
+        const label =
+          job.status === "importing"
+            ? `Importing... ${job.progress || 0}%`
+            : "Validating...";
+        this.submitBtn.innerHTML = `<i class="fas fa-spinner fa-spin" style="margin-right: 8px;"></i> ${label}`;
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  }
+
   setSubmitLoading(isLoading) {
     this.isSubmitting = isLoading;
 
@@ -3971,7 +4150,9 @@ class GuestManagementHandler {
     this.paginationButtons = DomUtils.$("#guests-pagination-buttons");
     this.currentPage = 1;
     this.perPage = 5;
-    this.allGuests = [];
+    // Keyset cursors: pageCursors[n - 1] is the after_id that starts page n.
+    this.pageCursors = [null];
+    this.totalGuests = 0;
     if (this.table) {
       this.init();
     }
@@ -3988,15 +4169,15 @@ class GuestManagementHandler {
   setupFilters() {
     if (this.statusFilter) {
       this.statusFilter.addEventListener("change", () => {
-        this.currentPage = 1;
-        this.renderCurrentPage();
+        this.pageCursors = [null];
+        this.loadGuests(1);
       });
     }
 
     if (this.eventFilter) {
       this.eventFilter.addEventListener("change", () => {
-        this.currentPage = 1;
-        this.renderCurrentPage();
+        this.pageCursors = [null];
+        this.loadGuests(1);
       });
     }
   }
@@ -4042,35 +4223,73 @@ class GuestManagementHandler {
     }
   }
 
-  async loadGuests() {
+  buildGuestsUrl(afterId, includeStats) {
+    const params = new URLSearchParams({ limit: String(this.perPage) });
+    if (afterId) params.set("after_id", String(afterId));
+    if (includeStats) params.set("include_stats", "1");
+
+    const status = (this.statusFilter?.value || "").toLowerCase();
+    if (status) params.set("status", status);
+
+    const eventName = String(this.eventFilter?.value || "").trim();
+    if (eventName) params.set("event_name", eventName);
+
+    return `/api/admin/guests?${params.toString()}`;
+  }
+
+  async loadGuests(page = this.currentPage, refreshStats = true) {
+    let targetPage = page;
+    if (targetPage < 1 || targetPage > this.pageCursors.length) {
+      targetPage = 1;
+    }
+
     try {
-      const response = await API.get("/api/admin/guests");
+      const response = await API.get(
+        this.buildGuestsUrl(this.pageCursors[targetPage - 1], refreshStats),
+      );
       const guests = Array.isArray(response?.data) ? response.data : [];
-      this.allGuests = guests;
-      this.populateEventFilterOptions(guests);
 
-      const totalPages = Math.max(1, Math.ceil(guests.length / this.perPage));
-      if (this.currentPage > totalPages) {
-        this.currentPage = totalPages;
+      // A later page can empty out after deletes; start over from page 1.
+      if (guests.length === 0 && targetPage > 1) {
+        this.pageCursors = [null];
+        return this.loadGuests(1, true);
+      }
+
+      this.currentPage = targetPage;
+      this.pageCursors = this.pageCursors.slice(0, targetPage);
+      if (response?.has_more && response?.next_after_id) {
+        this.pageCursors.push(response.next_after_id);
       }
 
-      this.renderCurrentPage();
+      if (response?.total !== undefined) {
+        this.totalGuests = Number(response.total) || 0;
+      }
+      if (response?.events) {
+        this.populateEventFilterOptions(response.events);
+      }
+      if (response?.stats) {
+        this.updateStats(response.stats);
+      }
 
-      // Update stats
-      this.updateStats(guests);
+      const totalPages = Math.max(
+        1,
+        Math.ceil(this.totalGuests / this.perPage),
+      );
+      this.render(guests);
+      this.renderPagination(this.totalGuests, targetPage, totalPages);
     } catch (error) {
       console.error("Error loading guests:", error);
       NotificationManager.error("Failed to load guests");
-      this.allGuests = [];
+      this.pageCursors = [null];
       this.currentPage = 1;
       this.render([]);
       this.renderPagination(0, 1, 1);
     }
   }
 
-  updateStats(guests) {
-    const total = guests.length;
-    const active = guests.filter((guest) => guest.active).length;
+  updateStats(stats) {
+    const total = Number(stats?.total) || 0;
+    const active = Number(stats?.active) || 0;
     const inactive = Math.max(total - active, 0);
 
     this.setText("total-guests-count", total);
@@ -4078,15 +4297,15 @@ class GuestManagementHandler {
     this.setText("inactive-guests-count", inactive);
   }
 
-  populateEventFilterOptions(guests) {
+  populateEventFilterOptions(events) {
     if (!this.eventFilter) return;
 
     const selected = String(this.eventFilter.value || "").trim();
     const selectedNormalized = selected.toLowerCase();
     const eventNames = Array.from(
       new Set(
-        guests
-          .map((guest) => String(guest.event_name || "").trim())
+        events
+          .map((eventName) => String(eventName || "").trim())
           .filter(Boolean),
       ),
     ).sort((a, b) => a.localeCompare(b));
@@ -4109,23 +4328,6 @@ class GuestManagementHandler {
     }
   }
 
-  getFilteredGuests() {
-    const status = (this.statusFilter?.value || "").toLowerCase();
-    const eventName = String(this.eventFilter?.value || "")
-      .trim()
-      .toLowerCase();
-
-    return this.allGuests.filter((guest) => {
-      const matchesStatus =
-        !status || (status === "active" ? guest.active : !guest.active);
-      const guestEvent = String(guest.event_name || "")
-        .trim()
-        .toLowerCase();
-      const matchesEvent = !eventName || guestEvent === eventName;
-      return matchesStatus && matchesEvent;
-    });
-  }
-
   setText(id, value) {
     const el = document.getElementById(id);
     if (el) el.textContent = value;
@@ -4177,23 +4379,6 @@ class GuestManagementHandler {
       .join("");
   }
 
-  renderCurrentPage() {
-    const filteredGuests = this.getFilteredGuests();
-    const totalGuests = filteredGuests.length;
-    const totalPages = Math.max(1, Math.ceil(totalGuests / this.perPage));
-    const safePage = Math.min(Math.max(this.currentPage, 1), totalPages);
-    this.currentPage = safePage;
-
-    const startIndex = (safePage - 1) * this.perPage;
-    const pageGuests = filteredGuests.slice(
-      startIndex,
-      startIndex + this.perPage,
-    );
-
-    this.render(pageGuests);
-    this.renderPagination(totalGuests, safePage, totalPages);
-  }
-
   setupPaginationActions() {
     if (!this.paginationButtons) return;
 
@@ -4210,8 +4395,7 @@ class GuestManagementHandler {
         return;
       }
 
-      this.currentPage = nextPage;
-      this.renderCurrentPage();
+      this.loadGuests(nextPage, false);
     });
   }
 
@@ -4241,14 +4425,16 @@ class GuestManagementHandler {
       <button class="btn btn-ghost btn-sm" data-page="${Math.max(currentPage - 1, 1)}" ${currentPage <= 1 ? "disabled" : ""}>← Previous</button>
     `);
 
+    // Only pages whose starting cursor is already known can be jumped to.
+    const reachablePages = this.pageCursors.length;
     for (let page = 1; page <= totalPages; page += 1) {
       pageButtons.push(`
-        <button class="btn ${page === currentPage ? "btn-primary" : "btn-ghost"} btn-sm" data-page="${page}">${page}</button>
+        <button class="btn ${page === currentPage ? "btn-primary" : "btn-ghost"} btn-sm" data-page="${page}" ${page > reachablePages ? "disabled" : ""}>${page}</button>
       `);
     }
 
     pageButtons.push(`
-      <button class="btn btn-ghost btn-sm" data-page="${Math.min(currentPage + 1, totalPages)}" ${currentPage >= totalPages ? "disabled" : ""}>Next →</button>
+      <button class="btn btn-ghost btn-sm" data-page="${Math.min(currentPage + 1, totalPages)}" ${currentPage >= reachablePages ? "disabled" : ""}>Next →</button>
     `);
 
     this.paginationButtons.innerHTML = pageButtons.join("");
@@ -213,6 +213,8 @@ class ChatInterface {
     this.contactWhatsappError = DomUtils.$("#chat-contact-whatsapp-error");
     this.imageLightbox = DomUtils.$("#chat-image-lightbox");
     this.imageLightboxPreview = DomUtils.$("#chat-image-lightbox-preview");
+    // Full image URL -> server-rendered preview (from message image_variants)
+    this.mediaPreviewUrls = new Map();
     this.imageLightboxClose = DomUtils.$("#chat-image-lightbox-close");
     this.imageLightboxSend = DomUtils.$("#chat-image-lightbox-send");
     this.guestModeIcon = DomUtils.$(
@@ -241,6 +243,9 @@ class ChatInterface {
     // chatbotId will be initialized via helper below
     this.chatbotId = null;
     this.messages = [];
+    // History is loaded a page at a time; this is the cursor for older messages.
+    this.historyPageSize = 50;
+    this.historyBeforeId = null;
     this.conversations = [];
     this.currentConversationId = null;
     this.isDesktopSidebarCollapsed = false;
@@ -1748,7 +1753,9 @@ class ChatInterface {
             ?.querySelector(".message-image");
       if (!(target instanceof HTMLImageElement)) return;
 
-      const src = String(target.getAttribute("src") || "").trim();
+      const src = String(
+        target.dataset.fullSrc || target.getAttribute("src") || "",
+      ).trim();
       if (!src) return;
 
       this.imageLightboxPreview.src = src;
@@ -2198,7 +2205,9 @@ class ChatInterface {
       card.dataset.guestId = String(guest.id);
       card.setAttribute("aria-pressed", "false");
 
-      const imageUrl = this.resolveMediaUrl(guest.photo);
+      const imageUrl = this.resolveMediaUrl(
+        guest.photo_variants?.thumb || guest.photo,
+      );
       const safeName = this.escapeHtml(guest.name || "Guest");
       const fallbackLetter = safeName.charAt(0).toUpperCase() || "G";
       const imageMarkup = imageUrl
@@ -3053,7 +3062,7 @@ class ChatInterface {
         if (!guest) return "";
         const guestName = this.escapeHtml(guest.name || "Guest");
         const guestPhotoUrl = guest.photo
-          ? this.resolveMediaUrl(guest.photo)
+          ? this.resolveMediaUrl(guest.photo_variants?.thumb || guest.photo)
           : "";
         const guestInitial = (guestName || "G").charAt(0).toUpperCase();
         const thumbMarkup = guestPhotoUrl
@@ -3205,7 +3214,11 @@ class ChatInterface {
 
     const withImageFallback = (source) => {
       const safeSource = this.escapeHtml(source);
-      return `<div class="message-image-frame loading"><span class="message-image-frame-skeleton" aria-hidden="true"></span><img class="message-image" src="${safeSource}" alt="Message image" loading="lazy" data-contact-eligible="${showImageContactCta ? "true" : "false"}" data-drive-eligible="${showDriveUploadCta ? "true" : "false"}" data-fallback-step="0" onload="(function(img){var frame=img.parentElement; if(frame){frame.classList.remove('loading');}})(this)" onerror="(function(img){var step=Number(img.dataset.fallbackStep||'0'); if(step===0){img.dataset.fallbackStep='1'; img.src=img.src.replace('/static/generated/','/uploads/messages/'); return;} if(step===1){img.dataset.fallbackStep='2'; img.src=img.src.replace('/uploads/messages/','/uploads/guests/'); return;} img.onerror=null; var frame=img.parentElement; if(frame){frame.classList.remove('loading'); frame.classList.add('failed');}})(this)" /></div>`;
+      // Show the smaller preview when the server offered one; the full image stays in data-full-src.
+      const safeDisplaySource = this.escapeHtml(
+        this.mediaPreviewUrls.get(source) || source,
+      );
+      return `<div class="message-image-frame loading"><span class="message-image-frame-skeleton" aria-hidden="true"></span><img class="message-image" src="${safeDisplaySource}" data-full-src="${safeSource}" alt="Message image" loading="lazy" data-contact-eligible="${showImageContactCta ? "true" : "false"}" data-drive-eligible="${showDriveUploadCta ? "true" : "false"}" data-fallback-step="0" onload="(function(img){var frame=img.parentElement; if(frame){frame.classList.remove('loading');}})(this)" onerror="(function(img){var step=Number(img.dataset.fallbackStep||'0'); if(step===0&&img.getAttribute('src')!==img.dataset.fullSrc){img.src=img.dataset.fullSrc; return;} if(step===0){img.dataset.fallbackStep='1'; img.src=img.src.replace('/static/generated/','/uploads/messages/'); return;} if(step===1){img.dataset.fallbackStep='2'; img.src=img.src.replace('/uploads/messages/','/uploads/guests/'); return;} img.onerror=null; var frame=img.parentElement; if(frame){frame.classList.remove('loading'); frame.classList.add('failed');}})(this)" /></div>`;
     };
 
     let imageHtml = "";
@@ -3272,7 +3285,9 @@ class ChatInterface {
       });
     }
 
-    this.scrollToBottom();
+    if (!options?.skipScroll) {
+      this.scrollToBottom();
+    }
   }
 
   async downloadGeneratedImage(imageUrl = "") {
@@ -3386,11 +3401,10 @@ class ChatInterface {
 
       this.showMessagesLoadingSkeleton();
 
+      const historyUrl = `/api/user/chatbots/${this.chatbotId}/conversations/${activeConversationId}/messages?limit=${this.historyPageSize}`;
       let response;
       try {
-        response = await API.get(
-          `/api/user/chatbots/${this.chatbotId}/conversations/${activeConversationId}/messages`,
-        );
+        response = await API.get(historyUrl);
       } catch (error) {
         if (!this.isNotJoinedError(error)) {
           throw error;
@@ -3401,24 +3415,11 @@ class ChatInterface {
           throw error;
         }
 
-        response = await API.get(
-          `/api/user/chatbots/${this.chatbotId}/conversations/${activeConversationId}/messages`,
-        );
+        response = await API.get(historyUrl);
       }
 
       const messages = Array.isArray(response?.data) ? response.data : [];
-      const historyImageUrls = [];
-
-      messages.forEach((msg) => {
-        if (msg?.image_url) {
-          historyImageUrls.push(msg.image_url);
-        }
-        if (Array.isArray(msg?.image_urls)) {
-          msg.image_urls
-            .filter((url) => Boolean(String(url || "").trim()))
-            .forEach((url) => historyImageUrls.push(url));
-        }
-      });
+      const historyImageUrls = this.rememberHistoryPreviews(messages);
 
       const hasHistoryImages = historyImageUrls.length > 0;
       const minSkeletonDelay = hasHistoryImages
@@ -3434,76 +3435,163 @@ class ChatInterface {
 
       this.messages = [];
       this.messagesArea.innerHTML = "";
-      let hasContactEligibleHistoryImage = false;
+      this.historyBeforeId = response?.has_more ? response.next_before_id : null;
+      const hasContactEligibleHistoryImage =
+        this.renderHistoryMessages(messages);
+      this.renderLoadEarlierButton();
 
-      messages.forEach((msg) => {
-        const content = String(msg?.content || "");
-        const messageType = String(msg?.message_type || "text").toLowerCase();
-        const normalizedSender = msg?.sender === "user" ? "user" : "bot";
-        const messageImageUrls = [];
+      this.setContactCtaVisible(hasContactEligibleHistoryImage);
+    } catch (error) {
+      console.error("Error loading messages:", error);
+      if (this.messagesArea) {
+        this.messagesArea.innerHTML = `
+          <div class="message-group assistant">
+            <div class="message-bubble">
+              <div class="message-text">Unable to load messages right now. Please refresh and try again.</div>
+              <div class="message-time">--:--</div>
+            </div>
+          </div>
+        `;
+      }
+      NotificationManager.error(error.message || "Failed to load messages");
+    }
+  }
 
-        if (msg?.image_url) {
-          messageImageUrls.push(msg.image_url);
-        }
-        if (Array.isArray(msg?.image_urls)) {
-          msg.image_urls
-            .filter((url) => Boolean(String(url || "").trim()))
-            .forEach((url) => messageImageUrls.push(url));
+  rememberHistoryPreviews(messages) {
+    // Maps full image URLs to previews and returns the URLs worth preloading.
+    const historyImageUrls = [];
+    messages.forEach((msg) => {
+      if (msg?.image_url) {
+        const previewUrl = msg.image_variants?.preview;
+        if (previewUrl) {
+          this.mediaPreviewUrls.set(
+            this.resolveMediaUrl(msg.image_url),
+            this.resolveMediaUrl(previewUrl),
+          );
         }
+        historyImageUrls.push(previewUrl || msg.image_url);
+      }
+      if (Array.isArray(msg?.image_urls)) {
+        msg.image_urls
+          .filter((url) => Boolean(String(url || "").trim()))
+          .forEach((url) => historyImageUrls.push(url));
+      }
+    });
+    return historyImageUrls;
+  }
 
-        const isAssistantImageMessage =
-          normalizedSender !== "user" && messageImageUrls.length > 0;
-        if (isAssistantImageMessage) {
-          hasContactEligibleHistoryImage = true;
-        }
+  renderHistoryMessages(messages, skipScroll = false) {
+    let hasContactEligible = false;
 
-        const shouldShowDriveUpload = this.isGeneratedAiImageMessage(
-          content,
-          messageType,
-          normalizedSender !== "user",
-        );
+    messages.forEach((msg) => {
+      const content = String(msg?.content || "");
+      const messageType = String(msg?.message_type || "text").toLowerCase();
+      const normalizedSender = msg?.sender === "user" ? "user" : "bot";
+      const messageImageUrls = [];
 
-        if (messageType === "image") {
-          if (messageImageUrls.length === 0) return;
-          this.addMessage(
-            content || "",
-            normalizedSender,
-            msg.timestamp,
-            messageImageUrls,
-            {
-              showImageContactCta: isAssistantImageMessage,
-              showDriveUploadCta: shouldShowDriveUpload,
-            },
-          );
-          return;
-        }
+      if (msg?.image_url) {
+        messageImageUrls.push(msg.image_url);
+      }
+      if (Array.isArray(msg?.image_urls)) {
+        msg.image_urls
+          .filter((url) => Boolean(String(url || "").trim()))
+          .forEach((url) => messageImageUrls.push(url));
+      }
+
+      const isAssistantImageMessage =
+        normalizedSender !== "user" && messageImageUrls.length > 0;
+      if (isAssistantImageMessage) {
+        hasContactEligible = true;
+      }
+
+      const shouldShowDriveUpload = this.isGeneratedAiImageMessage(
+        content,
+        messageType,
+        normalizedSender !== "user",
+      );
 
-        if (!content && messageImageUrls.length === 0) return;
+      if (messageType === "image") {
+        if (messageImageUrls.length === 0) return;
         this.addMessage(
-          content || "[Image message]",
+          content || "",
           normalizedSender,
           msg.timestamp,
           messageImageUrls,
           {
             showImageContactCta: isAssistantImageMessage,
             showDriveUploadCta: shouldShowDriveUpload,
+            skipScroll,
           },
         );
-      });
+        return;
+      }
 
-      this.setContactCtaVisible(hasContactEligibleHistoryImage);
-    } catch (error) {
-      console.error("Error loading messages:", error);
-      if (this.messagesArea) {
-        this.messagesArea.innerHTML = `
-          <div class="message-group assistant">
-            <div class="message-bubble">
-              <div class="message-text">Unable to load messages right now. Please refresh and try again.</div>
-              <div class="message-time">--:--</div>
-            </div>
-          </div>
-        `;
+      if (!content && messageImageUrls.length === 0) return;
+      this.addMessage(
+        content || "[Image message]",
+        normalizedSender,
+        msg.timestamp,
+        messageImageUrls,
+        {
+          showImageContactCta: isAssistantImageMessage,
+          showDriveUploadCta: shouldShowDriveUpload,
+          skipScroll,
+        },
+      );
+    });
+
+    return hasContactEligible;
+  }
+
+  renderLoadEarlierButton() {
+    this.messagesArea
+      .querySelectorAll(".history-load-earlier")
+      .forEach((button) => button.remove());
+    if (!this.historyBeforeId) return;
+
+    const button = DomUtils.create("button", "history-load-earlier");
+    button.type = "button";
+    button.textContent = "Load earlier messages";
+    button.addEventListener("click", () => this.loadEarlierMessages(button));
+    this.messagesArea.prepend(button);
+  }
+
+  async loadEarlierMessages(button) {
+    const conversationId = this.currentConversationId;
+    if (!conversationId || !this.historyBeforeId) return;
+
+    button.disabled = true;
+    button.textContent = "Loading...";
+    try {
+      const response = await API.get(
+        `/api/user/chatbots/${this.chatbotId}/conversations/${conversationId}/messages?limit=${this.historyPageSize}&before_id=${this.historyBeforeId}`,
+      );
+      if (conversationId !== this.currentConversationId) return;
+
+      const messages = Array.isArray(response?.data) ? response.data : [];
+      this.rememberHistoryPreviews(messages);
+      this.historyBeforeId = response?.has_more ? response.next_before_id : null;
+
+      // Render the older page on its own, then put the current history back after it.
+      const previousHeight = this.messagesArea.scrollHeight;
+      const previousTop = this.messagesArea.scrollTop;
+      button.remove();
+      const currentNodes = Array.from(this.messagesArea.childNodes);
+      currentNodes.forEach((node) => node.remove());
+      if (this.renderHistoryMessages(messages, true)) {
+        this.setContactCtaVisible(true);
       }
+      currentNodes.forEach((node) => this.messagesArea.appendChild(node));
+      this.renderLoadEarlierButton();
+      // Keep the reader's place without the smooth-scroll animation.
+      this.messagesArea.style.scrollBehavior = "auto";
+      this.messagesArea.scrollTop =
+        this.messagesArea.scrollHeight - previousHeight + previousTop;
+      this.messagesArea.style.scrollBehavior = "";
+    } catch (error) {
+      console.error("Error loading earlier messages:", error);
+      button.disabled = false;
+      button.textContent = "Load earlier messages";
       NotificationManager.error(error.message || "Failed to load messages");
     }
   }
@@ -0,0 +1,74 @@
+"""
+Gunicorn settings (gunicorn -c gunicorn.conf.py wsgi:app).
+
+GUNICORN_WORKER_CLASS picks the worker model:
+- sync (default): one request at a time per worker process
+- gevent: each worker serves up to GUNICORN_WORKER_CONNECTIONS requests
+  concurrently, switching whenever one waits on the network (Gemini,
+  WhatsApp, Drive, SMTP, Postgres)
+
+Connection math for gevent (README "Worker Modes"): every worker has its
+own SQLAlchemy pool of DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so
+WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below
+Postgres max_connections.
+
+GUNICORN_PRELOAD (default true) imports the app and runs the schema check
+once in the master; workers are forked from it and share its memory, so a
+new worker starts serving almost immediately. Background threads and
+database connections are per worker and set up in post_fork.
+"""
+
+import os
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync").strip().lower()
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# Concurrent requests per gevent worker; ignored by sync workers.
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 250))
+# Image generations can take a minute; gevent workers keep heartbeating while they wait.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+accesslog = "-"
+errorlog = "-"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").strip().lower() == "true"
+
+if preload_app:
+    # Read by backend/config.py when the master imports the app.
+    os.environ["DEFER_BACKGROUND_WORKERS"] = "true"
+
+
+def _patch_gevent(log):
+    """
+    The gevent worker monkeypatches the standard library itself, but
+    psycopg2 is a C extension and needs psycogreen to yield while waiting
+    on Postgres. Must run before the app (and its sockets) are imported.
+    """
+    from gevent import monkey
+
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        log.warning("psycogreen is not installed; Postgres queries will block the gevent worker")
+    else:
+        patch_psycopg()
+
+
+if worker_class == "gevent" and preload_app:
+    # The master imports the app, so patch here rather than after fork.
+    import logging
+
+    _patch_gevent(logging.getLogger("gunicorn.error"))
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent" and not preload_app:
+        _patch_gevent(server.log)
+
+    if preload_app:
+        # wsgi.py put backend/ on sys.path when the master loaded it.
+        from app import init_worker_process
+
+        init_worker_process(server.app.wsgi())
@@ -1,8 +1,9 @@
 """
 WSGI Entry Point for Production Deployment
 
-Usage with Gunicorn:
-    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+Usage with Gunicorn (worker model in gunicorn.conf.py):
+    gunicorn -c gunicorn.conf.py wsgi:app
+    GUNICORN_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py wsgi:app
 
 Usage with uWSGI:
     uwsgi --http :5000 --wsgi-file wsgi.py --callable app --processes 4 --threads 2